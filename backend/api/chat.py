@@ -1,18 +1,46 @@
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Dict, Any
 from datetime import datetime
 
 from llm.agents.assistant import TimelyAssistant
+from llm.agents.checkin_pool import CheckinPool
+from llm.agents.conversations import ConversationManager
+from llm.memory.service import MemoryService, MemoryUnavailable
+from ..core.config import settings
+from ..core.log import get_logger
+from ..core.metrics import CHAT_RESPONSES, LLM_TOKENS, RESPONSE_ASSEMBLY_SPAN
+from ..services.batch import run_batch
+from ..services.conversation_store import Conversation
+from ..services.rate_limit import RateBudget, UsageLimiter
+from ..services.response_cache import ResponseCache
+from ..services.task_snapshots import TaskSnapshotCache
+from ..services.task_store import create_tasks
+from .deps import (
+    get_assistant, get_batch_budget, get_checkin_pool, get_client_address, get_client_key, get_conversations, get_session_owner, get_memory_service,
+    get_optional_user_id, get_response_cache, get_task_snapshots, get_usage_limiter
+)
+from .responses import FastJSONResponse, dumps, json_response
 
-router = APIRouter(prefix="/chat", tags=["chat"])
+router = APIRouter(prefix="/chat", tags=["chat"], default_response_class=FastJSONResponse)
+logger = get_logger(__name__)
 
 # Request/Response Models
 class ChatRequest(BaseModel):
     message: str
     energy_level: Optional[str] = "medium"
     personality_mode: Optional[str] = "coach"
+    # Without tasks, the open tasks of the user in X-User-Id are loaded from the task store
     tasks: Optional[List[Dict[str, Any]]] = []
+    available_minutes: Optional[int] = None
+    timezone: Optional[str] = None
+    bypass_cache: Optional[bool] = False
+    # Continue a conversation (POST /chat/sessions): earlier turns are in the
+    # prompt and this exchange is added to it; such answers are never cached
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
@@ -20,6 +48,15 @@ class ChatResponse(BaseModel):
     timestamp: str
     context_used: Optional[Dict[str, Any]] = None
     fallback: Optional[bool] = False
+    cached: Optional[bool] = False
+    pooled: Optional[bool] = False
+    rate_limited: Optional[str] = None
+    session_id: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    items: List[ChatRequest]
+    max_concurrency: Optional[int] = None
+    stream: Optional[bool] = False
 
 class QuickTask(BaseModel):
     title: str
@@ -27,25 +64,215 @@ class QuickTask(BaseModel):
     estimated_duration: Optional[int] = 30
     category: Optional[str] = "general"
 
-# Note: Using fresh assistant instances for each request to ensure latest configuration
+# Note: Handlers share one assistant from the registry; use POST /config/reload to pick up new configuration
+
+# Tokens reserved per batch plan-day call until the real tokens_used is known
+PLAN_DAY_TOKEN_ESTIMATE = 1000
+
+# Non-standard status (nginx convention) for requests abandoned by the client
+CLIENT_CLOSED_REQUEST = 499
+DISCONNECT_POLL_SECONDS = 0.25
+
+async def _call_until_disconnect(http_request: Request, call: Awaitable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Await an assistant call, cancelling it if the HTTP client goes away first.
+    Returns None when the client disconnected, so no LLM tokens are spent on a
+    response nobody will read.
+    """
+    call_task = asyncio.ensure_future(call)
+    
+    async def wait_for_disconnect():
+        while not await http_request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+    
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await asyncio.wait({call_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not call_task.done():
+            call_task.cancel()
+    
+    if not call_task.done() or call_task.cancelled():
+        return None
+    return call_task.result()
+
+async def _resolve_tasks(request: ChatRequest, user_id: Optional[int], snapshots: TaskSnapshotCache):
+    """
+    Fill request.tasks with the open tasks of the request's user (from their
+    snapshot) when the client sent none. user_id is the request identity
+    (X-User-Id), so a client can only plan over its own tasks.
+    """
+    if request.tasks or user_id is None:
+        return
+    request.tasks = await snapshots.pending(user_id)
+
+async def _recall_memories(memory: MemoryService, user_id: Optional[int], message: str) -> Optional[List[str]]:
+    """
+    The user's memories relevant to the message; None when disabled,
+    anonymous, or the memory backend is off (MemoryService logs that once).
+    user_id is the request identity, never the body's user_id.
+    """
+    if user_id is None or settings.memory_top_k <= 0:
+        return None
+    try:
+        matches = await memory.recall(user_id, message, settings.memory_top_k)
+    except MemoryUnavailable:
+        return None
+    except Exception as e:
+        logger.warning("Memory recall failed, answering without memories", extra={"error": str(e)})
+        return None
+    return [match["content"] for match in matches if match["score"] >= settings.memory_min_score] or None
+
+async def _open_session(
+    conversations: ConversationManager, request: ChatRequest, session_owner: str
+) -> Optional[Conversation]:
+    """The request's session (None without session_id); 404 when unknown, expired or another client's"""
+    if request.session_id is None:
+        return None
+    conversation = await conversations.open(request.session_id, session_owner)
+    if conversation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or expired")
+    return conversation
+
+async def _record_exchange(
+    conversations: ConversationManager, conversation: Optional[Conversation], user_input: str, result: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Add the message and its answer to the session, if any; the result then carries the session_id"""
+    if conversation is None:
+        return result
+    await conversations.record(conversation.id, user_input, result["response"])
+    return {**result, "session_id": conversation.id}
+
+def _chat_response(endpoint: str, result: Dict[str, Any]) -> ChatResponse:
+    """Build the response model, counting it by source (and its tokens) for /metrics"""
+    _record(endpoint, result)
+    with RESPONSE_ASSEMBLY_SPAN.time():
+        return ChatResponse(**result)
+
+def _chat_json(endpoint: str, result: Dict[str, Any], http_request: Request) -> Response:
+    """
+    Like _chat_response, but validated once and encoded here, so FastAPI
+    skips its own response_model pass; large bodies are compressed
+    """
+    _record(endpoint, result)
+    with RESPONSE_ASSEMBLY_SPAN.time():
+        return json_response(http_request, model=ChatResponse(**result))
+
+def _record(endpoint: str, result: Dict[str, Any]):
+    if result.get("cached"):
+        source = "cached"
+    elif result.get("pooled"):
+        source = "pooled"
+    elif result.get("rate_limited"):
+        source = "rate_limited"
+    elif result.get("fallback"):
+        source = "fallback"
+    else:
+        source = "llm"
+    CHAT_RESPONSES.labels(endpoint, source).inc()
+    tokens = result.get("tokens_used")
+    if tokens:
+        LLM_TOKENS.labels(endpoint).inc(tokens)
+
+async def _limited_call(
+    http_request: Request,
+    limiter: UsageLimiter,
+    client_key: str,
+    make_call: Callable[[bool], Awaitable[Dict[str, Any]]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Call the assistant with make_call(allow_llm). A client over its rate or
+    daily token limit gets the local fallback at once (marked rate_limited);
+    otherwise the tokens the call used are charged to the client.
+    """
+    address = get_client_address(http_request)
+    limited = await limiter.admit(client_key, address=address)
+    result = await _call_until_disconnect(http_request, make_call(limited is None))
+    if result is None:
+        return None
+    if limited:
+        return {**result, "rate_limited": limited}
+    await limiter.record(client_key, result.get("tokens_used") or 0, address=address)
+    return result
+
+async def _cached_call(
+    http_request: Request,
+    response_cache: ResponseCache,
+    cache_key: str,
+    bypass_cache: bool,
+    limiter: UsageLimiter,
+    client_key: str,
+    make_call: Callable[[bool], Awaitable[Dict[str, Any]]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Serve from the response cache when possible, otherwise call the assistant
+    and store the result. Bypassing skips the lookup but still refreshes the entry.
+    Cache hits cost nothing, so rate limits only apply to misses.
+    """
+    if bypass_cache:
+        response_cache.record_bypass()
+    else:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            # No tokens were spent on this answer
+            return {**cached, "tokens_used": 0, "cached": True}
+    
+    result = await _limited_call(http_request, limiter, client_key, make_call)
+    if result is not None:
+        await response_cache.set(cache_key, result)
+    return result
 
 @router.post("/next-task", response_model=ChatResponse)
-async def get_next_task(request: ChatRequest):
+async def get_next_task(
+    request: ChatRequest,
+    http_request: Request,
+    assistant: TimelyAssistant = Depends(get_assistant),
+    response_cache: ResponseCache = Depends(get_response_cache),
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key),
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots),
+    memory: MemoryService = Depends(get_memory_service),
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
     """
     Get AI suggestion for what to do next
     """
+    conversation = await _open_session(conversations, request, session_owner)
     try:
-        # Create fresh assistant instance for latest configuration
-        assistant = TimelyAssistant()
+        await _resolve_tasks(request, user_id, snapshots)
         
-        result = await assistant.what_should_i_do_next(
-            user_input=request.message,
-            available_tasks=request.tasks,
-            energy_level=request.energy_level,
-            personality_mode=request.personality_mode
-        )
+        async def call(allow_llm: bool) -> Dict[str, Any]:
+            # Recall only on a cache miss, and only when the model will see it
+            return await assistant.what_should_i_do_next(
+                user_input=request.message,
+                available_tasks=request.tasks,
+                energy_level=request.energy_level,
+                personality_mode=request.personality_mode,
+                available_minutes=request.available_minutes,
+                allow_llm=allow_llm,
+                memories=await _recall_memories(memory, user_id, request.message) if allow_llm else None,
+                history=conversations.history(conversation) if conversation and allow_llm else None,
+                user_timezone=request.timezone
+            )
         
-        return ChatResponse(**result)
+        if conversation is not None:
+            result = await _limited_call(http_request, limiter, client_key, call)
+        else:
+            cache_key = response_cache.make_key(
+                "next-task", request.message, request.tasks, request.energy_level, request.personality_mode,
+                extra={"available_minutes": request.available_minutes, "timezone": request.timezone, "user_id": user_id}
+            )
+            result = await _cached_call(
+                http_request, response_cache, cache_key, request.bypass_cache, limiter, client_key, call
+            )
+        if result is None:
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        
+        result = await _record_exchange(conversations, conversation, request.message, result)
+        return _chat_json("next-task", result, http_request)
         
     except Exception as e:
         raise HTTPException(
@@ -54,21 +281,53 @@ async def get_next_task(request: ChatRequest):
         )
 
 @router.post("/plan-day", response_model=ChatResponse)
-async def plan_day(request: ChatRequest):
+async def plan_day(
+    request: ChatRequest,
+    http_request: Request,
+    assistant: TimelyAssistant = Depends(get_assistant),
+    response_cache: ResponseCache = Depends(get_response_cache),
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key),
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots),
+    memory: MemoryService = Depends(get_memory_service),
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
     """
     Generate a day plan based on available tasks
     """
+    conversation = await _open_session(conversations, request, session_owner)
     try:
-        # Create fresh assistant instance for latest configuration
-        assistant = TimelyAssistant()
+        await _resolve_tasks(request, user_id, snapshots)
         
-        result = await assistant.plan_my_day(
-            user_input=request.message,
-            available_tasks=request.tasks,
-            personality_mode=request.personality_mode
-        )
+        async def call(allow_llm: bool) -> Dict[str, Any]:
+            return await assistant.plan_my_day(
+                user_input=request.message,
+                available_tasks=request.tasks,
+                personality_mode=request.personality_mode,
+                energy_level=request.energy_level,
+                user_timezone=request.timezone,
+                allow_llm=allow_llm,
+                memories=await _recall_memories(memory, user_id, request.message) if allow_llm else None,
+                history=conversations.history(conversation) if conversation and allow_llm else None
+            )
         
-        return ChatResponse(**result)
+        if conversation is not None:
+            result = await _limited_call(http_request, limiter, client_key, call)
+        else:
+            cache_key = response_cache.make_key(
+                "plan-day", request.message, request.tasks, request.energy_level, request.personality_mode,
+                extra={"timezone": request.timezone, "user_id": user_id}
+            )
+            result = await _cached_call(
+                http_request, response_cache, cache_key, request.bypass_cache, limiter, client_key, call
+            )
+        if result is None:
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        
+        result = await _record_exchange(conversations, conversation, request.message, result)
+        return _chat_json("plan-day", result, http_request)
         
     except Exception as e:
         raise HTTPException(
@@ -76,20 +335,274 @@ async def plan_day(request: ChatRequest):
             detail=f"Error creating day plan: {str(e)}"
         )
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+async def _sse_stream(
+    endpoint: str,
+    response_cache: ResponseCache,
+    cache_key: Optional[str],
+    bypass_cache: bool,
+    limiter: UsageLimiter,
+    client_key: str,
+    client_address: str,
+    make_stream: Callable[[bool], AsyncIterator[Dict[str, Any]]],
+    finish: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+) -> AsyncIterator[str]:
+    """
+    Turn assistant stream events into SSE. Cache hits are replayed as a single
+    token event so clients handle every response the same way; the final
+    "done" event has the ChatResponse fields plus ttfb/total timing.
+    Rate limits apply as in _limited_call. Without a cache_key the answer is
+    neither looked up nor stored; `finish`, when given, takes a complete
+    answer before its done event is sent (e.g. to record it in a session).
+    """
+    start = time.perf_counter()
+    if cache_key is not None and bypass_cache:
+        response_cache.record_bypass()
+    elif cache_key is not None:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            yield _sse("token", {"content": cached["response"]})
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+            done = _chat_response(endpoint, {**cached, "tokens_used": 0, "cached": True}).model_dump()
+            yield _sse("done", {**done, "timing": {"ttfb_ms": elapsed_ms, "total_ms": elapsed_ms}})
+            return
+    
+    limited = await limiter.admit(client_key, address=client_address)
+    async for event in make_stream(limited is None):
+        kind = event.pop("event")
+        if kind == "done":
+            timing = event.pop("timing")
+            error = event.pop("error", None)
+            if limited:
+                event["rate_limited"] = limited
+            else:
+                await limiter.record(client_key, event.get("tokens_used") or 0, address=client_address)
+            if error is None and cache_key is not None:
+                await response_cache.set(cache_key, event)
+            if error is None and finish is not None:
+                event = await finish(event)
+            done = {**_chat_response(endpoint, event).model_dump(), "timing": timing}
+            if error is not None:
+                done["error"] = error
+            yield _sse("done", done)
+        else:
+            yield _sse(kind, event)
+
+def _event_stream_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/next-task/stream")
+async def stream_next_task(
+    request: ChatRequest,
+    assistant: TimelyAssistant = Depends(get_assistant),
+    response_cache: ResponseCache = Depends(get_response_cache),
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key),
+    client_address: str = Depends(get_client_address),
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots),
+    memory: MemoryService = Depends(get_memory_service),
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
+    """
+    Stream the next-task suggestion as Server-Sent Events
+    """
+    conversation = await _open_session(conversations, request, session_owner)
+    await _resolve_tasks(request, user_id, snapshots)
+    cache_key = None if conversation is not None else response_cache.make_key(
+        "next-task", request.message, request.tasks, request.energy_level, request.personality_mode,
+        extra={"available_minutes": request.available_minutes, "timezone": request.timezone, "user_id": user_id}
+    )
+    
+    async def stream(allow_llm: bool) -> AsyncIterator[Dict[str, Any]]:
+        async for event in assistant.stream_what_should_i_do_next(
+            user_input=request.message,
+            available_tasks=request.tasks,
+            energy_level=request.energy_level,
+            personality_mode=request.personality_mode,
+            available_minutes=request.available_minutes,
+            allow_llm=allow_llm,
+            memories=await _recall_memories(memory, user_id, request.message) if allow_llm else None,
+            history=conversations.history(conversation) if conversation and allow_llm else None,
+            user_timezone=request.timezone
+        ):
+            yield event
+    
+    async def finish(result: Dict[str, Any]) -> Dict[str, Any]:
+        return await _record_exchange(conversations, conversation, request.message, result)
+    
+    return _event_stream_response(_sse_stream(
+        "next-task/stream", response_cache, cache_key, request.bypass_cache, limiter, client_key, client_address, stream, finish
+    ))
+
+@router.post("/plan-day/stream")
+async def stream_plan_day(
+    request: ChatRequest,
+    assistant: TimelyAssistant = Depends(get_assistant),
+    response_cache: ResponseCache = Depends(get_response_cache),
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key),
+    client_address: str = Depends(get_client_address),
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots),
+    memory: MemoryService = Depends(get_memory_service),
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
+    """
+    Stream the day plan as Server-Sent Events
+    """
+    conversation = await _open_session(conversations, request, session_owner)
+    await _resolve_tasks(request, user_id, snapshots)
+    cache_key = None if conversation is not None else response_cache.make_key(
+        "plan-day", request.message, request.tasks, request.energy_level, request.personality_mode,
+        extra={"timezone": request.timezone, "user_id": user_id}
+    )
+    
+    async def stream(allow_llm: bool) -> AsyncIterator[Dict[str, Any]]:
+        async for event in assistant.stream_plan_my_day(
+            user_input=request.message,
+            available_tasks=request.tasks,
+            personality_mode=request.personality_mode,
+            energy_level=request.energy_level,
+            user_timezone=request.timezone,
+            allow_llm=allow_llm,
+            memories=await _recall_memories(memory, user_id, request.message) if allow_llm else None,
+            history=conversations.history(conversation) if conversation and allow_llm else None
+        ):
+            yield event
+    
+    async def finish(result: Dict[str, Any]) -> Dict[str, Any]:
+        return await _record_exchange(conversations, conversation, request.message, result)
+    
+    return _event_stream_response(_sse_stream(
+        "plan-day/stream", response_cache, cache_key, request.bypass_cache, limiter, client_key, client_address, stream, finish
+    ))
+
+@router.post("/plan-day/batch")
+async def plan_day_batch(
+    batch: BatchChatRequest,
+    http_request: Request,
+    assistant: TimelyAssistant = Depends(get_assistant),
+    response_cache: ResponseCache = Depends(get_response_cache),
+    budget: RateBudget = Depends(get_batch_budget),
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key),
+    client_address: str = Depends(get_client_address),
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots)
+):
+    """
+    Plan the day for many requests in one call.
+    
+    Items fan out with bounded concurrency under the shared requests/tokens
+    per-minute budget, which only items that call the model are charged for. Each item gets {"index", "ok", "result" | "error"}.
+    With "stream": true (or Accept: application/x-ndjson) results are sent as
+    NDJSON in completion order; otherwise one JSON body in request order.
+    Items are paced by the batch budget rather than the per-client rate limit,
+    but their tokens count toward the caller's daily budget. Items cannot
+    continue a conversation session.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch has no items")
+    if any(item.session_id is not None for item in batch.items):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch items cannot have a session_id")
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.batch_max_items} items"
+        )
+    
+    concurrency = min(batch.max_concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency)
+    
+    async def plan(item: ChatRequest, acquire: Callable[[], Awaitable[None]]) -> Dict[str, Any]:
+        await _resolve_tasks(item, user_id, snapshots)
+        cache_key = response_cache.make_key(
+            "plan-day", item.message, item.tasks, item.energy_level, item.personality_mode,
+            extra={"timezone": item.timezone, "user_id": user_id}
+        )
+        result = None if item.bypass_cache else await response_cache.get(cache_key)
+        if result is not None:
+            result = {**result, "tokens_used": 0, "cached": True}
+        else:
+            limited = await limiter.admit(client_key, check_rate=False, address=client_address)
+            allow_llm = assistant.llm_available(limited is None)
+            if allow_llm:
+                # Only calls that reach the provider spend the batch budget
+                await acquire()
+            result = await assistant.plan_my_day(
+                user_input=item.message,
+                available_tasks=item.tasks,
+                personality_mode=item.personality_mode,
+                energy_level=item.energy_level,
+                user_timezone=item.timezone,
+                allow_llm=allow_llm
+            )
+            if limited:
+                result = {**result, "rate_limited": limited}
+            else:
+                await limiter.record(client_key, result.get("tokens_used") or 0, address=client_address)
+            await response_cache.set(cache_key, result)
+        return _chat_response("plan-day/batch", result).model_dump()
+    
+    results = run_batch(batch.items, plan, concurrency, budget, PLAN_DAY_TOKEN_ESTIMATE)
+    
+    if batch.stream or "application/x-ndjson" in http_request.headers.get("accept", ""):
+        async def ndjson():
+            async for item in results:
+                yield dumps(item) + b"\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    collected = [item async for item in results]
+    collected.sort(key=lambda item: item["index"])
+    succeeded = sum(1 for item in collected if item["ok"])
+    return json_response(http_request, content={
+        "results": collected,
+        "succeeded": succeeded,
+        "failed": len(collected) - succeeded,
+        "timestamp": datetime.now().isoformat()
+    })
+
+async def _pooled_checkin(checkin_pool: CheckinPool, request: ChatRequest, client_key: str) -> Dict[str, Any]:
+    """A greeting from the check-in pool; {} when there is none, so the caller goes live"""
+    result = await checkin_pool.serve(request.energy_level, request.personality_mode, request.timezone, client_key)
+    return result or {}
+
 @router.post("/morning-checkin", response_model=ChatResponse)
-async def morning_checkin(request: ChatRequest):
+async def morning_checkin(
+    request: ChatRequest,
+    http_request: Request,
+    assistant: TimelyAssistant = Depends(get_assistant),
+    checkin_pool: CheckinPool = Depends(get_checkin_pool),
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key)
+):
     """
-    Morning greeting and check-in
+    Morning greeting and check-in: a pre-generated greeting the caller has
+    not seen yet when one is available, otherwise a live LLM call
     """
     try:
-        # Create fresh assistant instance for latest configuration
-        assistant = TimelyAssistant()
-        
-        result = await assistant.morning_checkin(
-            energy_level=request.energy_level
-        )
+        # Pooled greetings cost no tokens, so rate limits only apply to live calls
+        pooled = await _call_until_disconnect(http_request, _pooled_checkin(checkin_pool, request, client_key))
+        if pooled is None:
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        result = pooled or await _limited_call(http_request, limiter, client_key, lambda allow_llm: assistant.morning_checkin(
+            energy_level=request.energy_level,
+            allow_llm=allow_llm,
+            user_timezone=request.timezone
+        ))
+        if result is None:
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
         
-        return ChatResponse(**result)
+        return _chat_json("morning-checkin", result, http_request)
         
     except Exception as e:
         raise HTTPException(
@@ -97,8 +610,125 @@ async def morning_checkin(request: ChatRequest):
             detail=f"Error with morning check-in: {str(e)}"
         )
 
+@router.post("/sessions")
+async def create_session(
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
+    """
+    Start a conversation; pass its session_id on chat requests to continue it.
+    Only the same client (API key or user id, else address) can use it.
+    """
+    conversation = await conversations.create(session_owner)
+    return {
+        "session_id": conversation.id,
+        "expires_at": datetime.fromtimestamp(conversation.expires_at).isoformat(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/sessions/stats")
+async def session_stats(conversations: ConversationManager = Depends(get_conversations)):
+    """
+    Conversation sessions: history sizes sent to the model, summaries and store counters
+    """
+    return {
+        **conversations.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/sessions/{session_id}")
+async def get_session(
+    session_id: str,
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
+    """
+    A conversation as stored: its rolling summary and the turns not summarized yet
+    """
+    conversation = await conversations.open(session_id, session_owner)
+    if conversation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or expired")
+    return {
+        "session_id": conversation.id,
+        "summary": conversation.summary,
+        "summary_tokens": conversation.summary_tokens,
+        "turns": [{"role": turn.role, "content": turn.content, "tokens": turn.tokens} for turn in conversation.turns],
+        "summarized_turns": conversation.summarized_through,
+        "expires_at": datetime.fromtimestamp(conversation.expires_at).isoformat(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    conversations: ConversationManager = Depends(get_conversations),
+    session_owner: str = Depends(get_session_owner)
+):
+    """
+    End a conversation and drop its history
+    """
+    if await conversations.open(session_id, session_owner) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or expired")
+    await conversations.delete(session_id)
+    return {"deleted": session_id, "timestamp": datetime.now().isoformat()}
+
+@router.get("/cache/stats")
+async def cache_stats(response_cache: ResponseCache = Depends(get_response_cache)):
+    """
+    Hit/miss counters for the next-task / plan-day response cache
+    """
+    return {
+        **response_cache.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/checkin-pool/stats")
+async def checkin_pool_stats(checkin_pool: CheckinPool = Depends(get_checkin_pool)):
+    """
+    Draws, refills and pool sizes for the pre-generated morning check-ins
+    """
+    return {
+        **checkin_pool.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/task-snapshots/stats")
+async def task_snapshot_stats(snapshots: TaskSnapshotCache = Depends(get_task_snapshots)):
+    """
+    Per-user open task snapshots: hits, rebuilds, in-place updates and memory use
+    """
+    return {
+        **snapshots.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/usage")
+async def usage(
+    limiter: UsageLimiter = Depends(get_usage_limiter),
+    client_key: str = Depends(get_client_key)
+):
+    """
+    The caller's LLM token use today, plus limiter counters
+    """
+    return {
+        "client": client_key,
+        **await limiter.usage(client_key),
+        "limits": limiter.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/inflight/stats")
+async def inflight_stats(assistant: TimelyAssistant = Depends(get_assistant)):
+    """
+    Counters for identical concurrent LLM calls that shared one upstream request
+    """
+    return {
+        **assistant.inflight.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/test")
-async def test_ai():
+async def test_ai(assistant: TimelyAssistant = Depends(get_assistant)):
     """
     Simple test endpoint to verify AI integration
     """
@@ -110,9 +740,6 @@ async def test_ai():
             {"title": "Team meeting", "priority": "high", "estimated_duration": 30}
         ]
         
-        # Create fresh assistant instance for latest configuration
-        assistant = TimelyAssistant()
-        
         result = await assistant.what_should_i_do_next(
             user_input="What should I focus on right now?",
             available_tasks=test_tasks,
@@ -142,22 +769,29 @@ async def test_fresh_ai():
         fresh_assistant = TimelyAssistant()
         
         # Simple test message
-        from openai import OpenAI
         from backend.core.config import settings
         
         # Test direct OpenAI call
-        client = OpenAI(api_key=settings.openai_api_key)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "Say hello!"}],
-            max_tokens=10
-        )
+        from openai import AsyncOpenAI
+        async with AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            timeout=settings.llm_timeout_seconds
+        ) as client:
+            response = await client.chat.completions.create(
+                model=settings.openai_model,
+                messages=[{"role": "user", "content": "Say hello!"}],
+                max_tokens=10
+            )
+        
+        await fresh_assistant.aclose()
         
         return {
             "message": "✅ Direct OpenAI test working!",
             "response": response.choices[0].message.content,
             "tokens_used": response.usage.total_tokens,
             "assistant_ready": fresh_assistant.client_ready,
+            "providers": fresh_assistant.router.provider_names,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -169,12 +803,20 @@ async def test_fresh_ai():
 
 # Add a simple tasks endpoint for testing
 @router.post("/quick-task")
-async def add_quick_task(task: QuickTask):
+async def add_quick_task(
+    task: QuickTask,
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots)
+):
     """
-    Quick endpoint to add a task (for testing)
+    Quick endpoint to add a task (saved to the task store when X-User-Id is sent)
     """
+    saved = task.dict()
+    if user_id is not None:
+        saved["id"] = (await create_tasks(user_id, [task.dict()]))[0]
+        await snapshots.apply(user_id, [saved["id"]])
     return {
-        "message": f"Task '{task.title}' noted!",
-        "task": task.dict(),
+        "message": f"Task '{task.title}' {'saved' if user_id is not None else 'noted'}!",
+        "task": saved,
         "timestamp": datetime.now().isoformat()
     }
\ No newline at end of file
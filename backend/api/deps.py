@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from llm.agents.assistant import TimelyAssistant
+from llm.agents.checkin_pool import CheckinPool
+from llm.agents.conversations import ConversationManager
+from llm.memory.consolidation import MemoryConsolidator
+from llm.memory.service import MemoryService
+from ..core.config import settings
+from ..services.rate_limit import RateBudget, UsageLimiter
+from ..services.response_cache import ResponseCache
+from ..services.task_snapshots import TaskSnapshotCache
+
+
+def get_assistant(request: Request) -> TimelyAssistant:
+    """Shared assistant from the process-wide registry (see backend.main lifespan)"""
+    return request.app.state.assistants.assistant
+
+
+def get_response_cache(request: Request) -> ResponseCache:
+    """Process-wide response cache for next-task and plan-day"""
+    return request.app.state.response_cache
+
+
+def get_checkin_pool(request: Request) -> CheckinPool:
+    """Pre-generated morning check-in greetings of this process"""
+    return request.app.state.checkin_pool
+
+
+def get_conversations(request: Request) -> ConversationManager:
+    """Multi-turn chat sessions of this process"""
+    return request.app.state.conversations
+
+
+def get_task_snapshots(request: Request) -> TaskSnapshotCache:
+    """Per-user open task snapshots of this process"""
+    return request.app.state.task_snapshots
+
+
+def get_batch_budget(request: Request) -> RateBudget:
+    """Requests/tokens-per-minute budget shared by batch planning calls"""
+    return request.app.state.batch_budget
+
+
+def get_memory_service(request: Request) -> MemoryService:
+    """User memory store/recall (embedding model and index load on first use)"""
+    return request.app.state.memory
+
+
+def get_memory_consolidator(request: Request) -> MemoryConsolidator:
+    """Background memory consolidation job of this process"""
+    return request.app.state.memory_consolidator
+
+
+def get_usage_limiter(request: Request) -> UsageLimiter:
+    """Per-client rate limits and daily token accounting"""
+    return request.app.state.usage_limiter
+
+
+def get_client_address(request: Request) -> str:
+    """The client's network address, limited on its own across every key it sends"""
+    return request.client.host if request.client else "unknown"
+
+
+def _client_identity(request: Request) -> Optional[str]:
+    """API key (hashed) or user id the client sent, if any"""
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return f"key:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+    user_id = request.headers.get("x-user-id")
+    if user_id:
+        return f"user:{user_id}"
+    return None
+
+
+def get_client_key(request: Request) -> str:
+    """
+    Who a request is limited and billed as: API key (hashed) or user id, at
+    the client address. Neither header is verified yet, so the address is
+    always part of the key, and UsageLimiter also limits the address as a
+    whole (see get_client_address) since a new header value gets new buckets.
+    """
+    host = get_client_address(request)
+    identity = _client_identity(request)
+    return f"{identity}@{host}" if identity else f"ip:{host}"
+
+
+def get_session_owner(request: Request) -> str:
+    """
+    Who owns a conversation session: API key (hashed) or user id, so it
+    survives address changes; the address only for anonymous clients. The
+    unguessable session_id is what keeps other clients out.
+    """
+    return _client_identity(request) or f"ip:{get_client_address(request)}"
+
+
+def require_admin(request: Request):
+    """Admin routes: X-Admin-Token must match ADMIN_TOKEN"""
+    token = request.headers.get("x-admin-token") or ""
+    if not settings.admin_token or not hmac.compare_digest(token.encode("utf-8"), settings.admin_token.encode("utf-8")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+
+def get_optional_user_id(request: Request) -> Optional[int]:
+    """Numeric user id from X-User-Id, if the client sent one"""
+    user_id = request.headers.get("x-user-id")
+    if user_id is None:
+        return None
+    try:
+        return int(user_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="X-User-Id must be an integer")
+
+
+def get_user_id(request: Request) -> int:
+    """Numeric user id from X-User-Id (required)"""
+    user_id = get_optional_user_id(request)
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="X-User-Id header required")
+    return user_id
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+
+from llm.memory.consolidation import MemoryConsolidator
+from llm.memory.service import MemoryService, MemoryUnavailable
+from .deps import get_memory_consolidator, get_memory_service, get_user_id
+
+router = APIRouter(prefix="/memories", tags=["memories"])
+
+MAX_MEMORIES_PER_REQUEST = 500
+MAX_RECALL = 50
+
+# Request/Response Models
+class RememberRequest(BaseModel):
+    contents: List[str]
+    memory_type: Optional[str] = "note"
+
+class ForgetRequest(BaseModel):
+    ids: List[int]
+
+@router.post("")
+async def remember(
+    request: RememberRequest,
+    user_id: int = Depends(get_user_id),
+    memory: MemoryService = Depends(get_memory_service)
+):
+    """
+    Store memories for the user (embedded in one batch; repeated text is stored once)
+    """
+    if len(request.contents) > MAX_MEMORIES_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_MEMORIES_PER_REQUEST} memories per request"
+        )
+    try:
+        ids = await memory.remember(user_id, request.contents, request.memory_type)
+    except MemoryUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Memory backend unavailable: {e}")
+    return {"ids": ids, "timestamp": datetime.now().isoformat()}
+
+@router.get("/search")
+async def search(
+    q: str,
+    k: int = Query(5, ge=1, le=MAX_RECALL),
+    user_id: int = Depends(get_user_id),
+    memory: MemoryService = Depends(get_memory_service)
+):
+    """
+    The user's memories most relevant to q, best first
+    """
+    try:
+        results = await memory.recall(user_id, q, k)
+    except MemoryUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Memory backend unavailable: {e}")
+    return {"results": results, "timestamp": datetime.now().isoformat()}
+
+@router.post("/forget")
+async def forget(
+    request: ForgetRequest,
+    user_id: int = Depends(get_user_id),
+    memory: MemoryService = Depends(get_memory_service)
+):
+    """
+    Delete memories by id
+    """
+    try:
+        removed = await memory.forget(user_id, request.ids)
+    except MemoryUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Memory backend unavailable: {e}")
+    return {"removed": removed, "timestamp": datetime.now().isoformat()}
+
+@router.post("/consolidate")
+async def consolidate(consolidator: MemoryConsolidator = Depends(get_memory_consolidator)):
+    """
+    Run the consolidation job now (decay, merge, summarize, prune)
+    """
+    try:
+        result = await consolidator.run()
+    except MemoryUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Memory backend unavailable: {e}")
+    return {**result, "timestamp": datetime.now().isoformat()}
+
+@router.get("/stats")
+async def memory_stats(
+    memory: MemoryService = Depends(get_memory_service),
+    consolidator: MemoryConsolidator = Depends(get_memory_consolidator)
+) -> Dict[str, Any]:
+    """
+    Store/recall counters, embedding cache state and consolidation runs
+    """
+    return {**memory.stats(), "consolidation": consolidator.stats(), "timestamp": datetime.now().isoformat()}
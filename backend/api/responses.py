@@ -0,0 +1,89 @@
+"""
+JSON response encoding for the API hot paths.
+
+FastAPI's default path for a `response_model` endpoint validates the
+returned object against the model again, runs jsonable_encoder over it and
+encodes the result with the stdlib json module. Handlers that have already
+validated their payload return json_response() instead:
+- a pydantic model is encoded once, by pydantic-core's own serializer
+- anything else is encoded with orjson when it is installed (stdlib json
+  otherwise)
+- bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with
+  brotli (when installed) or gzip, whichever the client accepts
+
+`response_model` stays on the route, so the OpenAPI schema is unchanged.
+"""
+import gzip
+import json
+from typing import Any, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from ..core.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps(); use as a router's default_response_class"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Codings an Accept-Encoding header allows (those not given q=0)"""
+    codings = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip() and quality > 0:
+            codings.add(coding.strip())
+    return codings
+
+
+def compress(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """body compressed for the client, and its Content-Encoding (None: sent as is)"""
+    min_bytes = settings.response_compression_min_bytes
+    if min_bytes <= 0 or len(body) < min_bytes or not accept_encoding:
+        return body, None
+    codings = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in codings:
+        return brotli.compress(body, quality=settings.response_brotli_quality), "br"
+    if "gzip" in codings:
+        return gzip.compress(body, compresslevel=settings.response_gzip_level, mtime=0), "gzip"
+    return body, None
+
+
+def json_response(request: Request, content: Any = None, model: Optional[BaseModel] = None, status_code: int = 200) -> Response:
+    """Encode an already validated model (or plain content) once, compressed when worth it"""
+    body = model.__pydantic_serializer__.to_json(model) if model is not None else dumps(content)
+    body, encoding = compress(body, request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
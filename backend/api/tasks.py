@@ -0,0 +1,160 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+
+from ..core.database import get_async_db
+from ..services import task_store
+from ..services.task_snapshots import TaskSnapshotCache
+from .deps import get_task_snapshots, get_user_id
+
+router = APIRouter(prefix="/tasks", tags=["tasks"])
+
+MAX_PAGE_SIZE = 200
+MAX_BULK_ITEMS = 1000
+
+# Request/Response Models
+class TaskIn(BaseModel):
+    """A task to create, or (with id) the fields to change on an existing task"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[str] = "medium"
+    category: Optional[str] = "general"
+    estimated_duration: Optional[int] = None
+    due_date: Optional[datetime] = None
+    is_completed: Optional[bool] = False
+    energy_required: Optional[str] = "medium"
+    context_tags: Optional[List[str]] = []
+
+class TaskOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[str] = None
+    category: Optional[str] = None
+    estimated_duration: Optional[int] = None
+    due_date: Optional[datetime] = None
+    is_completed: bool = False
+    completed_at: Optional[datetime] = None
+    energy_required: Optional[str] = None
+    context_tags: Optional[List[str]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class TaskPage(BaseModel):
+    items: List[TaskOut]
+    next_cursor: Optional[str] = None
+
+class BulkTasksRequest(BaseModel):
+    tasks: List[TaskIn]
+
+class BulkTasksResponse(BaseModel):
+    created: List[int]
+    updated: List[int]
+    not_found: List[int]
+
+def _fields(task: TaskIn, partial: bool) -> Dict[str, Any]:
+    """Fields to write: everything for a new task, only what was sent for an update"""
+    return task.model_dump(exclude_unset=partial)
+
+@router.get("", response_model=TaskPage)
+async def list_tasks(
+    completed: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    The user's tasks in creation order. Pass the returned next_cursor to get
+    the following page; it is null on the last page.
+    """
+    try:
+        items, next_cursor = await task_store.list_tasks(db, user_id, completed, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return TaskPage(items=items, next_cursor=next_cursor)
+
+@router.post("", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
+async def create_task(
+    task: TaskIn,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots)
+):
+    """
+    Create one task
+    """
+    if not task.title:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Task title is required")
+    created, _, _ = await task_store.bulk_upsert(db, user_id, [{**_fields(task, partial=False), "id": None}])
+    await snapshots.apply(user_id, created, db)
+    return await task_store.get_task(db, user_id, created[0])
+
+@router.post("/bulk", response_model=BulkTasksResponse)
+async def bulk_upsert_tasks(
+    request: BulkTasksRequest,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots)
+):
+    """
+    Create tasks without an id and update tasks with one, in a single transaction.
+    Updates only change the fields that were sent; unknown ids are reported in not_found.
+    """
+    if len(request.tasks) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk request exceeds {MAX_BULK_ITEMS} tasks"
+        )
+    missing_titles = [index for index, task in enumerate(request.tasks) if task.id is None and not task.title]
+    if missing_titles:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"New tasks need a title (items {missing_titles})"
+        )
+    created, updated, not_found = await task_store.bulk_upsert(
+        db, user_id, [_fields(task, partial=task.id is not None) for task in request.tasks]
+    )
+    await snapshots.apply(user_id, created + updated, db)
+    return BulkTasksResponse(created=created, updated=updated, not_found=not_found)
+
+@router.get("/{task_id}", response_model=TaskOut)
+async def get_task(task_id: int, user_id: int = Depends(get_user_id), db: AsyncSession = Depends(get_async_db)):
+    task = await task_store.get_task(db, user_id, task_id)
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return task
+
+@router.patch("/{task_id}", response_model=TaskOut)
+async def update_task(
+    task_id: int,
+    task: TaskIn,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots)
+):
+    """
+    Change the given fields of a task
+    """
+    _, updated, _ = await task_store.bulk_upsert(db, user_id, [{**_fields(task, partial=True), "id": task_id}])
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    await snapshots.apply(user_id, updated, db)
+    return await task_store.get_task(db, user_id, task_id)
+
+@router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_task(
+    task_id: int,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    snapshots: TaskSnapshotCache = Depends(get_task_snapshots)
+):
+    if not await task_store.delete_task(db, user_id, task_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    await snapshots.remove(user_id, [task_id])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,5 +1,5 @@
 ﻿import os
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,13 +12,160 @@ class Settings:
     app_name: str = "Timely"
     app_version: str = "1.0.0"
     debug: bool = True
+    # Credential for admin routes (POST /config/reload, sent as X-Admin-Token);
+    # those routes exist only with debug on and a token set
+    admin_token: Optional[str] = None
     
     # Database
     database_url: str = "sqlite:///./timely.db"
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30.0
+    sqlite_mmap_size: int = 268435456
+    sqlite_busy_timeout_ms: int = 5000
+    
+    # Serving (gunicorn -c python:backend.core.gunicorn_conf): WEB_CONCURRENCY
+    # worker processes, 0 for one per CPU. State the workers must agree on
+    # (response cache, rate limits, batch budget, circuit breakers) is kept in
+    # the SQLite file SHARED_STATE_PATH, which defaults to
+    # data/shared_state.db when there is more than one worker
+    host: str = "0.0.0.0"
+    port: int = 8000
+    web_concurrency: int = 1
+    worker_graceful_timeout_seconds: float = 30.0
+    worker_max_requests: int = 0
+    shared_state_path: Optional[str] = None
+    shared_state_sync_seconds: float = 1.0
     
     # LLM APIs
     openai_api_key: Optional[str] = None
     anthropic_api_key: Optional[str] = None
+    openai_base_url: Optional[str] = None
+    openai_model: str = "gpt-3.5-turbo"
+    anthropic_base_url: Optional[str] = None
+    anthropic_model: str = "claude-3-haiku-20240307"
+    
+    # Provider routing: providers (those with an API key) in priority order;
+    # "adaptive" picks per call by observed latency, error rate and cost
+    # (USD per 1K tokens), "ordered" keeps the list order for failover only
+    llm_providers: List[str] = ["openai", "anthropic"]
+    llm_routing: str = "adaptive"
+    llm_router_cost_weight: float = 100.0
+    llm_router_error_penalty_seconds: float = 5.0
+    llm_router_explore_rate: float = 0.02
+    openai_input_cost_per_1k: float = 0.0005
+    openai_output_cost_per_1k: float = 0.0015
+    anthropic_input_cost_per_1k: float = 0.00025
+    anthropic_output_cost_per_1k: float = 0.00125
+    
+    # LLM connection pool (shared across requests)
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_timeout_seconds: float = 20.0
+    llm_max_retries: int = 2
+    # Overall time for one completion, covering retries, failover and hedges;
+    # past it the request gets the local fallback (0 = no deadline)
+    llm_deadline_seconds: float = 25.0
+    
+    # Circuit breaker: opens when LLM_BREAKER_FAILURE_RATIO of the calls in the
+    # window failed or took LLM_BREAKER_SLOW_CALL_SECONDS; stays open (fallback
+    # answers only) for LLM_BREAKER_OPEN_SECONDS, then probes
+    llm_breaker_failure_ratio: float = 0.5
+    llm_breaker_min_calls: int = 10
+    llm_breaker_window_seconds: float = 60.0
+    llm_breaker_slow_call_seconds: float = 10.0
+    llm_breaker_open_seconds: float = 30.0
+    llm_breaker_half_open_probes: int = 1
+    
+    # Hedged requests: a second attempt after the p95 latency of recent calls
+    # (at least LLM_HEDGE_MIN_DELAY_SECONDS); off by default as it can double spend
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_delay_seconds: float = 0.25
+    
+    # Prompt budget: tasks fill what the context window leaves after the fixed
+    # prompt and the completion; PROMPT_TASK_TOKEN_BUDGET > 0 caps it further
+    llm_context_window: int = 4096
+    prompt_task_token_budget: int = 0
+    
+    # Task ranking for next-task: "llm" (model sees tasks as given), "hybrid"
+    # (model sees the locally ranked top-k) or "local" (answer without the model)
+    ranker_mode: str = "hybrid"
+    ranker_top_k: int = 8
+    
+    # Day planning: working hours the local scheduler fills (user's timezone)
+    schedule_day_start_hour: int = 9
+    schedule_day_end_hour: int = 18
+    
+    # Response cache (next-task / plan-day)
+    response_cache_max_entries: int = 1024
+    response_cache_ttl_seconds: float = 900.0
+    response_cache_bucket_minutes: int = 15
+    response_cache_sqlite_path: Optional[str] = None
+    
+    # JSON responses of at least this many bytes are compressed (brotli when
+    # installed and accepted, else gzip); 0 disables compression
+    response_compression_min_bytes: int = 1024
+    response_gzip_level: int = 5
+    response_brotli_quality: int = 4
+    
+    # Pre-generated morning check-in greetings per (energy level, weekday,
+    # time of day, personality); size 0 serves every check-in live. Pools
+    # below low water are refilled in the background, and the prefill job
+    # fills the ones coming up within the lookahead every interval seconds.
+    checkin_pool_size: int = 12
+    checkin_pool_low_water: int = 4
+    checkin_pool_max_uses: int = 200
+    checkin_pool_variants_per_call: int = 6
+    checkin_pool_refill_concurrency: int = 4
+    checkin_pool_prefill_interval_seconds: float = 600.0
+    checkin_pool_lookahead_minutes: float = 60.0
+    checkin_pool_sqlite_path: Optional[str] = None
+    
+    # Batch planning (shared org-wide LLM budget)
+    batch_max_items: int = 5000
+    batch_max_concurrency: int = 8
+    batch_requests_per_minute: int = 3000
+    batch_tokens_per_minute: int = 250000
+    
+    # Most open tasks loaded from the task store for a chat request without tasks.
+    # They are kept per user in memory (LRU of TASK_SNAPSHOT_MAX_USERS users, 0
+    # disables) and updated on task writes; workers agree through the SQLite file
+    chat_task_load_limit: int = 200
+    task_snapshot_max_users: int = 10000
+    task_snapshot_sqlite_path: Optional[str] = None
+    
+    # Conversation sessions (session_id on chat requests). Prompts carry the
+    # rolling summary plus the latest turns up to CONVERSATION_HISTORY_TOKENS;
+    # once unsummarized turns pass SUMMARIZE_AFTER, all but the latest
+    # KEEP_RECENT tokens are folded into the summary (at most SUMMARY_MAX
+    # tokens). Sessions expire TTL seconds after their last turn and are kept
+    # in memory (LRU of MAX_SESSIONS) or in the SQLite file
+    conversation_history_tokens: int = 1200
+    conversation_summarize_after_tokens: int = 1000
+    conversation_keep_recent_tokens: int = 400
+    conversation_summary_max_tokens: int = 250
+    conversation_ttl_seconds: float = 86400.0
+    conversation_max_sessions: int = 10000
+    conversation_sqlite_path: Optional[str] = None
+    
+    # Per-client limits for the chat endpoints; over-limit calls get the local
+    # fallback instead of waiting. The address limits cover every key sent from
+    # one client address together. 0 disables a limit.
+    rate_limit_user_rpm: int = 30
+    rate_limit_address_rpm: int = 60
+    rate_limit_global_rpm: int = 600
+    user_daily_token_budget: int = 100000
+    address_daily_token_budget: int = 300000
+    rate_limit_sqlite_path: Optional[str] = None
+    
+    # Logging: JSON lines (or "text") written by a background thread; only
+    # LOG_SAMPLE_RATE of high-volume success lines are kept
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_sample_rate: float = 0.1
+    log_queue_size: int = 10000
     
     # Auth
     google_client_id: Optional[str] = None
@@ -32,19 +179,159 @@ class Settings:
     
     # Embeddings
     embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_batch_size: int = 64
+    embedding_cache_max_entries: int = 10000
+    
+    # User memories: recalled per chat request (top k at or above min score; k=0 disables)
+    memory_collection: str = "memories"
+    memory_top_k: int = 3
+    memory_min_score: float = 0.3
+    # Load the embedding model and open the index in the startup warmup
+    # (after the port is bound) instead of on the first memory request
+    memory_warmup: bool = True
+    # After the memory backend fails, chat answers without memories for this
+    # long before recall tries it again (not at all when it is not installed)
+    memory_retry_seconds: float = 300.0
+    
+    # Memory consolidation job (runs every interval seconds; 0 disables it).
+    # Relevance halves every half-life; memories below the prune threshold are
+    # deleted, near-duplicates merged, and memories older than summarize-after
+    # folded into per-topic summaries.
+    memory_consolidation_interval_seconds: float = 3600.0
+    memory_consolidation_chunk_size: int = 200
+    memory_decay_half_life_days: float = 30.0
+    memory_prune_threshold: float = 0.05
+    memory_merge_threshold: float = 0.92
+    memory_summarize_after_days: float = 30.0
+    memory_cluster_threshold: float = 0.75
+    memory_cluster_min_size: int = 3
+    memory_summary_max_chars: int = 600
     
     def __init__(self):
         """Load settings from environment variables"""
+        self.host = os.getenv("HOST", self.host)
+        self.port = int(os.getenv("PORT", self.port))
+        self.web_concurrency = int(os.getenv("WEB_CONCURRENCY", self.web_concurrency))
+        self.worker_graceful_timeout_seconds = float(os.getenv("WORKER_GRACEFUL_TIMEOUT_SECONDS", self.worker_graceful_timeout_seconds))
+        self.worker_max_requests = int(os.getenv("WORKER_MAX_REQUESTS", self.worker_max_requests))
+        self.shared_state_path = os.getenv("SHARED_STATE_PATH") or (
+            "data/shared_state.db" if self.web_concurrency != 1 else None
+        )
+        self.shared_state_sync_seconds = float(os.getenv("SHARED_STATE_SYNC_SECONDS", self.shared_state_sync_seconds))
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL") or None
+        self.openai_model = os.getenv("OPENAI_MODEL", self.openai_model)
+        self.anthropic_base_url = os.getenv("ANTHROPIC_BASE_URL") or None
+        self.anthropic_model = os.getenv("ANTHROPIC_MODEL", self.anthropic_model)
+        self.llm_providers = [
+            name.strip().lower() for name in os.getenv("LLM_PROVIDERS", ",".join(self.llm_providers)).split(",") if name.strip()
+        ]
+        self.llm_routing = os.getenv("LLM_ROUTING", self.llm_routing).lower()
+        self.llm_router_cost_weight = float(os.getenv("LLM_ROUTER_COST_WEIGHT", self.llm_router_cost_weight))
+        self.llm_router_error_penalty_seconds = float(os.getenv("LLM_ROUTER_ERROR_PENALTY_SECONDS", self.llm_router_error_penalty_seconds))
+        self.llm_router_explore_rate = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", self.llm_router_explore_rate))
+        self.openai_input_cost_per_1k = float(os.getenv("OPENAI_INPUT_COST_PER_1K", self.openai_input_cost_per_1k))
+        self.openai_output_cost_per_1k = float(os.getenv("OPENAI_OUTPUT_COST_PER_1K", self.openai_output_cost_per_1k))
+        self.anthropic_input_cost_per_1k = float(os.getenv("ANTHROPIC_INPUT_COST_PER_1K", self.anthropic_input_cost_per_1k))
+        self.anthropic_output_cost_per_1k = float(os.getenv("ANTHROPIC_OUTPUT_COST_PER_1K", self.anthropic_output_cost_per_1k))
+        self.llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", self.llm_max_connections))
+        self.llm_max_keepalive_connections = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", self.llm_max_keepalive_connections))
+        self.llm_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", self.llm_keepalive_expiry))
+        self.llm_timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", self.llm_timeout_seconds))
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", self.llm_max_retries))
+        self.llm_deadline_seconds = float(os.getenv("LLM_DEADLINE_SECONDS", self.llm_deadline_seconds))
+        self.llm_breaker_failure_ratio = float(os.getenv("LLM_BREAKER_FAILURE_RATIO", self.llm_breaker_failure_ratio))
+        self.llm_breaker_min_calls = int(os.getenv("LLM_BREAKER_MIN_CALLS", self.llm_breaker_min_calls))
+        self.llm_breaker_window_seconds = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", self.llm_breaker_window_seconds))
+        self.llm_breaker_slow_call_seconds = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", self.llm_breaker_slow_call_seconds))
+        self.llm_breaker_open_seconds = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", self.llm_breaker_open_seconds))
+        self.llm_breaker_half_open_probes = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", self.llm_breaker_half_open_probes))
+        self.llm_hedge_enabled = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("true", "1", "yes")
+        self.llm_hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", self.llm_hedge_percentile))
+        self.llm_hedge_min_delay_seconds = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", self.llm_hedge_min_delay_seconds))
+        self.llm_context_window = int(os.getenv("LLM_CONTEXT_WINDOW", self.llm_context_window))
+        self.prompt_task_token_budget = int(os.getenv("PROMPT_TASK_TOKEN_BUDGET", self.prompt_task_token_budget))
+        self.ranker_mode = os.getenv("RANKER_MODE", self.ranker_mode).lower()
+        self.ranker_top_k = int(os.getenv("RANKER_TOP_K", self.ranker_top_k))
+        self.schedule_day_start_hour = int(os.getenv("SCHEDULE_DAY_START_HOUR", self.schedule_day_start_hour))
+        self.schedule_day_end_hour = int(os.getenv("SCHEDULE_DAY_END_HOUR", self.schedule_day_end_hour))
+        self.response_cache_max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", self.response_cache_max_entries))
+        self.response_cache_ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", self.response_cache_ttl_seconds))
+        self.response_cache_bucket_minutes = int(os.getenv("RESPONSE_CACHE_BUCKET_MINUTES", self.response_cache_bucket_minutes))
+        self.response_cache_sqlite_path = os.getenv("RESPONSE_CACHE_SQLITE_PATH") or self.shared_state_path
+        self.response_compression_min_bytes = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", self.response_compression_min_bytes))
+        self.response_gzip_level = int(os.getenv("RESPONSE_GZIP_LEVEL", self.response_gzip_level))
+        self.response_brotli_quality = int(os.getenv("RESPONSE_BROTLI_QUALITY", self.response_brotli_quality))
+        self.checkin_pool_size = int(os.getenv("CHECKIN_POOL_SIZE", self.checkin_pool_size))
+        self.checkin_pool_low_water = int(os.getenv("CHECKIN_POOL_LOW_WATER", self.checkin_pool_low_water))
+        self.checkin_pool_max_uses = int(os.getenv("CHECKIN_POOL_MAX_USES", self.checkin_pool_max_uses))
+        self.checkin_pool_variants_per_call = int(os.getenv("CHECKIN_POOL_VARIANTS_PER_CALL", self.checkin_pool_variants_per_call))
+        self.checkin_pool_refill_concurrency = int(os.getenv("CHECKIN_POOL_REFILL_CONCURRENCY", self.checkin_pool_refill_concurrency))
+        self.checkin_pool_prefill_interval_seconds = float(os.getenv("CHECKIN_POOL_PREFILL_INTERVAL_SECONDS", self.checkin_pool_prefill_interval_seconds))
+        self.checkin_pool_lookahead_minutes = float(os.getenv("CHECKIN_POOL_LOOKAHEAD_MINUTES", self.checkin_pool_lookahead_minutes))
+        self.checkin_pool_sqlite_path = os.getenv("CHECKIN_POOL_SQLITE_PATH") or self.shared_state_path
+        self.batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", self.batch_max_items))
+        self.batch_max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", self.batch_max_concurrency))
+        self.batch_requests_per_minute = int(os.getenv("BATCH_REQUESTS_PER_MINUTE", self.batch_requests_per_minute))
+        self.batch_tokens_per_minute = int(os.getenv("BATCH_TOKENS_PER_MINUTE", self.batch_tokens_per_minute))
+        self.chat_task_load_limit = int(os.getenv("CHAT_TASK_LOAD_LIMIT", self.chat_task_load_limit))
+        self.task_snapshot_max_users = int(os.getenv("TASK_SNAPSHOT_MAX_USERS", self.task_snapshot_max_users))
+        self.task_snapshot_sqlite_path = os.getenv("TASK_SNAPSHOT_SQLITE_PATH") or self.shared_state_path
+        self.conversation_history_tokens = int(os.getenv("CONVERSATION_HISTORY_TOKENS", self.conversation_history_tokens))
+        self.conversation_summarize_after_tokens = int(os.getenv("CONVERSATION_SUMMARIZE_AFTER_TOKENS", self.conversation_summarize_after_tokens))
+        self.conversation_keep_recent_tokens = int(os.getenv("CONVERSATION_KEEP_RECENT_TOKENS", self.conversation_keep_recent_tokens))
+        self.conversation_summary_max_tokens = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", self.conversation_summary_max_tokens))
+        self.conversation_ttl_seconds = float(os.getenv("CONVERSATION_TTL_SECONDS", self.conversation_ttl_seconds))
+        self.conversation_max_sessions = int(os.getenv("CONVERSATION_MAX_SESSIONS", self.conversation_max_sessions))
+        self.conversation_sqlite_path = os.getenv("CONVERSATION_SQLITE_PATH") or self.shared_state_path
+        self.rate_limit_user_rpm = int(os.getenv("RATE_LIMIT_USER_RPM", self.rate_limit_user_rpm))
+        self.rate_limit_address_rpm = int(os.getenv("RATE_LIMIT_ADDRESS_RPM", self.rate_limit_address_rpm))
+        self.rate_limit_global_rpm = int(os.getenv("RATE_LIMIT_GLOBAL_RPM", self.rate_limit_global_rpm))
+        self.user_daily_token_budget = int(os.getenv("USER_DAILY_TOKEN_BUDGET", self.user_daily_token_budget))
+        self.address_daily_token_budget = int(os.getenv("ADDRESS_DAILY_TOKEN_BUDGET", self.address_daily_token_budget))
+        self.rate_limit_sqlite_path = os.getenv("RATE_LIMIT_SQLITE_PATH") or self.shared_state_path
+        self.chroma_db_path = os.getenv("CHROMA_DB_PATH", self.chroma_db_path)
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", self.embedding_model)
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", self.embedding_batch_size))
+        self.embedding_cache_max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", self.embedding_cache_max_entries))
+        self.memory_collection = os.getenv("MEMORY_COLLECTION", self.memory_collection)
+        self.memory_top_k = int(os.getenv("MEMORY_TOP_K", self.memory_top_k))
+        self.memory_min_score = float(os.getenv("MEMORY_MIN_SCORE", self.memory_min_score))
+        self.memory_warmup = os.getenv("MEMORY_WARMUP", "true").lower() in ("true", "1", "yes")
+        self.memory_retry_seconds = float(os.getenv("MEMORY_RETRY_SECONDS", self.memory_retry_seconds))
+        self.memory_consolidation_interval_seconds = float(os.getenv("MEMORY_CONSOLIDATION_INTERVAL_SECONDS", self.memory_consolidation_interval_seconds))
+        self.memory_consolidation_chunk_size = int(os.getenv("MEMORY_CONSOLIDATION_CHUNK_SIZE", self.memory_consolidation_chunk_size))
+        self.memory_decay_half_life_days = float(os.getenv("MEMORY_DECAY_HALF_LIFE_DAYS", self.memory_decay_half_life_days))
+        self.memory_prune_threshold = float(os.getenv("MEMORY_PRUNE_THRESHOLD", self.memory_prune_threshold))
+        self.memory_merge_threshold = float(os.getenv("MEMORY_MERGE_THRESHOLD", self.memory_merge_threshold))
+        self.memory_summarize_after_days = float(os.getenv("MEMORY_SUMMARIZE_AFTER_DAYS", self.memory_summarize_after_days))
+        self.memory_cluster_threshold = float(os.getenv("MEMORY_CLUSTER_THRESHOLD", self.memory_cluster_threshold))
+        self.memory_cluster_min_size = int(os.getenv("MEMORY_CLUSTER_MIN_SIZE", self.memory_cluster_min_size))
+        self.memory_summary_max_chars = int(os.getenv("MEMORY_SUMMARY_MAX_CHARS", self.memory_summary_max_chars))
+        self.log_level = os.getenv("LOG_LEVEL", self.log_level).upper()
+        self.log_format = os.getenv("LOG_FORMAT", self.log_format).lower()
+        self.log_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", self.log_sample_rate))
+        self.log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", self.log_queue_size))
         self.google_client_id = os.getenv("GOOGLE_CLIENT_ID")
         self.google_client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
         self.jwt_secret_key = os.getenv("JWT_SECRET_KEY", self.jwt_secret_key)
         self.database_url = os.getenv("DATABASE_URL", self.database_url)
+        self.database_pool_size = int(os.getenv("DATABASE_POOL_SIZE", self.database_pool_size))
+        self.database_max_overflow = int(os.getenv("DATABASE_MAX_OVERFLOW", self.database_max_overflow))
+        self.database_pool_timeout = float(os.getenv("DATABASE_POOL_TIMEOUT", self.database_pool_timeout))
+        self.sqlite_mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", self.sqlite_mmap_size))
+        self.sqlite_busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", self.sqlite_busy_timeout_ms))
         
         # Convert string 'true'/'false' to boolean
         debug_env = os.getenv("DEBUG", "true").lower()
         self.debug = debug_env in ("true", "1", "yes")
+        self.admin_token = os.getenv("ADMIN_TOKEN") or None
+    
+    def reload(self):
+        """Re-read the environment (and .env) in place"""
+        load_dotenv(override=True)
+        self.__init__()
 
 # Create global settings instance
 settings = Settings()
\ No newline at end of file
@@ -1,17 +1,118 @@
-﻿from sqlalchemy import create_engine
+﻿import asyncio
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
+from ..models.user import Base
+
+# Tries of init_db when workers starting together race to create the same table
+INIT_DB_ATTEMPTS = 3
+
+# Async drivers for the sync URLs in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its async driver (sqlite -> aiosqlite, postgresql -> asyncpg)"""
+    parsed = make_url(url)
+    if "+" in parsed.drivername:
+        backend, driver = parsed.drivername.split("+", 1)
+        if driver in ("aiosqlite", "asyncpg"):
+            return url
+    else:
+        backend = parsed.drivername
+    async_driver = ASYNC_DRIVERS.get(backend)
+    if async_driver is None:
+        raise ValueError(f"No async driver configured for {parsed.drivername!r}")
+    return parsed.set(drivername=async_driver).render_as_string(hide_password=False)
+
+def apply_sqlite_pragmas(sync_engine):
+    """
+    Tune every new SQLite connection: WAL lets readers run alongside the
+    writer, synchronous=NORMAL drops the fsync per commit (still safe in WAL),
+    mmap serves reads from the page cache, and busy_timeout waits for a lock
+    instead of failing with "database is locked".
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.close()
+
+def make_async_engine(url: str, sqlite_pragmas: bool = True) -> AsyncEngine:
+    """Async engine for url with the configured pool; SQLite files get the WAL pragmas"""
+    options = {"pool_pre_ping": True}
+    if not _is_memory_sqlite(url):
+        if _is_sqlite(url):
+            # aiosqlite defaults to NullPool (a new connection, and pragmas, per checkout)
+            options["poolclass"] = AsyncAdaptedQueuePool
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout
+        )
+    async_engine = create_async_engine(async_database_url(url), **options)
+    if sqlite_pragmas and _is_sqlite(url) and not _is_memory_sqlite(url):
+        apply_sqlite_pragmas(async_engine.sync_engine)
+    return async_engine
 
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
 )
+if _is_sqlite(settings.database_url) and not _is_memory_sqlite(settings.database_url):
+    apply_sqlite_pragmas(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async path used by the API handlers
+async_engine = make_async_engine(settings.database_url)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def init_db():
+    """
+    Create missing tables, and indexes added to existing tables since they were created.
+    A worker that loses a creation race to another one tries again and finds the table.
+    """
+    def create(connection):
+        Base.metadata.create_all(bind=connection)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+    for attempt in range(INIT_DB_ATTEMPTS):
+        try:
+            async with async_engine.begin() as connection:
+                await connection.run_sync(create)
+            return
+        except (OperationalError, ProgrammingError) as e:
+            if attempt == INIT_DB_ATTEMPTS - 1 or "already exists" not in str(e):
+                raise
+            await asyncio.sleep(0.1 * (attempt + 1))
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
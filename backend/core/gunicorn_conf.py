@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for serving with several worker processes:
+
+    gunicorn -c python:backend.core.gunicorn_conf backend.main:app
+
+Each worker runs the app on its own uvicorn event loop, with its own LLM
+connection pool and database engine (created in the app lifespan, after
+the fork). With more than one worker, the state the workers must agree on
+is kept in SHARED_STATE_PATH (see backend.core.shared_state).
+
+kill -HUP <master pid> restarts the workers gracefully. New workers start
+first; the old ones stop accepting connections and get
+WORKER_GRACEFUL_TIMEOUT_SECONDS to finish in-flight requests and streams.
+The same grace applies on SIGTERM (docker stop).
+"""
+import os
+
+from backend.core.config import settings
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.web_concurrency or os.cpu_count() or 1
+worker_class = "uvicorn.workers.UvicornWorker"
+
+graceful_timeout = int(settings.worker_graceful_timeout_seconds)
+# A worker whose event loop is stuck this long is killed and replaced
+timeout = max(60, int(settings.worker_graceful_timeout_seconds) * 2)
+keepalive = 5
+
+# Recycling, with jitter so the workers do not all restart at once
+max_requests = settings.worker_max_requests
+max_requests_jitter = settings.worker_max_requests // 10
+
+# Workers touch a heartbeat file; keep it off disk-backed /tmp in containers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# The app logs requests itself (RequestIdMiddleware)
+accesslog = None
+loglevel = settings.log_level.lower()
+
+
+def when_ready(server):
+    server.log.info(
+        "Serving with %d worker(s); shared state: %s", workers, settings.shared_state_path or "per process"
+    )
@@ -0,0 +1,70 @@
+"""
+Deferred imports for heavy dependencies.
+
+    np = lazy_import("numpy")
+
+binds a stand-in module object; the real module is imported on the first
+attribute access, so importing the app (and every cold start) does not pay
+for it. Modules used only in annotations stay deferred when the importing
+file has `from __future__ import annotations`.
+
+load_all() imports every module registered this way. The startup warmup
+runs it in a worker thread once the server is accepting connections, so
+requests seldom wait for an import.
+"""
+import importlib
+import sys
+from types import ModuleType
+from typing import Dict, List
+
+_registered: Dict[str, "LazyModule"] = {}
+
+
+class LazyModule(ModuleType):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_loaded"] = False
+
+    def _load(self) -> ModuleType:
+        # The import system's per-module lock makes concurrent first uses safe
+        module = importlib.import_module(self.__name__)
+        if not self.__dict__["_loaded"]:
+            # Copy the namespace so later lookups skip __getattr__
+            self.__dict__.update(module.__dict__)
+            self.__dict__["_loaded"] = True
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_loaded"] else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> ModuleType:
+    """The module if it is already imported, else a stand-in that imports it on first use"""
+    if name in sys.modules:
+        return sys.modules[name]
+    module = _registered.get(name)
+    if module is None:
+        module = _registered[name] = LazyModule(name)
+    return module
+
+
+def load_all() -> List[str]:
+    """Import every module still deferred; returns their names"""
+    loaded = []
+    for name, module in list(_registered.items()):
+        if not module.__dict__["_loaded"]:
+            module._load()
+            loaded.append(name)
+    return loaded
+
+
+def pending() -> List[str]:
+    """Deferred modules not imported yet"""
+    return [name for name, module in _registered.items() if not module.__dict__["_loaded"]]
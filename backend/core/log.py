@@ -0,0 +1,219 @@
+"""
+Structured logging: JSON lines written off the event loop.
+
+Callers use ordinary stdlib loggers (get_logger(__name__)). The root logger
+gets one QueueHandler. Emitting a record only captures the request id and
+enqueues it; formatting and the write to stdout happen on a QueueListener
+thread. The queue is bounded: when it is full, records are dropped and
+counted rather than blocking a request.
+
+Every record carries the id of the request it was logged in (see
+RequestIdMiddleware). High-volume success paths log through log_sampled(),
+which keeps LOG_SAMPLE_RATE of those lines. The decision is made before a
+record is built, so dropped lines cost one random() call. Warnings and
+errors are logged normally and never sampled.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, TextIO
+
+from .config import settings
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# LogRecord attributes that are not user-supplied fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "sampled", "taskName"
+}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def log_sampled(logger: logging.Logger, msg: str, level: int = logging.INFO, **fields):
+    """Log a high-volume success line with fields; only LOG_SAMPLE_RATE of calls are kept"""
+    if random.random() < settings.log_sample_rate and logger.isEnabledFor(level):
+        logger.log(level, msg, extra={**fields, "sampled": True})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, pid, request_id, extra fields, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if getattr(record, "sampled", False):
+            entry["sample_rate"] = settings.log_sample_rate
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development (LOG_FORMAT=text)"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues the record as-is (formatted by the listener); drops it when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Context variables do not reach the listener thread: capture the id now
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than failing when the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_NonBlockingQueueHandler] = None
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through the queue to `stream` (stdout by default) and
+    start the listener thread. Calling it again replaces the previous setup.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    # Record fields no formatter prints; skipping them makes each LogRecord
+    # cheaper to build (the caller lookup walks the stack). The pid stays:
+    # JSON lines and gunicorn's own log lines carry it.
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logMultiprocessing = False
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if settings.log_format == "text" else JsonFormatter())
+
+    _queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.log_level)
+
+    _listener = _QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+    }
+
+
+_access_logger = get_logger("timely.access")
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving each HTTP request a correlation id.
+
+    The id is the client's X-Request-ID when sent, else a new one. It is
+    set for everything logged while handling the request and returned in
+    the X-Request-ID response header. The middleware also writes one access
+    line per request: sampled when successful, always for 5xx.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode("latin-1"):
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            if status_code >= 500:
+                _access_logger.warning(
+                    "request failed",
+                    extra={"method": scope["method"], "route": route, "status": status_code, "duration_ms": duration_ms}
+                )
+            else:
+                log_sampled(
+                    _access_logger, "request",
+                    method=scope["method"], route=route, status=status_code, duration_ms=duration_ms
+                )
+            request_id_var.reset(token)
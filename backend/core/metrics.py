@@ -0,0 +1,296 @@
+"""
+In-process metrics, rendered in the Prometheus text exposition format at
+GET /metrics.
+
+The metric types mirror prometheus_client (Counter, Gauge, Histogram with
+.labels(...), .inc(), .observe(), .time()) without the dependency. Metrics
+are updated from the event loop thread only, so updates take no locks. A
+histogram observation is a bisect plus two additions, and label children
+are cached, so callers on hot paths keep the child from .labels() and pay
+no lookup at all.
+"""
+import math
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers local work (ms) through slow LLM completions
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Timer:
+    """Context manager observing the elapsed seconds into a histogram child"""
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    @property
+    def sample_name(self) -> str:
+        return self.name
+
+    def render(self) -> str:
+        name = self.sample_name
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _ValueChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    @property
+    def sample_name(self) -> str:
+        return f"{self.name}_total"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield f"{self.sample_name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # First bucket whose bound is >= value ("le" semantics); the last slot is +Inf
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}"
+            labels = _label_text(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def render() -> str:
+    """Every registered metric in the text exposition format"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# HTTP (recorded by MetricsMiddleware)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("timely_http_requests_in_flight", "HTTP requests being served")
+HTTP_REQUEST_DURATION = Histogram(
+    "timely_http_request_duration_seconds",
+    "HTTP request latency until the response is complete (whole stream for SSE)",
+    ["route", "method", "status"]
+)
+
+# Chat responses (backend.api.chat)
+CHAT_RESPONSES = Counter(
+    "timely_chat_responses",
+    "Chat responses by endpoint and source (llm, fallback, cached, pooled, rate_limited)",
+    ["endpoint", "source"]
+)
+LLM_TOKENS = Counter("timely_llm_tokens", "LLM tokens spent, by chat endpoint", ["endpoint"])
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "timely_response_cache_lookups", "Response cache lookups by result (hit_memory, hit_disk, miss, bypass)", ["result"]
+)
+RESPONSE_POOL_DRAWS = Counter(
+    "timely_response_pool_draws", "Pre-generated response draws by result (hit, repeat, miss)", ["result"]
+)
+
+# Upstream LLM calls (llm.agents.assistant)
+LLM_REQUEST_DURATION = Histogram(
+    "timely_llm_request_duration_seconds",
+    "Upstream LLM call latency per provider (streams: until the last chunk)",
+    ["provider", "mode", "outcome"]
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "timely_llm_time_to_first_token_seconds", "Time until the first streamed LLM token"
+)
+LLM_CIRCUIT_STATE = Gauge(
+    "timely_llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)", ["upstream"]
+)
+LLM_CIRCUIT_REJECTED = Counter(
+    "timely_llm_circuit_rejected", "LLM calls answered by the fallback because the circuit was open", ["upstream"]
+)
+LLM_HEDGES = Counter("timely_llm_hedges", "Hedged LLM attempts by result (fired, won)", ["result"])
+LLM_FAILOVERS = Counter(
+    "timely_llm_failovers", "LLM calls that failed on a provider and moved on to the next", ["provider"]
+)
+LLM_COST = Counter("timely_llm_cost_usd", "Estimated LLM spend in USD, by provider", ["provider"])
+
+# Stages of answering a chat request
+SPAN_DURATION = Histogram(
+    "timely_span_duration_seconds",
+    "Time spent per request stage (prompt_build, llm_call, response_assembly)",
+    ["span"]
+)
+PROMPT_BUILD_SPAN = SPAN_DURATION.labels("prompt_build")
+LLM_CALL_SPAN = SPAN_DURATION.labels("llm_call")
+RESPONSE_ASSEMBLY_SPAN = SPAN_DURATION.labels("response_assembly")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording in-flight requests and per-route latency.
+
+    Labelled by the matched route template (e.g. /api/v1/tasks/{task_id}),
+    never the raw path, so label cardinality stays bounded. Plain ASGI
+    rather than BaseHTTPMiddleware, which would add a task and a stream per
+    request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                getattr(route, "path", "unmatched"), scope["method"], status_code
+            ).observe(elapsed)
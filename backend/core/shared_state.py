@@ -0,0 +1,36 @@
+"""
+Connections to the SQLite files that worker processes on one host share:
+SHARED_STATE_PATH, or a component's own *_SQLITE_PATH.
+
+Each thread keeps one open connection per file, so a cache lookup or a rate
+limit check costs a query, not a connect. Connections are in autocommit
+mode; multi-statement writes use an explicit BEGIN IMMEDIATE. WAL lets
+readers run alongside the single writer. synchronous=NORMAL drops the
+fsync per commit: a power loss can lose the last commits but never corrupts
+the file, which suits caches and counters.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict
+
+from .config import settings
+
+_local = threading.local()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """This thread's connection to the SQLite file at path (created on first use)"""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=settings.sqlite_busy_timeout_ms / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    return conn
@@ -0,0 +1,95 @@
+"""
+Startup work that runs after the server is accepting connections.
+
+uvicorn binds its socket only once the lifespan startup has finished, so
+anything slow there (importing numpy or the LLM client, loading the
+embedding model) delays the port and fails liveness checks. The lifespan
+registers those steps on a Warmup instead and starts it; they run one
+after another in a background task while the process already answers
+/health/live.
+
+The process is ready (/health/ready) once every required step has
+succeeded. An optional step that fails is logged and the feature behind it
+loads on first use instead, as it would without a warmup.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+class WarmupStep(NamedTuple):
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    required: bool
+
+
+class Warmup:
+    def __init__(self):
+        self._steps: List[WarmupStep] = []
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+        self._elapsed: Optional[float] = None
+        self._failed = False
+
+    def add(self, name: str, run: Callable[[], Awaitable[Any]], required: bool = True):
+        """Register a step; run is called with no arguments and awaited"""
+        self._steps.append(WarmupStep(name, run, required))
+
+    @property
+    def done(self) -> bool:
+        return self._elapsed is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.done and not self._failed
+
+    def start(self):
+        if self._task is None:
+            self._started_at = time.perf_counter()
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self) -> bool:
+        """Wait for every step to finish; returns ready"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+        return self.ready
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        for step in self._steps:
+            start = time.perf_counter()
+            result = {"required": step.required}
+            try:
+                await step.run()
+            except Exception as exc:
+                result["error"] = f"{type(exc).__name__}: {exc}"
+                if step.required:
+                    self._failed = True
+                    logger.exception("Warmup step failed", extra={"step": step.name})
+                else:
+                    logger.warning("Optional warmup step failed", extra={"step": step.name, "error": result["error"]})
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            self._results[step.name] = result
+        self._elapsed = time.perf_counter() - self._started_at
+        logger.info("Warmup finished", extra={"ready": self.ready, "seconds": round(self._elapsed, 3)})
+
+    def stats(self) -> Dict[str, Any]:
+        running = self._started_at is not None and not self.done
+        return {
+            "ready": self.ready,
+            "seconds": round(self._elapsed if self.done else (time.perf_counter() - self._started_at), 3)
+            if self._started_at is not None else None,
+            "running": running,
+            "steps": self._results,
+            "pending": [step.name for step in self._steps if step.name not in self._results],
+        }
@@ -1,15 +1,138 @@
 ﻿# backend/main.py
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from datetime import datetime
 from .core.config import settings
+from .core.database import async_engine, init_db
+from .core import lazy, metrics
+from .core.log import RequestIdMiddleware, configure_logging, get_logger, shutdown_logging
+from .core.warmup import Warmup
 from .api.chat import router as chat_router
+from .api.deps import require_admin
+from .api.tasks import router as tasks_router
+from .api.memories import router as memories_router
+from .services.conversation_store import ConversationStore
+from .services.rate_limit import RateBudget, UsageLimiter
+from .services.response_cache import ResponseCache
+from .services.response_pool import ResponsePool
+from .services.task_snapshots import TaskSnapshotCache
+from llm.agents.checkin_pool import CheckinPool
+from llm.agents.conversations import ConversationManager
+from llm.agents.registry import AssistantRegistry
+from llm.memory.consolidation import MemoryConsolidator
+from llm.memory.service import MemoryService
+from llm.prompts import compiler
+
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create process-wide resources on startup and release them on shutdown"""
+    configure_logging()
+    logger.info("Starting", extra={
+        "app": settings.app_name,
+        "version": settings.app_version,
+        "debug": settings.debug,
+        "openai_configured": bool(settings.openai_api_key)
+    })
+    
+    # Tables and indexes for the task store
+    await init_db()
+    
+    # Shared LLM client with a warm connection pool, built by the warmup below
+    app.state.assistants = AssistantRegistry()
+    
+    async def start_assistants():
+        # A request may have built it already (the registry starts on first use)
+        if not app.state.assistants.started:
+            app.state.assistants.start()
+    
+    app.state.response_cache = ResponseCache(
+        max_entries=settings.response_cache_max_entries,
+        ttl_seconds=settings.response_cache_ttl_seconds,
+        bucket_minutes=settings.response_cache_bucket_minutes,
+        sqlite_path=settings.response_cache_sqlite_path
+    )
+    
+    # Pre-generated morning check-in greetings, refilled ahead of demand
+    app.state.checkin_pool = CheckinPool(app.state.assistants, ResponsePool(
+        size=settings.checkin_pool_size,
+        low_water=settings.checkin_pool_low_water,
+        max_uses=settings.checkin_pool_max_uses,
+        sqlite_path=settings.checkin_pool_sqlite_path
+    ))
+    app.state.checkin_pool.start(settings.checkin_pool_prefill_interval_seconds)
+    
+    # Users' open tasks for chat requests that send none, kept current by task writes
+    app.state.task_snapshots = TaskSnapshotCache(
+        max_users=settings.task_snapshot_max_users,
+        max_tasks=settings.chat_task_load_limit,
+        sqlite_path=settings.task_snapshot_sqlite_path
+    )
+    
+    # Multi-turn chat sessions; older turns are summarized in the background
+    app.state.conversations = ConversationManager(app.state.assistants, ConversationStore(
+        max_sessions=settings.conversation_max_sessions,
+        ttl_seconds=settings.conversation_ttl_seconds,
+        sqlite_path=settings.conversation_sqlite_path
+    ))
+    
+    # Budget shared by every batch planning call (in all workers with SHARED_STATE_PATH)
+    app.state.batch_budget = RateBudget(
+        requests_per_minute=settings.batch_requests_per_minute,
+        tokens_per_minute=settings.batch_tokens_per_minute,
+        sqlite_path=settings.shared_state_path,
+        name="batch"
+    )
+    
+    # Per-client request limits and daily token accounting for chat calls
+    app.state.usage_limiter = UsageLimiter(
+        user_requests_per_minute=settings.rate_limit_user_rpm,
+        global_requests_per_minute=settings.rate_limit_global_rpm,
+        user_daily_tokens=settings.user_daily_token_budget,
+        sqlite_path=settings.rate_limit_sqlite_path,
+        address_requests_per_minute=settings.rate_limit_address_rpm,
+        address_daily_tokens=settings.address_daily_token_budget
+    )
+    
+    # Nothing is loaded here: the embedding model and index open on first use
+    app.state.memory = MemoryService()
+    
+    # Periodic decay / merge / summarize / prune of stored memories
+    app.state.memory_consolidator = MemoryConsolidator(app.state.memory)
+    app.state.memory_consolidator.start(settings.memory_consolidation_interval_seconds)
+    
+    # Heavy imports and clients load after the port is bound; /health/ready waits for them
+    app.state.warmup = Warmup()
+    app.state.warmup.add("imports", lambda: asyncio.to_thread(lazy.load_all))
+    # Token counts fall back to an estimate when the encoding does not load
+    app.state.warmup.add("tokenizer", lambda: asyncio.to_thread(compiler.load_encoding), required=False)
+    app.state.warmup.add("llm", start_assistants)
+    if settings.memory_warmup:
+        app.state.warmup.add("memory", app.state.memory.warmup, required=False)
+    app.state.warmup.start()
+    
+    yield
+    
+    logger.info("Shutting down", extra={"app": settings.app_name})
+    await app.state.warmup.aclose()
+    await app.state.memory_consolidator.aclose()
+    await app.state.checkin_pool.aclose()
+    await app.state.conversations.aclose()
+    await app.state.assistants.aclose()
+    await async_engine.dispose()
+    shutdown_logging()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name, 
     version=settings.app_version,
-    description="AI-powered productivity coach for better time management"
+    description="AI-powered productivity coach for better time management",
+    lifespan=lifespan
 )
 
 # Add CORS middleware with specific origins
@@ -28,6 +151,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Correlation id for every log line of a request
+app.add_middleware(RequestIdMiddleware)
+
+# Outermost, so latency covers the whole request including other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 @app.get("/")
 async def root():
     """Root endpoint with basic app info"""
@@ -40,17 +169,59 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+async def health_check(request: Request):
+    """
+    Health check endpoint (always 200, see /health/live and /health/ready
+    for probes). "starting" until the startup warmup has finished,
+    "unhealthy" if a required warmup step failed, "degraded" while every LLM
+    provider's circuit is open and chat answers come from the local fallback.
+    """
+    warmup = request.app.state.warmup
+    assistants = request.app.state.assistants
+    # Never build the router here: that would pull the warmup's imports into this request
+    llm = assistants.assistant.router.stats() if assistants.started else None
+    all_open = bool(llm and llm["providers"]) and all(p["circuit"]["state"] == "open" for p in llm["providers"])
+    if not warmup.done:
+        health_status = "starting"
+    elif not warmup.ready:
+        health_status = "unhealthy"
+    else:
+        health_status = "degraded" if all_open else "healthy"
     return {
-        "status": "healthy",
+        "status": health_status,
+        "live": True,
+        "ready": warmup.ready,
         "timestamp": datetime.utcnow().isoformat(),
         "app": settings.app_name,
         "version": settings.app_version,
         "openai_configured": bool(settings.openai_api_key),
-        "database": settings.database_url.split("://")[0]
+        "database": settings.database_url.split("://")[0],
+        "worker": {"pid": os.getpid(), "shared_state": settings.shared_state_path},
+        "warmup": warmup.stats(),
+        "llm": llm
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "live"}
+
+@app.get("/health/ready")
+async def readiness(request: Request):
+    """Readiness probe: 503 until the startup warmup has loaded everything required"""
+    warmup = request.app.state.warmup
+    if not warmup.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "failed" if warmup.done else "starting", "warmup": warmup.stats()}
+        )
+    return {"status": "ready", "warmup": warmup.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
 @app.get("/config")
 async def config_check():
     """Configuration check (for debugging)"""
@@ -59,24 +230,29 @@ async def config_check():
         "debug_mode": settings.debug,
         "has_openai_key": bool(settings.openai_api_key),
         "has_anthropic_key": bool(settings.anthropic_api_key),
+        "llm_providers": settings.llm_providers,
+        "llm_routing": settings.llm_routing,
         "embedding_model": settings.embedding_model,
         "chroma_db_path": settings.chroma_db_path
     }
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup"""
-    print(f"Starting {settings.app_name} v{settings.app_version}")
-    print(f"Debug mode: {settings.debug}")
-    print(f"OpenAI key configured: {bool(settings.openai_api_key)}")
-    print(f"CORS enabled for frontend connections")
+async def config_reload(request: Request):
+    """Re-read configuration and rebuild the shared LLM client and providers"""
+    generation = await request.app.state.assistants.reload()
+    return {
+        "status": "reloaded",
+        "generation": generation,
+        "has_openai_key": bool(settings.openai_api_key),
+        "model": settings.openai_model,
+        "providers": request.app.state.assistants.assistant.router.provider_names,
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Run on application shutdown"""
-    print(f"Shutting down {settings.app_name}")
+# Admin only: not mounted at all unless debug is on and ADMIN_TOKEN is set
+if settings.debug and settings.admin_token:
+    app.post("/config/reload", dependencies=[Depends(require_admin)], include_in_schema=False)(config_reload)
 
 # Include API routers
-app.include_router(chat_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(chat_router, prefix="/api/v1")
+app.include_router(tasks_router, prefix="/api/v1")
+app.include_router(memories_router, prefix="/api/v1")
\ No newline at end of file
@@ -1,4 +1,4 @@
-﻿from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, Float
+﻿from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -22,6 +22,11 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Serves "a user's open tasks by due date" (chat task loading) and
+        # the paginated task list filtered by completion
+        Index("ix_tasks_user_completed_due", "user_id", "is_completed", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
@@ -42,11 +47,32 @@ class Task(Base):
 
 class Memory(Base):
     __tablename__ = "memories"
+    __table_args__ = (
+        # Keyset scans of the consolidation job (llm.memory.consolidation)
+        Index("ix_memories_updated_id", "updated_at", "id"),
+        Index("ix_memories_created_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
     content = Column(String)
     memory_type = Column(String)
     embedding_id = Column(String)
+    # Relevance as of updated_at; it decays from there (see llm.memory.consolidation)
     relevance_score = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Set explicitly when content or relevance changes, never on bookkeeping
+    # writes (no onupdate), since the consolidation job treats it as "changed"
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    # When the decayed relevance falls below the prune threshold
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+class JobState(Base):
+    __tablename__ = "job_state"
+    
+    # Progress and lease of a background job, shared by all workers
+    name = Column(String, primary_key=True)
+    cursor = Column(JSON, default={})
+    lease_owner = Column(String, nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Sequence
+
+from .rate_limit import RateBudget
+
+
+async def run_batch(
+    items: Sequence[Any],
+    worker: Callable[[Any, Callable[[], Awaitable[None]]], Awaitable[Dict[str, Any]]],
+    max_concurrency: int,
+    budget: RateBudget,
+    estimated_tokens: int = 0
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run worker(item, acquire) for every item with at most `max_concurrency`
+    in flight. The worker awaits acquire() before it calls the provider, which
+    waits for the shared rate budget and charges it; items answered without a
+    provider call (e.g. from the cache) leave the budget alone.
+
+    Yields {"index", "ok", "result" | "error"} in completion order. Results are
+    handed over through a small bounded queue, so a slow consumer (e.g. an
+    NDJSON response) applies backpressure instead of the batch piling up in
+    memory. Closing the iterator cancels outstanding work.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_concurrency) * 2)
+    indexes = iter(range(len(items)))
+
+    async def run_one(index: int) -> Dict[str, Any]:
+        acquired = False
+
+        async def acquire():
+            nonlocal acquired
+            if not acquired:
+                await budget.acquire(estimated_tokens)
+                acquired = True
+
+        try:
+            result = await worker(items[index], acquire)
+        except Exception as e:
+            if acquired:
+                await budget.settle(estimated_tokens, 0)
+            return {"index": index, "ok": False, "error": str(e)}
+        if acquired:
+            await budget.settle(estimated_tokens, result.get("tokens_used") or 0)
+        return {"index": index, "ok": True, "result": result}
+
+    async def consume():
+        # Workers share one iterator, so each index is taken exactly once
+        for index in indexes:
+            await queue.put(await run_one(index))
+
+    workers = [asyncio.ensure_future(consume()) for _ in range(max(1, min(max_concurrency, len(items))))]
+    done = asyncio.ensure_future(asyncio.gather(*workers))
+    try:
+        for _ in range(len(items)):
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done() and done.exception() is not None:
+                # A worker died unexpectedly; surface its exception
+                getter.cancel()
+                done.result()
+            yield await getter
+    finally:
+        for task in workers:
+            task.cancel()
+        done.cancel()
@@ -0,0 +1,304 @@
+import asyncio
+import secrets
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..core import shared_state
+
+
+class Turn(NamedTuple):
+    seq: int
+    role: str
+    content: str
+    tokens: int
+
+
+class Conversation(NamedTuple):
+    id: str
+    owner: str
+    # Rolling summary of every turn up to summarized_through
+    summary: str
+    summary_tokens: int
+    summarized_through: int
+    # Turns after summarized_through, oldest first
+    turns: Tuple[Turn, ...]
+    created_at: float
+    expires_at: float
+
+    @property
+    def turn_tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+
+class _Session:
+    """Memory tier record; turns are (seq, role, content, tokens) tuples"""
+
+    __slots__ = ("owner", "summary", "summary_tokens", "summarized_through", "turns", "next_seq", "created_at", "expires_at")
+
+    def __init__(self, owner: str, now: float, expires_at: float):
+        self.owner = owner
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summarized_through = 0
+        self.turns: List[Turn] = []
+        self.next_seq = 1
+        self.created_at = now
+        self.expires_at = expires_at
+
+    def snapshot(self, session_id: str) -> Conversation:
+        return Conversation(
+            session_id, self.owner, self.summary, self.summary_tokens, self.summarized_through,
+            tuple(self.turns), self.created_at, self.expires_at
+        )
+
+
+class ConversationStore:
+    """
+    Chat sessions: a rolling summary plus the turns not folded into it yet.
+
+    Turns are only ever appended; fold() replaces the oldest of them with a
+    new summary, so a session's size stays bounded by the summarization
+    thresholds rather than by its length. Sessions expire `ttl_seconds`
+    after their last turn.
+
+    Sessions live in memory (LRU of `max_sessions`), or in SQLite when
+    `sqlite_path` is set so every worker on the host serves the same
+    sessions. Appends are inserts and fold() only applies if no other fold
+    got there first, so concurrent requests on one session never lose turns.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 86400, sqlite_path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path or None
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._stats = {"created": 0, "appended": 0, "folds": 0, "fold_conflicts": 0, "expired": 0, "evictions": 0}
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    async def create(self, owner: str) -> Conversation:
+        session_id = secrets.token_urlsafe(16)
+        if self.sqlite_path:
+            conversation = await asyncio.to_thread(self._create_disk, session_id, owner)
+        else:
+            conversation = self._create_memory(session_id, owner)
+        self._stats["created"] += 1
+        return conversation
+
+    async def get(self, session_id: str) -> Optional[Conversation]:
+        """The session, or None when it does not exist or has expired"""
+        if self.sqlite_path:
+            return await asyncio.to_thread(self._get_disk, session_id)
+        session = self._live_session(session_id)
+        return session.snapshot(session_id) if session is not None else None
+
+    async def append(self, session_id: str, turns: Sequence[Tuple[str, str, int]]) -> Optional[int]:
+        """
+        Add (role, content, tokens) turns and extend the session's expiry.
+        Returns the tokens of all turns not summarized yet, None when the
+        session is gone.
+        """
+        if self.sqlite_path:
+            pending = await asyncio.to_thread(self._append_disk, session_id, turns)
+        else:
+            pending = self._append_memory(session_id, turns)
+        if pending is not None:
+            self._stats["appended"] += len(turns)
+        return pending
+
+    async def fold(self, session_id: str, summary: str, summary_tokens: int, through: int, expected_through: int) -> bool:
+        """
+        Replace the turns up to seq `through` with `summary`. Applies only if
+        the session was still summarized through `expected_through` (another
+        fold may have won); returns whether it did.
+        """
+        if self.sqlite_path:
+            folded = await asyncio.to_thread(self._fold_disk, session_id, summary, summary_tokens, through, expected_through)
+        else:
+            folded = self._fold_memory(session_id, summary, summary_tokens, through, expected_through)
+        self._stats["folds" if folded else "fold_conflicts"] += 1
+        return folded
+
+    async def delete(self, session_id: str) -> bool:
+        if self.sqlite_path:
+            return await asyncio.to_thread(self._delete_disk, session_id)
+        return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            **self._stats,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_tier": self.sqlite_path is not None,
+        }
+        if self.sqlite_path is None:
+            stats["sessions"] = len(self._sessions)
+            stats["max_sessions"] = self.max_sessions
+            stats["turns"] = sum(len(session.turns) for session in self._sessions.values())
+        return stats
+
+    # Memory tier
+
+    def _create_memory(self, session_id: str, owner: str) -> Conversation:
+        now = time.time()
+        session = self._sessions[session_id] = _Session(owner, now, now + self.ttl_seconds)
+        while len(self._sessions) > max(1, self.max_sessions):
+            self._sessions.popitem(last=False)
+            self._stats["evictions"] += 1
+        return session.snapshot(session_id)
+
+    def _live_session(self, session_id: str) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires_at <= time.time():
+            del self._sessions[session_id]
+            self._stats["expired"] += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _append_memory(self, session_id: str, turns: Sequence[Tuple[str, str, int]]) -> Optional[int]:
+        session = self._live_session(session_id)
+        if session is None:
+            return None
+        for role, content, tokens in turns:
+            session.turns.append(Turn(session.next_seq, role, content, tokens))
+            session.next_seq += 1
+        session.expires_at = time.time() + self.ttl_seconds
+        return sum(turn.tokens for turn in session.turns)
+
+    def _fold_memory(self, session_id: str, summary: str, summary_tokens: int, through: int, expected_through: int) -> bool:
+        session = self._live_session(session_id)
+        if session is None or session.summarized_through != expected_through:
+            return False
+        session.summary = summary
+        session.summary_tokens = summary_tokens
+        session.summarized_through = through
+        session.turns = [turn for turn in session.turns if turn.seq > through]
+        return True
+
+    # SQLite tier
+
+    def _connect(self) -> sqlite3.Connection:
+        return shared_state.connect(self.sqlite_path)
+
+    def _init_sqlite(self):
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_sessions ("
+                "id TEXT PRIMARY KEY, owner TEXT NOT NULL, summary TEXT NOT NULL DEFAULT '', "
+                "summary_tokens INTEGER NOT NULL DEFAULT 0, summarized_through INTEGER NOT NULL DEFAULT 0, "
+                "next_seq INTEGER NOT NULL DEFAULT 1, created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_sessions_expires ON conversation_sessions (expires_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_turns ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+                "tokens INTEGER NOT NULL, PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+        self._purge_disk()
+
+    def _purge_disk(self):
+        """Drop expired sessions and their turns"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM conversation_sessions WHERE expires_at <= ?", (time.time(),)
+            )]
+            for session_id in expired:
+                conn.execute("DELETE FROM conversation_turns WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM conversation_sessions WHERE id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._stats["expired"] += len(expired)
+
+    def _create_disk(self, session_id: str, owner: str) -> Conversation:
+        # New sessions are rare next to turns, so expiry is swept here
+        self._purge_disk()
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO conversation_sessions (id, owner, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (session_id, owner, now, now + self.ttl_seconds)
+        )
+        return Conversation(session_id, owner, "", 0, 0, (), now, now + self.ttl_seconds)
+
+    def _get_disk(self, session_id: str) -> Optional[Conversation]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT owner, summary, summary_tokens, summarized_through, created_at, expires_at "
+            "FROM conversation_sessions WHERE id = ? AND expires_at > ?",
+            (session_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        owner, summary, summary_tokens, summarized_through, created_at, expires_at = row
+        turns = tuple(Turn(*turn) for turn in conn.execute(
+            "SELECT seq, role, content, tokens FROM conversation_turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+            (session_id, summarized_through)
+        ))
+        return Conversation(session_id, owner, summary, summary_tokens, summarized_through, turns, created_at, expires_at)
+
+    def _append_disk(self, session_id: str, turns: Sequence[Tuple[str, str, int]]) -> Optional[int]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "UPDATE conversation_sessions SET next_seq = next_seq + ?, expires_at = ? "
+                "WHERE id = ? AND expires_at > ? RETURNING next_seq, summarized_through",
+                (len(turns), now + self.ttl_seconds, session_id, now)
+            ).fetchall()
+            if not rows:
+                conn.execute("COMMIT")
+                return None
+            next_seq, summarized_through = rows[0]
+            first_seq = next_seq - len(turns)
+            conn.executemany(
+                "INSERT INTO conversation_turns (session_id, seq, role, content, tokens) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, first_seq + i, role, content, tokens) for i, (role, content, tokens) in enumerate(turns)]
+            )
+            pending = conn.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM conversation_turns WHERE session_id = ? AND seq > ?",
+                (session_id, summarized_through)
+            ).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return pending
+
+    def _fold_disk(self, session_id: str, summary: str, summary_tokens: int, through: int, expected_through: int) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            folded = conn.execute(
+                "UPDATE conversation_sessions SET summary = ?, summary_tokens = ?, summarized_through = ? "
+                "WHERE id = ? AND summarized_through = ?",
+                (summary, summary_tokens, through, session_id, expected_through)
+            ).rowcount == 1
+            if folded:
+                conn.execute("DELETE FROM conversation_turns WHERE session_id = ? AND seq <= ?", (session_id, through))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return folded
+
+    def _delete_disk(self, session_id: str) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM conversation_turns WHERE session_id = ?", (session_id,))
+            deleted = conn.execute("DELETE FROM conversation_sessions WHERE id = ?", (session_id,)).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
@@ -0,0 +1,188 @@
+"""
+Deterministic task ranking for "what should I do next".
+
+Scores every task on four features and combines them with fixed weights:
+
+- priority: low/medium/high/urgent mapped onto 0.25..1
+- urgency: decays with time left until due_date (half-life URGENCY_HALF_LIFE_HOURS);
+  overdue tasks score 1, tasks without a due date 0. A due_date without a
+  UTC offset is read in the user's timezone (that of `now`), else UTC.
+- energy: how well energy_required matches the user's current energy
+- fit: 1 if estimated_duration fits the available window, else window/duration
+
+Tasks are first converted to column arrays (TaskArrays); scoring is then a
+handful of vectorized numpy operations, so ranking thousands of tasks costs
+microseconds once the arrays exist.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone, tzinfo
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+PRIORITY_SCORES = {"low": 0.25, "medium": 0.5, "high": 0.75, "urgent": 1.0}
+ENERGY_LEVELS = {"low": 0, "medium": 1, "high": 2}
+URGENCY_HALF_LIFE_HOURS = 24.0
+DEFAULT_DURATION_MINUTES = 30
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass(frozen=True)
+class RankerWeights:
+    priority: float = 0.4
+    urgency: float = 0.3
+    energy: float = 0.2
+    fit: float = 0.1
+    context: float = 0.15
+
+
+DEFAULT_WEIGHTS = RankerWeights()
+
+
+def _parse_due(value: Any, tz: Optional[tzinfo] = None) -> float:
+    """Due date as epoch seconds (naive ones in tz, default UTC), NaN when missing or unparseable"""
+    if not value:
+        return np.nan
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return np.nan
+    if value.tzinfo is None:
+        # Cheaper than value.replace(tzinfo=...).timestamp(), which matters for thousands of tasks
+        return (value - _EPOCH - (tz or timezone.utc).utcoffset(value)).total_seconds()
+    return value.timestamp()
+
+
+def _now(now: Optional[datetime]) -> datetime:
+    return now or datetime.now(timezone.utc)
+
+
+@dataclass
+class TaskArrays:
+    """Column-oriented view of a task list"""
+    priority: np.ndarray
+    due: np.ndarray
+    duration: np.ndarray
+    energy: np.ndarray
+    tags: List[frozenset]
+
+    @classmethod
+    def from_tasks(cls, tasks: Sequence[Dict[str, Any]], tz: Optional[tzinfo] = None) -> "TaskArrays":
+        """tz: the user's timezone, for due dates without an offset (default UTC)"""
+        count = len(tasks)
+        return cls(
+            priority=np.fromiter(
+                (PRIORITY_SCORES.get(task.get("priority"), 0.5) for task in tasks), dtype=np.float64, count=count
+            ),
+            due=np.fromiter((_parse_due(task.get("due_date"), tz) for task in tasks), dtype=np.float64, count=count),
+            duration=np.fromiter(
+                (task.get("estimated_duration") or DEFAULT_DURATION_MINUTES for task in tasks),
+                dtype=np.float64, count=count
+            ),
+            energy=np.fromiter(
+                (ENERGY_LEVELS.get(task.get("energy_required"), 1) for task in tasks), dtype=np.float64, count=count
+            ),
+            tags=[frozenset(task.get("context_tags") or ()) for task in tasks],
+        )
+
+
+def score_arrays(
+    arrays: TaskArrays,
+    energy_level: str = "medium",
+    available_minutes: Optional[float] = None,
+    context_tags: Optional[Sequence[str]] = None,
+    now: Optional[datetime] = None,
+    weights: RankerWeights = DEFAULT_WEIGHTS
+) -> Dict[str, np.ndarray]:
+    """Per-feature scores and the weighted total, one entry per task"""
+    now_ts = _now(now).timestamp()
+
+    hours_left = (arrays.due - now_ts) / 3600.0
+    urgency = np.where(np.isnan(hours_left), 0.0, np.exp2(-np.clip(hours_left, 0.0, None) / URGENCY_HALF_LIFE_HOURS))
+
+    user_energy = ENERGY_LEVELS.get(energy_level, 1)
+    energy = 1.0 - np.abs(arrays.energy - user_energy) / 2.0
+
+    if available_minutes:
+        fit = np.minimum(1.0, available_minutes / np.maximum(arrays.duration, 1.0))
+    else:
+        fit = np.ones_like(arrays.duration)
+
+    total = (
+        weights.priority * arrays.priority
+        + weights.urgency * urgency
+        + weights.energy * energy
+        + weights.fit * fit
+    )
+
+    features = {"priority": arrays.priority, "urgency": urgency, "energy": energy, "fit": fit}
+    if context_tags:
+        wanted = frozenset(context_tags)
+        context = np.fromiter(
+            (len(tags & wanted) / len(wanted) for tags in arrays.tags), dtype=np.float64, count=len(arrays.tags)
+        )
+        total = total + weights.context * context
+        features["context"] = context
+
+    features["total"] = total
+    return features
+
+
+def rank_indices(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """Indices of the best k scores, best first (stable for ties)"""
+    count = len(scores)
+    if k is not None and k < count:
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.lexsort((top, -scores[top]))]
+    return np.argsort(-scores, kind="stable")
+
+
+def rank_tasks(
+    tasks: Sequence[Dict[str, Any]],
+    energy_level: str = "medium",
+    available_minutes: Optional[float] = None,
+    context_tags: Optional[Sequence[str]] = None,
+    k: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Tasks ordered best first (at most k); now: the user's current time"""
+    if not tasks:
+        return []
+    scores = score_arrays(TaskArrays.from_tasks(tasks, _now(now).tzinfo), energy_level, available_minutes, context_tags, now)
+    return [tasks[i] for i in rank_indices(scores["total"], k)]
+
+
+def explain_choice(
+    task: Dict[str, Any],
+    energy_level: str = "medium",
+    available_minutes: Optional[float] = None,
+    now: Optional[datetime] = None
+) -> str:
+    """Short human-readable reason for a ranked task, for local answers"""
+    reasons = []
+    now = _now(now)
+    due = _parse_due(task.get("due_date"), now.tzinfo)
+    if not np.isnan(due):
+        hours_left = (due - now.timestamp()) / 3600.0
+        if hours_left <= 0:
+            reasons.append("it's overdue")
+        elif hours_left < 24:
+            reasons.append(f"it's due in about {max(1, round(hours_left))}h")
+    priority = task.get("priority", "medium")
+    if priority in ("high", "urgent"):
+        reasons.append(f"it's marked {priority} priority")
+    if task.get("energy_required", "medium") == energy_level:
+        reasons.append(f"it matches your {energy_level} energy")
+    duration = task.get("estimated_duration") or DEFAULT_DURATION_MINUTES
+    if available_minutes and duration <= available_minutes:
+        reasons.append(f"it fits in your {int(available_minutes)} free minutes")
+
+    if not reasons:
+        return "Best overall match for your priorities and energy right now"
+    reason = ", ".join(reasons[:-1]) + (" and " if len(reasons) > 1 else "") + reasons[-1]
+    return reason[0].upper() + reason[1:]
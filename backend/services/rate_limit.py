@@ -0,0 +1,422 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core import shared_state
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at `rate` per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        # Requests larger than the bucket only need a full bucket, not more
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        """Remove tokens; may go negative to record debt from under-estimates"""
+        self._refill()
+        self.tokens -= amount
+
+
+# Buckets kept in SQLite (by RateBudget and UsageLimiter) use wall-clock
+# time, since monotonic clocks differ per process
+
+def _init_buckets(conn: sqlite3.Connection):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS rate_buckets ("
+        "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+
+
+def _bucket_level(conn: sqlite3.Connection, key: str, per_minute: int, now: float) -> float:
+    row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return float(per_minute)
+    tokens, updated_at = row
+    return min(per_minute, tokens + max(0.0, now - updated_at) * per_minute / 60)
+
+
+def _save_buckets(conn: sqlite3.Connection, levels: List[Tuple[str, float]], now: float):
+    conn.executemany(
+        "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+        [(key, level, now) for key, level in levels]
+    )
+
+
+class RateBudget:
+    """
+    Requests-per-minute and tokens-per-minute budget shared by callers.
+
+    acquire() waits (FIFO) until both buckets allow the call, reserving an
+    estimate of its tokens; settle() corrects the reservation once the real
+    tokens_used is known. A limit of 0 disables that bucket.
+
+    With `sqlite_path` the buckets live in SQLite under `name`, so every
+    worker on the host draws from one budget. There acquire() reserves at
+    once (the buckets may go into debt) and then sleeps until the reservation
+    is covered; callers in all workers queue in reservation order.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        sqlite_path: Optional[str] = None,
+        name: str = "budget"
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute > 0 else None
+        self.sqlite_path = sqlite_path or None
+        self.name = name
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+        if self.sqlite_path:
+            with shared_state.connect(self.sqlite_path) as conn:
+                _init_buckets(conn)
+
+    async def acquire(self, estimated_tokens: int = 0):
+        async with self._lock:
+            if self.sqlite_path:
+                wait = await asyncio.to_thread(self._reserve_disk, estimated_tokens)
+                if wait > 0:
+                    self.waited_seconds += wait
+                    await asyncio.sleep(wait)
+                return
+            while True:
+                wait = max(
+                    self.requests.wait_time(1) if self.requests else 0.0,
+                    self.tokens.wait_time(estimated_tokens) if self.tokens else 0.0,
+                )
+                if wait <= 0:
+                    break
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(estimated_tokens)
+
+    async def settle(self, estimated_tokens: int, actual_tokens: int):
+        if not self.tokens or actual_tokens == estimated_tokens:
+            return
+        if self.sqlite_path:
+            correction = (self._key("tokens"), self.tokens_per_minute, actual_tokens - estimated_tokens)
+            await asyncio.to_thread(self._take_disk, [correction])
+        else:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.sqlite_path:
+            now = time.time()
+            conn = shared_state.connect(self.sqlite_path)
+            requests = _bucket_level(conn, self._key("requests"), self.requests_per_minute, now) if self.requests else None
+            tokens = _bucket_level(conn, self._key("tokens"), self.tokens_per_minute, now) if self.tokens else None
+        else:
+            requests = self.requests.tokens if self.requests else None
+            tokens = self.tokens.tokens if self.tokens else None
+        return {
+            "requests_available": round(requests, 2) if requests is not None else None,
+            "tokens_available": round(tokens, 2) if tokens is not None else None,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "shared_store": self.sqlite_path is not None,
+        }
+
+    # SQLite store
+
+    def _key(self, bucket: str) -> str:
+        return f"{self.name}:{bucket}"
+
+    def _reserve_disk(self, estimated_tokens: int) -> float:
+        """Take the call's share of both buckets; seconds until the buckets were able to cover it"""
+        takes = []
+        if self.requests:
+            takes.append((self._key("requests"), self.requests_per_minute, 1))
+        if self.tokens:
+            takes.append((self._key("tokens"), self.tokens_per_minute, estimated_tokens))
+        return self._take_disk(takes)
+
+    def _take_disk(self, takes: List[Tuple[str, int, float]]) -> float:
+        conn = shared_state.connect(self.sqlite_path)
+        # IMMEDIATE takes the write lock up front so read-check-write is atomic across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            wait = 0.0
+            levels = []
+            for key, per_minute, amount in takes:
+                level = _bucket_level(conn, key, per_minute, now)
+                # Requests larger than the bucket only need a full bucket, not more
+                needed = min(amount, per_minute)
+                if level < needed:
+                    wait = max(wait, (needed - level) * 60 / per_minute)
+                levels.append((key, level - amount))
+            _save_buckets(conn, levels, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class UsageLimiter:
+    """
+    Per-client and global request rate limits plus daily token accounting.
+
+    Unlike RateBudget this never waits: admit() answers immediately with None
+    (go ahead) or the reason the call should use the local fallback instead:
+
+    - "user_rate": the client's requests-per-minute bucket is empty
+    - "address_rate": the client address's requests-per-minute bucket is empty
+    - "global_rate": the process/org-wide requests-per-minute bucket is empty
+    - "daily_tokens": the client has used its tokens for the day (UTC)
+    - "address_tokens": so have all clients at its address together
+
+    Client keys are not verified identities yet, so a caller could get a
+    fresh key (and fresh limits) per request; the per-address limits, on the
+    `address` passed to admit() and record(), bound what one address can use
+    however many keys it sends.
+
+    record() adds a call's tokens_used to the daily totals. Buckets and
+    totals live in memory, or in SQLite when `sqlite_path` is set so every
+    worker on the host shares them; there, rows of idle (full) buckets and
+    past days are deleted every PRUNE_INTERVAL_SECONDS. A limit of 0
+    disables that check.
+    """
+
+    GLOBAL_KEY = "*"
+    PRUNE_INTERVAL_SECONDS = 60.0
+
+    def __init__(
+        self,
+        user_requests_per_minute: int = 0,
+        global_requests_per_minute: int = 0,
+        user_daily_tokens: int = 0,
+        sqlite_path: Optional[str] = None,
+        max_clients: int = 10000,
+        address_requests_per_minute: int = 0,
+        address_daily_tokens: int = 0
+    ):
+        self.user_requests_per_minute = user_requests_per_minute
+        self.global_requests_per_minute = global_requests_per_minute
+        self.user_daily_tokens = user_daily_tokens
+        self.address_requests_per_minute = address_requests_per_minute
+        self.address_daily_tokens = address_daily_tokens
+        self.sqlite_path = sqlite_path or None
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._global = (
+            TokenBucket(global_requests_per_minute / 60, global_requests_per_minute)
+            if global_requests_per_minute > 0 else None
+        )
+        self._usage: Dict[str, int] = {}
+        self._usage_day = self._today()
+        self._stats = {
+            "admitted": 0, "user_rate": 0, "address_rate": 0, "global_rate": 0,
+            "daily_tokens": 0, "address_tokens": 0
+        }
+        self._pruned_at = 0.0
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).date().isoformat()
+
+    @staticmethod
+    def _address_key(address: Optional[str]) -> Optional[str]:
+        return f"addr:{address}" if address else None
+
+    def _limits(self, key: str, address: Optional[str]) -> List[Tuple[str, int, int, str, str]]:
+        """(key, requests per minute, daily tokens, rate reason, token reason) for the client and its address"""
+        limits = [(key, self.user_requests_per_minute, self.user_daily_tokens, "user_rate", "daily_tokens")]
+        address_key = self._address_key(address)
+        if address_key is not None and address_key != key:
+            limits.append((
+                address_key, self.address_requests_per_minute, self.address_daily_tokens,
+                "address_rate", "address_tokens"
+            ))
+        return limits
+
+    async def admit(self, key: str, check_rate: bool = True, address: Optional[str] = None) -> Optional[str]:
+        """None when the call may use the LLM, else the limit that was hit; address: the client's"""
+        limits = self._limits(key, address)
+        if self.sqlite_path:
+            reason = await asyncio.to_thread(self._admit_disk, limits, check_rate)
+        else:
+            reason = self._admit_memory(limits, check_rate)
+        self._stats[reason or "admitted"] += 1
+        return reason
+
+    async def record(self, key: str, tokens_used: int, address: Optional[str] = None):
+        if tokens_used <= 0:
+            return
+        keys = [limit[0] for limit in self._limits(key, address)]
+        if self.sqlite_path:
+            await asyncio.to_thread(self._record_disk, keys, tokens_used)
+        else:
+            self._roll_day()
+            for usage_key in keys:
+                self._usage[usage_key] = self._usage.get(usage_key, 0) + tokens_used
+
+    async def usage(self, key: str) -> Dict[str, Any]:
+        """The client's token use today and what is left of its budget"""
+        if self.sqlite_path:
+            used = await asyncio.to_thread(self._usage_disk, key)
+        else:
+            self._roll_day()
+            used = self._usage.get(key, 0)
+        return {
+            "day": self._today(),
+            "tokens_used": used,
+            "daily_token_budget": self.user_daily_tokens or None,
+            "tokens_remaining": max(0, self.user_daily_tokens - used) if self.user_daily_tokens else None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "user_requests_per_minute": self.user_requests_per_minute,
+            "address_requests_per_minute": self.address_requests_per_minute,
+            "global_requests_per_minute": self.global_requests_per_minute,
+            "user_daily_tokens": self.user_daily_tokens,
+            "address_daily_tokens": self.address_daily_tokens,
+            "tracked_clients": len(self._buckets),
+            "shared_store": self.sqlite_path is not None,
+        }
+
+    # Memory store
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self._usage_day:
+            self._usage.clear()
+            self._usage_day = today
+
+    def _client_bucket(self, key: str, per_minute: int) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(per_minute / 60, per_minute)
+            # Forgetting the least recently seen client only refills its bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def _admit_memory(self, limits: List[Tuple[str, int, int, str, str]], check_rate: bool) -> Optional[str]:
+        self._roll_day()
+        for key, _, daily_tokens, _, token_reason in limits:
+            if daily_tokens and self._usage.get(key, 0) >= daily_tokens:
+                return token_reason
+        if not check_rate:
+            return None
+        buckets = []
+        for key, per_minute, _, rate_reason, _ in limits:
+            bucket = self._client_bucket(key, per_minute) if per_minute > 0 else None
+            if bucket and bucket.wait_time(1) > 0:
+                return rate_reason
+            buckets.append(bucket)
+        if self._global and self._global.wait_time(1) > 0:
+            return "global_rate"
+        # Take from every bucket only once all of them allow the call
+        for bucket in (*buckets, self._global):
+            if bucket:
+                bucket.take(1)
+        return None
+
+    # SQLite store
+
+    def _connect(self) -> sqlite3.Connection:
+        return shared_state.connect(self.sqlite_path)
+
+    def _init_sqlite(self):
+        with self._connect() as conn:
+            _init_buckets(conn)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_usage ("
+                "key TEXT NOT NULL, day TEXT NOT NULL, tokens INTEGER NOT NULL, PRIMARY KEY (key, day))"
+            )
+            conn.execute("DELETE FROM token_usage WHERE day < ?", (self._today(),))
+
+    @staticmethod
+    def _bucket_key(key: str) -> str:
+        # Prefixed apart from RateBudget rows, so pruning never touches those
+        return f"rate:{key}"
+
+    def _prune_disk(self, conn: sqlite3.Connection, now: float):
+        """Drop rows of buckets idle long enough to be full again, and past days' usage"""
+        if now - self._pruned_at < self.PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = now
+        # Limiter buckets never go below 0 and refill completely within a minute
+        conn.execute("DELETE FROM rate_buckets WHERE key LIKE 'rate:%' AND updated_at < ?", (now - 60,))
+        conn.execute("DELETE FROM token_usage WHERE day < ?", (self._today(),))
+
+    def _admit_disk(self, limits: List[Tuple[str, int, int, str, str]], check_rate: bool) -> Optional[str]:
+        with self._connect() as conn:
+            for key, _, daily_tokens, _, token_reason in limits:
+                if daily_tokens and self._usage_on(conn, key) >= daily_tokens:
+                    return token_reason
+            if not check_rate:
+                return None
+            now = time.time()
+            self._prune_disk(conn, now)
+            # IMMEDIATE takes the write lock up front so read-check-write is atomic across workers
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = []
+                for bucket_key, per_minute, reason in (
+                    *((self._bucket_key(key), per_minute, rate_reason) for key, per_minute, _, rate_reason, _ in limits),
+                    (self._bucket_key(self.GLOBAL_KEY), self.global_requests_per_minute, "global_rate"),
+                ):
+                    if per_minute <= 0:
+                        continue
+                    level = _bucket_level(conn, bucket_key, per_minute, now)
+                    if level < 1:
+                        conn.execute("ROLLBACK")
+                        return reason
+                    levels.append((bucket_key, level - 1))
+                _save_buckets(conn, levels, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return None
+
+    def _usage_on(self, conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute(
+            "SELECT tokens FROM token_usage WHERE key = ? AND day = ?", (key, self._today())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _usage_disk(self, key: str) -> int:
+        with self._connect() as conn:
+            return self._usage_on(conn, key)
+
+    def _record_disk(self, keys: List[str], tokens_used: int):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO token_usage (key, day, tokens) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, day) DO UPDATE SET tokens = tokens + excluded.tokens",
+                [(key, self._today(), tokens_used) for key in keys]
+            )
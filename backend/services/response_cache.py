@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..core import shared_state
+from ..core.metrics import RESPONSE_CACHE_LOOKUPS
+
+CACHE_MEMORY_HITS = RESPONSE_CACHE_LOOKUPS.labels("hit_memory")
+CACHE_DISK_HITS = RESPONSE_CACHE_LOOKUPS.labels("hit_disk")
+CACHE_MISSES = RESPONSE_CACHE_LOOKUPS.labels("miss")
+CACHE_BYPASSES = RESPONSE_CACHE_LOOKUPS.labels("bypass")
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _normalize_task(task: Dict[str, Any]) -> str:
+    """
+    Only the fields that change what the assistant would answer, as one
+    string: clients send mixed types (None vs "high", "30" vs 45), so raw
+    values would not sort against each other
+    """
+    return json.dumps([
+        _normalize_text(task.get("title")),
+        task.get("priority", "medium"),
+        task.get("estimated_duration", 30),
+        str(task.get("due_date") or ""),
+        task.get("energy_required", "medium"),
+    ], separators=(",", ":"), default=str)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for assistant responses.
+
+    The memory tier is a bounded LRU with per-entry TTL; the optional SQLite
+    tier survives restarts and is shared by workers on the same host. Keys are
+    normalized so that equivalent requests (same tasks in any order, same
+    energy/mode, same time bucket) hit the same entry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 900,
+        bucket_minutes: int = 15,
+        sqlite_path: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bucket_seconds = max(1, bucket_minutes) * 60
+        self.sqlite_path = sqlite_path or None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.sqlite_path is not None
+
+    def make_key(
+        self,
+        kind: str,
+        user_input: str,
+        tasks: Optional[List[Dict[str, Any]]],
+        energy_level: Optional[str],
+        personality_mode: Optional[str],
+        now: Optional[datetime] = None,
+        extra: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Stable key for a request; tasks are order-independent, time is bucketed"""
+        now = now or datetime.now()
+        payload = [
+            kind,
+            _normalize_text(user_input),
+            sorted(_normalize_task(task) for task in (tasks or [])),
+            energy_level,
+            personality_mode,
+            int(now.timestamp()) // self.bucket_seconds,
+            sorted((extra or {}).items()),
+        ]
+        encoded = json.dumps(payload, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._get_memory(key)
+        if value is not None:
+            self._stats["memory_hits"] += 1
+            CACHE_MEMORY_HITS.inc()
+            return value
+
+        if self.sqlite_path:
+            value = await asyncio.to_thread(self._get_disk, key)
+            if value is not None:
+                self._stats["disk_hits"] += 1
+                CACHE_DISK_HITS.inc()
+                self._set_memory(key, value)
+                return value
+
+        self._stats["misses"] += 1
+        CACHE_MISSES.inc()
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """Store a response; fallback responses are never cached"""
+        if not self.enabled or value.get("fallback"):
+            return
+        self._stats["stores"] += 1
+        self._set_memory(key, value)
+        if self.sqlite_path:
+            await asyncio.to_thread(self._set_disk, key, value)
+
+    def record_bypass(self):
+        self._stats["bypassed"] += 1
+        CACHE_BYPASSES.inc()
+
+    def clear(self):
+        self._entries.clear()
+        if self.sqlite_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_tier": self.sqlite_path is not None,
+        }
+
+    # Memory tier
+
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: str, value: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.time() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    # SQLite tier
+
+    def _connect(self) -> sqlite3.Connection:
+        return shared_state.connect(self.sqlite_path)
+
+    def _init_sqlite(self):
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+    def _get_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_disk(self, key: str, value: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl_seconds)
+            )
@@ -0,0 +1,293 @@
+import asyncio
+import bisect
+import random
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..core import shared_state
+from ..core.metrics import RESPONSE_POOL_DRAWS
+
+POOL_HITS = RESPONSE_POOL_DRAWS.labels("hit")
+POOL_REPEATS = RESPONSE_POOL_DRAWS.labels("repeat")
+POOL_MISSES = RESPONSE_POOL_DRAWS.labels("miss")
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# (first hour, name) in the user's local time
+TIME_OF_DAY_BUCKETS = ((0, "night"), (5, "early"), (8, "morning"), (11, "midday"), (14, "afternoon"), (18, "evening"))
+
+USES_UNLIMITED = 2 ** 62
+
+# Per-user positions not touched for this long are dropped from the SQLite store
+SEEN_TTL_SECONDS = 30 * 86400
+
+
+def time_of_day(hour: int) -> str:
+    """Name of the bucket an hour (0-23) falls in"""
+    name = TIME_OF_DAY_BUCKETS[0][1]
+    for first_hour, bucket in TIME_OF_DAY_BUCKETS:
+        if hour >= first_hour:
+            name = bucket
+    return name
+
+
+def pool_key(energy_level: str, personality_mode: str, local_now: datetime) -> str:
+    """Pool for a request made at local_now (in the user's timezone)"""
+    return ":".join((energy_level, WEEKDAYS[local_now.weekday()], time_of_day(local_now.hour), personality_mode))
+
+
+def parse_pool_key(key: str) -> Dict[str, str]:
+    energy_level, weekday, bucket, personality_mode = key.split(":")
+    return {"energy_level": energy_level, "weekday": weekday, "time_of_day": bucket, "personality_mode": personality_mode}
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _choose(seqs: Sequence[int], position: Optional[Tuple[int, int]]) -> Tuple[int, bool, Tuple[int, int]]:
+    """
+    Index of the variant to serve next, whether it starts a new round, and
+    the user's new position.
+
+    A position (start, top) means the user has seen every variant numbered
+    start..top. New variants always get higher numbers, so the next unseen
+    one is the first above top or, failing that, the last below start. Only
+    when neither exists, because the user has seen every variant in the
+    pool, does a new round start at a random variant.
+    """
+    if position is not None:
+        start, top = position
+        index = bisect.bisect_right(seqs, top)
+        if index < len(seqs):
+            return index, False, (start, seqs[index])
+        index = bisect.bisect_left(seqs, start) - 1
+        if index >= 0:
+            return index, False, (seqs[index], top)
+    index = random.randrange(len(seqs))
+    return index, position is not None, (seqs[index], seqs[index])
+
+
+class PoolDraw(NamedTuple):
+    text: str
+    # Variants with uses left after this draw
+    remaining: int
+    # The user had seen every variant in the pool, so this one is a repeat
+    repeat: bool
+
+
+class ResponsePool:
+    """
+    Pre-generated response variants per pool key, with per-user no-repeat.
+
+    Each key (see pool_key) holds up to `size` variants in the order they were
+    added. take() gives a user a variant they have not had for that key, so
+    nobody sees one twice before seeing them all. A variant is used up after
+    `max_uses` draws (0: never) but keeps being served until add() brings
+    replacements, so pools turn over without running dry; callers refill
+    when take() reports fewer than `low_water` with uses left.
+
+    Variants and per-user positions live in memory, or in SQLite when
+    `sqlite_path` is set so every worker on the host serves the same pools.
+    """
+
+    def __init__(
+        self,
+        size: int = 12,
+        low_water: int = 4,
+        max_uses: int = 200,
+        sqlite_path: Optional[str] = None,
+        max_users: int = 100000
+    ):
+        self.size = size
+        self.low_water = low_water
+        self.max_uses = max_uses
+        self.sqlite_path = sqlite_path or None
+        self.max_users = max_users
+        # key -> [[seq, text, uses], ...] in seq order
+        self._variants: Dict[str, List[List[Any]]] = {}
+        self._positions: "OrderedDict[Tuple[str, str], Tuple[int, int]]" = OrderedDict()
+        self._next_seq = 1
+        self._stats = {"hits": 0, "repeats": 0, "misses": 0, "added": 0, "retired": 0}
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    async def take(self, key: str, user: str) -> Optional[PoolDraw]:
+        """The user's next variant for key, or None when the pool is empty"""
+        if self.sqlite_path:
+            draw = await asyncio.to_thread(self._take_disk, key, user)
+        else:
+            draw = self._take_memory(key, user)
+        if draw is None:
+            self._stats["misses"] += 1
+            POOL_MISSES.inc()
+        elif draw.repeat:
+            self._stats["repeats"] += 1
+            POOL_REPEATS.inc()
+        else:
+            self._stats["hits"] += 1
+            POOL_HITS.inc()
+        return draw
+
+    async def add(self, key: str, texts: Sequence[str]) -> int:
+        """Add new variants (duplicates of live ones are skipped); returns how many were added"""
+        texts = [text.strip() for text in texts if text and text.strip()]
+        if self.sqlite_path:
+            added = await asyncio.to_thread(self._add_disk, key, texts)
+        else:
+            added = self._add_memory(key, texts)
+        self._stats["added"] += added
+        return added
+
+    async def count(self, key: str) -> int:
+        """Variants for key that have uses left"""
+        if self.sqlite_path:
+            return await asyncio.to_thread(self._count_disk, key)
+        return sum(1 for _, _, uses in self._variants.get(key, ()) if uses < self._use_limit)
+
+    def needs_refill(self, remaining: int) -> bool:
+        return remaining < self.low_water
+
+    def stats(self) -> Dict[str, Any]:
+        draws = self._stats["hits"] + self._stats["repeats"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": round((draws - self._stats["misses"]) / draws, 4) if draws else 0.0,
+            "pools": len(self._variants),
+            "variants": sum(len(variants) for variants in self._variants.values()),
+            "tracked_users": len(self._positions),
+            "size": self.size,
+            "low_water": self.low_water,
+            "max_uses": self.max_uses,
+            "shared_store": self.sqlite_path is not None,
+        }
+
+    @property
+    def _use_limit(self) -> int:
+        return self.max_uses if self.max_uses > 0 else USES_UNLIMITED
+
+    # Memory store
+
+    def _take_memory(self, key: str, user: str) -> Optional[PoolDraw]:
+        variants = self._variants.get(key)
+        if not variants:
+            return None
+        index, repeat, position = _choose([variant[0] for variant in variants], self._positions.get((user, key)))
+        variant = variants[index]
+        variant[2] += 1
+        self._positions[(user, key)] = position
+        self._positions.move_to_end((user, key))
+        # Forgetting a user only means their next draw starts at a random variant
+        while len(self._positions) > self.max_users:
+            self._positions.popitem(last=False)
+        remaining = sum(1 for _, _, uses in variants if uses < self._use_limit)
+        return PoolDraw(variant[1], remaining, repeat)
+
+    def _add_memory(self, key: str, texts: Sequence[str]) -> int:
+        variants = self._variants.setdefault(key, [])
+        live = {_normalize_text(variant[1]) for variant in variants}
+        added = 0
+        for text in texts:
+            normalized = _normalize_text(text)
+            if normalized in live:
+                continue
+            live.add(normalized)
+            variants.append([self._next_seq, text, 0])
+            self._next_seq += 1
+            added += 1
+        # New variants replace used-up ones, then the oldest make room
+        kept = [variant for variant in variants if variant[2] < self._use_limit]
+        kept = kept[max(0, len(kept) - self.size):]
+        self._stats["retired"] += len(variants) - len(kept)
+        variants[:] = kept
+        return added
+
+    # SQLite store
+
+    def _connect(self) -> sqlite3.Connection:
+        return shared_state.connect(self.sqlite_path)
+
+    def _init_sqlite(self):
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_pool ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, text TEXT NOT NULL, "
+                "uses INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_pool_key ON response_pool (key, seq)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_pool_seen ("
+                "user TEXT NOT NULL, key TEXT NOT NULL, start INTEGER NOT NULL, top INTEGER NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (user, key))"
+            )
+            conn.execute("DELETE FROM response_pool_seen WHERE updated_at < ?", (time.time() - SEEN_TTL_SECONDS,))
+
+    def _take_disk(self, key: str, user: str) -> Optional[PoolDraw]:
+        with self._connect() as conn:
+            # IMMEDIATE so two workers cannot both count the same use
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                variants = conn.execute(
+                    "SELECT seq, text, uses FROM response_pool WHERE key = ? ORDER BY seq", (key,)
+                ).fetchall()
+                if not variants:
+                    conn.execute("ROLLBACK")
+                    return None
+                row = conn.execute(
+                    "SELECT start, top FROM response_pool_seen WHERE user = ? AND key = ?", (user, key)
+                ).fetchone()
+                index, repeat, position = _choose([variant[0] for variant in variants], tuple(row) if row else None)
+                seq, text, _ = variants[index]
+                conn.execute("UPDATE response_pool SET uses = uses + 1 WHERE seq = ?", (seq,))
+                limit = self._use_limit
+                remaining = sum(1 for other, _, uses in variants if uses + (other == seq) < limit)
+                conn.execute(
+                    "INSERT OR REPLACE INTO response_pool_seen (user, key, start, top, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (user, key, position[0], position[1], time.time())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return PoolDraw(text, remaining, repeat)
+
+    def _add_disk(self, key: str, texts: Sequence[str]) -> int:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                live = {
+                    _normalize_text(row[0])
+                    for row in conn.execute("SELECT text FROM response_pool WHERE key = ?", (key,))
+                }
+                added = 0
+                for text in texts:
+                    normalized = _normalize_text(text)
+                    if normalized in live:
+                        continue
+                    live.add(normalized)
+                    conn.execute("INSERT INTO response_pool (key, text) VALUES (?, ?)", (key, text))
+                    added += 1
+                retired = conn.execute(
+                    "DELETE FROM response_pool WHERE key = ? AND uses >= ?", (key, self._use_limit)
+                ).rowcount
+                retired += conn.execute(
+                    "DELETE FROM response_pool WHERE key = ? AND seq NOT IN "
+                    "(SELECT seq FROM response_pool WHERE key = ? ORDER BY seq DESC LIMIT ?)",
+                    (key, key, self.size)
+                ).rowcount
+                self._stats["retired"] += retired
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def _count_disk(self, key: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM response_pool WHERE key = ? AND uses < ?", (key, self._use_limit)
+            ).fetchone()[0]
@@ -0,0 +1,211 @@
+"""
+Constraint-based day scheduler for plan_my_day.
+
+The remaining working day (in the user's timezone) is cut into 15-minute
+slots, each with an expected energy level from ENERGY_CURVE. Fixed breaks
+are reserved first. Tasks are then placed one at a time, most important
+first (priority + urgency from the ranker), into the free run of slots that:
+
+- finishes before the task's due_date when that is possible today,
+- best matches the task's energy_required to the slots' energy, and
+- starts as early as possible (weighted more heavily for urgent work).
+
+Feasible start positions for a task are found with prefix sums over the
+free-slot mask, so placing n tasks costs O(n * slots) numpy work and
+hundreds of tasks schedule in milliseconds. Tasks that do not fit are
+returned as unscheduled rather than squeezed in.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from ..core.lazy import lazy_import
+from .ranker import PRIORITY_SCORES, RankerWeights, TaskArrays, score_arrays
+
+np = lazy_import("numpy")
+
+SLOT_MINUTES = 15
+
+# Typical energy (0 low .. 2 high) by hour of day: morning peak, post-lunch dip
+ENERGY_CURVE = (
+    0.5, 0.5, 0.5, 0.5, 0.5, 0.5,   # 00-05
+    1.0, 1.0, 1.5, 2.0, 2.0, 2.0,   # 06-11
+    1.0, 0.5, 0.5, 1.5, 1.5, 1.0,   # 12-17
+    1.0, 0.5, 0.5, 0.5, 0.5, 0.5,   # 18-23
+)
+
+# Current energy shifts the whole curve a little
+ENERGY_OFFSETS = {"low": -0.5, "medium": 0.0, "high": 0.3}
+
+# (hour, minute, duration in minutes, label)
+DEFAULT_BREAKS = [
+    (10, 30, 15, "Short break"),
+    (12, 0, 60, "Lunch"),
+    (15, 0, 15, "Short break"),
+]
+
+# Ordering favours priority and deadlines; energy is handled by placement
+ORDER_WEIGHTS = RankerWeights(priority=0.5, urgency=0.5, energy=0.0, fit=0.0, context=0.0)
+
+
+@dataclass
+class ScheduledBlock:
+    start: datetime
+    end: datetime
+    title: str
+    kind: str = "task"
+    task: Optional[Dict[str, Any]] = None
+
+    @property
+    def minutes(self) -> int:
+        return int((self.end - self.start).total_seconds() // 60)
+
+
+@dataclass
+class DaySchedule:
+    blocks: List[ScheduledBlock] = field(default_factory=list)
+    unscheduled: List[Dict[str, Any]] = field(default_factory=list)
+    timezone: str = "UTC"
+
+    @property
+    def tasks(self) -> List[ScheduledBlock]:
+        return [block for block in self.blocks if block.kind == "task"]
+
+    def to_lines(self) -> List[str]:
+        return [
+            f"• {block.start.strftime('%I:%M %p').lstrip('0')} → {block.title} ({block.minutes} min)"
+            for block in self.blocks
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "timezone": self.timezone,
+            "blocks": [
+                {
+                    "start": block.start.isoformat(),
+                    "end": block.end.isoformat(),
+                    "title": block.title,
+                    "kind": block.kind,
+                }
+                for block in self.blocks
+            ],
+            "unscheduled": [task.get("title") for task in self.unscheduled],
+        }
+
+
+def resolve_timezone(name: Optional[str]):
+    """ZoneInfo for an IANA name; UTC when missing or unknown"""
+    if not name:
+        return dt_timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def _ceil_to_slot(moment: datetime) -> datetime:
+    moment = moment.replace(second=0, microsecond=0)
+    remainder = moment.minute % SLOT_MINUTES
+    return moment + timedelta(minutes=(SLOT_MINUTES - remainder) % SLOT_MINUTES)
+
+
+def plan_day(
+    tasks: Sequence[Dict[str, Any]],
+    timezone: Optional[str] = None,
+    energy_level: str = "medium",
+    now: Optional[datetime] = None,
+    day_start_hour: int = 9,
+    day_end_hour: int = 18,
+    breaks: Sequence[tuple] = DEFAULT_BREAKS
+) -> DaySchedule:
+    """Pack tasks into the rest of today's working hours (or tomorrow's if today is over)"""
+    tz = resolve_timezone(timezone)
+    now = now.astimezone(tz) if now else datetime.now(tz)
+
+    day = now.date()
+    day_end = datetime.combine(day, time(day_end_hour), tz)
+    start = max(_ceil_to_slot(now), datetime.combine(day, time(day_start_hour), tz))
+    if start >= day_end:
+        day = day + timedelta(days=1)
+        day_end = datetime.combine(day, time(day_end_hour), tz)
+        start = datetime.combine(day, time(day_start_hour), tz)
+
+    n_slots = int((day_end - start).total_seconds() // 60) // SLOT_MINUTES
+    schedule = DaySchedule(timezone=str(tz))
+    if n_slots <= 0:
+        schedule.unscheduled = list(tasks)
+        return schedule
+
+    slot_starts = [start + timedelta(minutes=SLOT_MINUTES * i) for i in range(n_slots)]
+    hours = np.fromiter((moment.hour for moment in slot_starts), dtype=np.int64, count=n_slots)
+    slot_energy = np.clip(np.asarray(ENERGY_CURVE)[hours] + ENERGY_OFFSETS.get(energy_level, 0.0), 0.0, 2.0)
+    free = np.ones(n_slots, dtype=bool)
+
+    # Reserve breaks that fall inside the window
+    for hour, minute, length, label in breaks:
+        break_start = datetime.combine(day, time(hour, minute), tz)
+        first = int((break_start - start).total_seconds() // 60) // SLOT_MINUTES
+        last = first + max(1, length // SLOT_MINUTES)
+        first, last = max(first, 0), min(last, n_slots)
+        if first < last and free[first:last].all():
+            free[first:last] = False
+            schedule.blocks.append(ScheduledBlock(
+                slot_starts[first],
+                slot_starts[first] + timedelta(minutes=SLOT_MINUTES * (last - first)),
+                label,
+                kind="break"
+            ))
+
+    if not tasks:
+        schedule.blocks.sort(key=lambda block: block.start)
+        return schedule
+
+    # Due dates without an offset are the user's local time
+    arrays = TaskArrays.from_tasks(tasks, tz)
+    order = np.argsort(-score_arrays(arrays, energy_level, now=now, weights=ORDER_WEIGHTS)["total"], kind="stable")
+    need = np.maximum(1, np.ceil(arrays.duration / SLOT_MINUTES)).astype(np.int64)
+    start_ts = start.timestamp()
+    due_slot = np.where(np.isnan(arrays.due), n_slots, np.floor((arrays.due - start_ts) / 60 / SLOT_MINUTES))
+    energy_prefix = np.concatenate(([0.0], np.cumsum(slot_energy)))
+    positions = np.arange(n_slots)
+
+    free_count = int(free.sum())
+    for index in order:
+        length = int(need[index])
+        if length > free_count:
+            schedule.unscheduled.append(tasks[index])
+            continue
+
+        free_prefix = np.concatenate(([0], np.cumsum(free)))
+        count = n_slots - length + 1
+        feasible = (free_prefix[length:length + count] - free_prefix[:count]) == length
+        if not feasible.any():
+            schedule.unscheduled.append(tasks[index])
+            continue
+
+        # Prefer finishing before the deadline when any such start exists
+        before_due = feasible & (positions[:count] + length <= due_slot[index])
+        if before_due.any():
+            feasible = before_due
+
+        mean_energy = (energy_prefix[length:length + count] - energy_prefix[:count]) / length
+        urgency_bias = PRIORITY_SCORES["low"] + arrays.priority[index]
+        cost = np.abs(mean_energy - arrays.energy[index]) / 2.0 + urgency_bias * positions[:count] / n_slots
+        cost[~feasible] = np.inf
+        best = int(np.argmin(cost))
+
+        free[best:best + length] = False
+        free_count -= length
+        task = tasks[index]
+        schedule.blocks.append(ScheduledBlock(
+            slot_starts[best],
+            slot_starts[best] + timedelta(minutes=SLOT_MINUTES * length),
+            task.get("title", "Untitled Task"),
+            task=task
+        ))
+
+    schedule.blocks.sort(key=lambda block: block.start)
+    return schedule
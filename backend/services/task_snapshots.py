@@ -0,0 +1,344 @@
+"""
+Per-user snapshots of open tasks for the chat endpoints.
+
+A chat request without a task list plans over the user's open tasks. Rather
+than querying and converting rows on every call, each user's open tasks
+are loaded once into a TaskSnapshot:
+- one TaskEntry per task, with __slots__ and typed fields
+- kept sorted best first: priority, then soonest due (undated last), then id
+- the list of dicts handed to the assistant is built once per change, not
+  once per request
+
+Task writes (the task API and quick-task) call apply() or remove() after
+their commit. These change the cached snapshot in place: a new, changed or
+reopened task is re-read and placed in order, and a completed or deleted
+one is dropped. At most `max_users` snapshots are kept (LRU).
+
+A snapshot holds at most `max_tasks` tasks. When a user has more open tasks,
+removing one from the snapshot discards it instead, so the next read reloads
+the best max_tasks from the database.
+
+With `sqlite_path`, every write also bumps the user's version in the shared
+SQLite file. A worker whose snapshot has an older version rebuilds it, so
+writes made through any worker are seen by all of them.
+"""
+import asyncio
+import bisect
+import sqlite3
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core import shared_state
+from ..core.database import AsyncSessionLocal
+from ..models.user import Task
+from .ranker import PRIORITY_SCORES
+
+DEFAULT_PRIORITY_SCORE = PRIORITY_SCORES["medium"]
+
+
+class TaskEntry:
+    """One open task in the shape the assistant, ranker and scheduler expect"""
+
+    __slots__ = (
+        "id", "title", "description", "priority", "category", "estimated_duration",
+        "due_date", "energy_required", "context_tags", "sort_key",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        title: Optional[str],
+        description: Optional[str],
+        priority: str,
+        category: Optional[str],
+        estimated_duration: Optional[int],
+        due_date: Optional[datetime],
+        energy_required: str,
+        context_tags: Tuple[str, ...]
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.category = category
+        self.estimated_duration = estimated_duration
+        self.due_date = due_date
+        self.energy_required = energy_required
+        self.context_tags = context_tags
+        # Same order as the snapshot query: best priority, soonest due (undated last), id
+        self.sort_key = (
+            -PRIORITY_SCORES.get(priority, DEFAULT_PRIORITY_SCORE),
+            due_date is None,
+            due_date or datetime.min,
+            id,
+        )
+
+    @classmethod
+    def from_task(cls, task: Task) -> "TaskEntry":
+        return cls(
+            id=task.id,
+            title=task.title,
+            description=task.description,
+            priority=task.priority or "medium",
+            category=task.category,
+            estimated_duration=task.estimated_duration,
+            due_date=task.due_date,
+            energy_required=task.energy_required or "medium",
+            context_tags=tuple(task.context_tags or ()),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "priority": self.priority,
+            "category": self.category,
+            "estimated_duration": self.estimated_duration,
+            "due_date": self.due_date.isoformat() if self.due_date else None,
+            "energy_required": self.energy_required,
+            "context_tags": list(self.context_tags),
+        }
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this entry (strings and tags included; interned values count once each)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.sort_key) + sys.getsizeof(self.context_tags)
+        for value in (self.title, self.description, self.category, self.due_date):
+            if value is not None:
+                size += sys.getsizeof(value)
+        return size + sum(sys.getsizeof(tag) for tag in self.context_tags)
+
+
+def _sort_order():
+    """ORDER BY matching TaskEntry.sort_key"""
+    priority = case(PRIORITY_SCORES, value=Task.priority, else_=DEFAULT_PRIORITY_SCORE)
+    return (priority.desc(), Task.due_date.is_(None), Task.due_date, Task.id)
+
+
+class TaskSnapshot:
+    """A user's open tasks (at most max_tasks), best first"""
+
+    __slots__ = ("entries", "keys", "by_id", "truncated", "version", "_view", "_nbytes")
+
+    def __init__(self, entries: Sequence[TaskEntry], truncated: bool, version: int = 0):
+        self.entries: List[TaskEntry] = sorted(entries, key=lambda entry: entry.sort_key)
+        self.keys = [entry.sort_key for entry in self.entries]
+        self.by_id = {entry.id: entry for entry in self.entries}
+        self.truncated = truncated
+        self.version = version
+        self._view: Optional[List[Dict[str, Any]]] = None
+        self._nbytes = sum(entry.nbytes() for entry in self.entries)
+
+    def tasks(self) -> List[Dict[str, Any]]:
+        """Task dicts, best first; built once per change and shared, so callers must not modify them"""
+        if self._view is None:
+            self._view = [entry.as_dict() for entry in self.entries]
+        return self._view
+
+    def put(self, entry: TaskEntry, max_tasks: int) -> bool:
+        """Insert or replace a task in order; False when the snapshot can no longer be kept in place"""
+        kept = self.discard(entry.id)
+        index = bisect.bisect_left(self.keys, entry.sort_key)
+        if self.truncated and index == len(self.entries):
+            # Ranks below every cached task, among tasks that are not loaded: leave it out
+            return kept
+        self.entries.insert(index, entry)
+        self.keys.insert(index, entry.sort_key)
+        self.by_id[entry.id] = entry
+        self._nbytes += entry.nbytes()
+        self._view = None
+        if len(self.entries) > max_tasks:
+            dropped = self.entries.pop()
+            self.keys.pop()
+            del self.by_id[dropped.id]
+            self._nbytes -= dropped.nbytes()
+            self.truncated = True
+        return True
+
+    def discard(self, task_id: int) -> bool:
+        """Drop a task if present; False when the snapshot is truncated and must be reloaded"""
+        entry = self.by_id.pop(task_id, None)
+        if entry is None:
+            return True
+        index = bisect.bisect_left(self.keys, entry.sort_key)
+        del self.entries[index]
+        del self.keys[index]
+        self._nbytes -= entry.nbytes()
+        self._view = None
+        # A task beyond the loaded ones would now move up into the snapshot
+        return not self.truncated
+
+    def memory(self) -> Dict[str, int]:
+        """Approximate bytes held: compact entries, and the dict view when built"""
+        view = 0
+        if self._view is not None:
+            view = sys.getsizeof(self._view) + sum(sys.getsizeof(task) for task in self._view)
+        index = sys.getsizeof(self.entries) + sys.getsizeof(self.keys) + sys.getsizeof(self.by_id)
+        return {"entries": self._nbytes + index, "view": view}
+
+
+class TaskSnapshotCache:
+    """Snapshots of the most recently used users' open tasks; see the module docstring"""
+
+    def __init__(self, max_users: int = 10000, max_tasks: int = 200, sqlite_path: Optional[str] = None):
+        self.max_users = max_users
+        self.max_tasks = max_tasks
+        self.sqlite_path = sqlite_path or None
+        self._snapshots: "OrderedDict[int, TaskSnapshot]" = OrderedDict()
+        # Bumped on every write, so a build that raced one is not stored
+        self._writes = 0
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "builds": 0, "updates": 0, "reloads": 0, "evictions": 0}
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_users > 0
+
+    async def pending(self, user_id: int) -> List[Dict[str, Any]]:
+        """The user's open tasks, best first (at most max_tasks); callers must not modify the dicts"""
+        if not self.enabled:
+            async with AsyncSessionLocal() as db:
+                return (await self._load(db, user_id, 0)).tasks()
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is not None and self.sqlite_path:
+            if snapshot.version != await asyncio.to_thread(self._get_version, user_id):
+                self._stats["stale"] += 1
+                self._snapshots.pop(user_id, None)
+                snapshot = None
+        if snapshot is not None:
+            self._stats["hits"] += 1
+            self._snapshots.move_to_end(user_id)
+            return list(snapshot.tasks())
+
+        self._stats["misses"] += 1
+        writes = self._writes
+        version = await asyncio.to_thread(self._get_version, user_id) if self.sqlite_path else 0
+        async with AsyncSessionLocal() as db:
+            snapshot = await self._load(db, user_id, version)
+        self._stats["builds"] += 1
+        if writes == self._writes:
+            self._store(user_id, snapshot)
+        return list(snapshot.tasks())
+
+    async def apply(self, user_id: int, task_ids: Iterable[int], db: Optional[AsyncSession] = None):
+        """After a committed create/update: re-read these tasks into the user's snapshot (db: session to reuse)"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+        self._writes += 1
+        version = await self._bump_version(user_id)
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            return
+        query = select(Task).where(Task.user_id == user_id, Task.id.in_(task_ids))
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                rows = {task.id: task for task in await session.scalars(query)}
+        else:
+            rows = {task.id: task for task in await db.scalars(query)}
+        kept = True
+        for task_id in task_ids:
+            task = rows.get(task_id)
+            if task is not None and not task.is_completed:
+                kept = snapshot.put(TaskEntry.from_task(task), self.max_tasks) and kept
+            else:
+                kept = snapshot.discard(task_id) and kept
+        self._settle(user_id, snapshot, kept, version)
+
+    async def remove(self, user_id: int, task_ids: Iterable[int]):
+        """After a committed delete: drop these tasks from the user's snapshot"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+        self._writes += 1
+        version = await self._bump_version(user_id)
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            return
+        kept = True
+        for task_id in task_ids:
+            kept = snapshot.discard(task_id) and kept
+        self._settle(user_id, snapshot, kept, version)
+
+    def _settle(self, user_id: int, snapshot: TaskSnapshot, kept: bool, version: Optional[int]):
+        # A version that skipped one means another worker wrote in between: this snapshot missed it
+        if kept and (version is None or version == snapshot.version + 1):
+            snapshot.version = version or 0
+            self._stats["updates"] += 1
+        else:
+            self._snapshots.pop(user_id, None)
+            self._stats["reloads"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["stale"]
+        entries = view = tasks = 0
+        for snapshot in self._snapshots.values():
+            memory = snapshot.memory()
+            entries += memory["entries"]
+            view += memory["view"]
+            tasks += len(snapshot.entries)
+        return {
+            **self._stats,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "users": len(self._snapshots),
+            "tasks": tasks,
+            "max_users": self.max_users,
+            "max_tasks": self.max_tasks,
+            "memory_bytes": {"entries": entries, "views": view, "total": entries + view},
+            "bytes_per_task": round((entries + view) / tasks, 1) if tasks else None,
+            "shared_versions": self.sqlite_path is not None,
+        }
+
+    async def _load(self, db: AsyncSession, user_id: int, version: int) -> TaskSnapshot:
+        query = (
+            select(Task)
+            .where(Task.user_id == user_id, Task.is_completed == False)  # noqa: E712 (SQL comparison)
+            .order_by(*_sort_order())
+        )
+        # One extra row tells us whether the user has more
+        entries = [TaskEntry.from_task(task) for task in await db.scalars(query.limit(self.max_tasks + 1))]
+        truncated = len(entries) > self.max_tasks
+        return TaskSnapshot(entries[:self.max_tasks], truncated, version)
+
+    def _store(self, user_id: int, snapshot: TaskSnapshot):
+        self._snapshots[user_id] = snapshot
+        self._snapshots.move_to_end(user_id)
+        while len(self._snapshots) > self.max_users:
+            self._snapshots.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    # Shared versions (SQLite)
+
+    async def _bump_version(self, user_id: int) -> Optional[int]:
+        if not self.sqlite_path:
+            return None
+        return await asyncio.to_thread(self._increment_version, user_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        return shared_state.connect(self.sqlite_path)
+
+    def _init_sqlite(self):
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS task_snapshot_versions ("
+                "user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def _get_version(self, user_id: int) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT version FROM task_snapshot_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _increment_version(self, user_id: int) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "INSERT INTO task_snapshot_versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT (user_id) DO UPDATE SET version = version + 1 RETURNING version",
+                (user_id,)
+            ).fetchone()[0]
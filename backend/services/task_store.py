@@ -0,0 +1,119 @@
+"""
+Task persistence for the task API. Chat requests read a user's open tasks
+through backend.services.task_snapshots, which the task endpoints update after
+each write.
+
+Lists are paginated by keyset on the task id: the cursor is an opaque
+encoding of the last id returned, so a page costs one index range scan no
+matter how deep the client has paged. Bulk writes go through SQLAlchemy's
+executemany paths (one INSERT ... RETURNING for new tasks, one UPDATE by
+primary key for changes) instead of a round trip per task.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.database import AsyncSessionLocal
+from ..models.user import Task
+
+# Fields clients may set; id/user_id/timestamps are managed here
+TASK_FIELDS = (
+    "title",
+    "description",
+    "priority",
+    "category",
+    "estimated_duration",
+    "due_date",
+    "is_completed",
+    "energy_required",
+    "context_tags",
+)
+
+
+def encode_cursor(task_id: int) -> str:
+    return base64.urlsafe_b64encode(str(task_id).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Task id from a cursor; ValueError when it is not one we issued"""
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _writable(fields: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    values = {name: fields[name] for name in TASK_FIELDS if name in fields}
+    if "is_completed" in values:
+        values["completed_at"] = fields.get("completed_at") or now if values["is_completed"] else None
+    values["updated_at"] = now
+    return values
+
+
+async def list_tasks(
+    db: AsyncSession,
+    user_id: int,
+    completed: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+) -> Tuple[List[Task], Optional[str]]:
+    """One page of a user's tasks in id order, plus the cursor for the next page (None at the end)"""
+    query = select(Task).where(Task.user_id == user_id)
+    if completed is not None:
+        query = query.where(Task.is_completed == completed)
+    if cursor:
+        query = query.where(Task.id > decode_cursor(cursor))
+    # One extra row tells us whether another page exists
+    rows = list(await db.scalars(query.order_by(Task.id).limit(limit + 1)))
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+async def get_task(db: AsyncSession, user_id: int, task_id: int) -> Optional[Task]:
+    return await db.scalar(select(Task).where(Task.id == task_id, Task.user_id == user_id))
+
+
+async def bulk_upsert(
+    db: AsyncSession,
+    user_id: int,
+    items: Sequence[Dict[str, Any]]
+) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Insert items without an "id" and update items with one (only the fields
+    given). Returns (created ids, updated ids, ids that don't exist or belong
+    to another user and were skipped). Commits once for the whole batch.
+    """
+    now = datetime.utcnow()
+    new_rows = [
+        {**_writable(item, now), "user_id": user_id, "created_at": now}
+        for item in items if item.get("id") is None
+    ]
+    changes = {item["id"]: _writable(item, now) for item in items if item.get("id") is not None}
+
+    owned = set()
+    if changes:
+        owned = set(await db.scalars(select(Task.id).where(Task.user_id == user_id, Task.id.in_(list(changes)))))
+
+    created: List[int] = []
+    if new_rows:
+        created = list(await db.scalars(insert(Task).returning(Task.id, sort_by_parameter_order=True), new_rows))
+    updated = [task_id for task_id in changes if task_id in owned]
+    if updated:
+        await db.execute(update(Task), [{"id": task_id, **changes[task_id]} for task_id in updated])
+    await db.commit()
+    return created, updated, [task_id for task_id in changes if task_id not in owned]
+
+
+async def delete_task(db: AsyncSession, user_id: int, task_id: int) -> bool:
+    result = await db.execute(delete(Task).where(Task.id == task_id, Task.user_id == user_id))
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def create_tasks(user_id: int, items: Sequence[Dict[str, Any]]) -> List[int]:
+    """Insert tasks with their own session; returns the new ids"""
+    async with AsyncSessionLocal() as db:
+        return (await bulk_upsert(db, user_id, [{**item, "id": None} for item in items]))[0]
@@ -0,0 +1,152 @@
+"""
+Morning check-in herd: live LLM calls vs the pre-generated greeting pool.
+
+--users clients ask for a check-in at the same moment, all for the same
+pool key (same energy level, personality and local time), with at most
+--concurrency in flight. Three modes run against a local stub:
+- live: every request calls the model (TimelyAssistant.morning_checkin)
+- cold: pooled, starting from an empty pool; requests are answered live
+  while its first refill runs, later ones trigger background refills as
+  greetings retire
+- warm: pooled, after the prefill job has filled the pool
+
+For each mode the script reports throughput, latency percentiles and the
+upstream calls made during the herd and ahead of it (prefill, which fills
+every pool coming up anywhere, not just the one the herd uses). It then
+has --users users each check in --days times for the same key and counts
+how many got a greeting they had already seen.
+
+    python -m benchmarks.bench_checkin_pool --users 2000 --concurrency 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from .stub_openai import StubServer
+
+ENERGY_LEVEL = "medium"
+PERSONALITY = "coach"
+TIMEZONE = "UTC"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def herd(call, users, concurrency):
+    latencies = []
+    counter = iter(range(users))
+
+    async def client():
+        for user in counter:
+            start = time.perf_counter()
+            await call(f"user:{user}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+async def run(stub, args):
+    from backend.services.response_pool import ResponsePool
+    from llm.agents.checkin_pool import CheckinPool
+    from llm.agents.registry import AssistantRegistry
+
+    registry = AssistantRegistry()
+    registry.start()
+
+    def make_pool():
+        return CheckinPool(registry, ResponsePool(size=args.size, low_water=args.low_water, max_uses=args.max_uses))
+
+    async def pooled(checkin_pool, user):
+        # Like the endpoint: a live check-in while the pool is still empty
+        return (
+            await checkin_pool.serve(ENERGY_LEVEL, PERSONALITY, TIMEZONE, user)
+            or await registry.assistant.morning_checkin(energy_level=ENERGY_LEVEL)
+        )
+
+    rows = []
+    try:
+        for mode in ("live", "cold", "warm"):
+            checkin_pool = make_pool()
+            ahead = 0
+            if mode == "live":
+                def call(user):
+                    return registry.assistant.morning_checkin(energy_level=ENERGY_LEVEL)
+            else:
+                if mode == "warm":
+                    # What the prefill job does before the herd arrives (every upcoming pool)
+                    before = stub.app.state.requests
+                    await checkin_pool.prefill(datetime.now(timezone.utc))
+                    ahead = stub.app.state.requests - before
+
+                def call(user, checkin_pool=checkin_pool):
+                    return pooled(checkin_pool, user)
+            before = stub.app.state.requests
+            start = time.perf_counter()
+            latencies = await herd(call, args.users, args.concurrency)
+            elapsed = time.perf_counter() - start
+            # Background refills still running belong to this mode's upstream calls
+            await asyncio.gather(*list(checkin_pool._refills.values()))
+            rows.append((mode, latencies, elapsed, stub.app.state.requests - before, ahead))
+            await checkin_pool.aclose()
+
+        # Repeats: every user checks in --days times for the same key
+        checkin_pool = make_pool()
+        seen = {}
+        repeats = 0
+        for _ in range(args.days):
+            # A day apart, background refills have long finished
+            await asyncio.gather(*list(checkin_pool._refills.values()))
+            for user in range(args.users):
+                result = await pooled(checkin_pool, f"user:{user}")
+                greetings = seen.setdefault(user, set())
+                repeats += result["response"] in greetings
+                greetings.add(result["response"])
+        await asyncio.gather(*list(checkin_pool._refills.values()))
+        await checkin_pool.aclose()
+    finally:
+        await registry.aclose()
+    return rows, repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub latency in seconds")
+    parser.add_argument("--size", type=int, default=12, help="greetings per pool")
+    parser.add_argument("--low-water", type=int, default=4)
+    parser.add_argument("--max-uses", type=int, default=200)
+    parser.add_argument("--days", type=int, default=10, help="check-ins per user in the repeat test")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as stub:
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-stub",
+            "OPENAI_BASE_URL": stub.base_url,
+            "LLM_PROVIDERS": "openai",
+            "LLM_MAX_CONNECTIONS": str(args.concurrency),
+            "LLM_MAX_KEEPALIVE_CONNECTIONS": str(args.concurrency),
+            "LOG_LEVEL": "ERROR",
+        })
+        from backend.core.config import settings
+        settings.reload()
+        logging.disable(logging.WARNING)
+        rows, repeats = asyncio.run(run(stub, args))
+
+    print(f"{args.users} users, {args.concurrency} concurrent, stub latency {args.latency}s, "
+          f"pool size {args.size}, low water {args.low_water}, max uses {args.max_uses}")
+    print(f"{'mode':<6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'upstream':>9} {'ahead':>6}")
+    for mode, latencies, elapsed, upstream, ahead in rows:
+        print(f"{mode:<6} {len(latencies) / elapsed:>9.1f} {percentile(latencies, 0.5):>8.1f} "
+              f"{percentile(latencies, 0.95):>8.1f} {percentile(latencies, 0.99):>8.1f} {upstream:>9} {ahead:>6}")
+    print(f"repeat test: {args.users} users x {args.days} check-ins, {repeats} repeated greetings")
+
+
+if __name__ == "__main__":
+    main()
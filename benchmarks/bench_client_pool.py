@@ -0,0 +1,83 @@
+"""
+Fresh-client-per-request vs shared pooled client, against the local stub.
+
+"fresh" mirrors the old handlers: a new TimelyAssistant (and so new
+provider clients and a new connection pool) for every request. "pooled" reuses
+the one assistant held by AssistantRegistry.
+
+    python -m benchmarks.bench_client_pool --requests 500 --concurrency 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+
+from .stub_openai import StubServer
+
+TASKS = [
+    {"title": "Review emails", "priority": "medium", "estimated_duration": 15},
+    {"title": "Write project proposal", "priority": "high", "estimated_duration": 60},
+    {"title": "Team meeting", "priority": "high", "estimated_duration": 30},
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode, requests, concurrency):
+    from llm.agents.assistant import TimelyAssistant
+    from llm.agents.registry import AssistantRegistry
+
+    registry = AssistantRegistry()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "fresh":
+                assistant = TimelyAssistant()
+            else:
+                assistant = registry.assistant
+            result = await assistant.what_should_i_do_next(available_tasks=TASKS)
+            if mode == "fresh":
+                await assistant.aclose()
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert not result.get("fallback"), "stub call failed and fell back"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        registry.start()
+        await asyncio.gather(*(one() for _ in range(requests)))
+    await registry.aclose()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.005, help="stub latency in seconds")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as stub:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ["LLM_PROVIDERS"] = "openai"
+        from backend.core.config import settings
+        settings.reload()
+
+        print(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for mode in ("fresh", "pooled"):
+            latencies = asyncio.run(run(mode, args.requests, args.concurrency))
+            print(f"{mode:<8} {percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f} "
+                  f"{statistics.mean(latencies):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Concurrency check for the async LLM path.
+
+Fires N concurrent POST /api/v1/chat/next-task requests through the real
+app against a stub that delays every completion. With a non-blocking call
+path the batch finishes in roughly one stub delay; a blocking client would
+serialize them and take about N delays. Exits non-zero if the batch takes
+more than --max-ratio single-call durations.
+
+    python -m benchmarks.bench_concurrency --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import httpx
+
+from .stub_openai import StubServer
+
+PAYLOAD = {
+    "message": "What should I do next?",
+    "energy_level": "medium",
+    "personality_mode": "coach",
+    "bypass_cache": True,
+    "tasks": [
+        {"title": "Write project proposal", "priority": "high", "estimated_duration": 60},
+        {"title": "Review emails", "priority": "medium", "estimated_duration": 15},
+    ],
+}
+
+
+async def run(requests):
+    from backend.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=60) as client:
+            async def one(index=0):
+                # Distinct messages so identical-prompt coalescing doesn't hide blocking
+                payload = {**PAYLOAD, "message": f"{PAYLOAD['message']} (#{index})"}
+                response = await client.post("/api/v1/chat/next-task", json=payload)
+                response.raise_for_status()
+                assert not response.json().get("fallback"), "stub call failed and fell back"
+
+            start = time.perf_counter()
+            await one()
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(index) for index in range(1, requests + 1)))
+            batch = time.perf_counter() - start
+    return single, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub latency in seconds")
+    parser.add_argument("--max-ratio", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as stub:
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ["LLM_PROVIDERS"] = "openai"
+        from backend.core.config import settings
+        settings.reload()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            single, batch = asyncio.run(run(args.requests))
+
+    ratio = batch / single
+    print(f"1 request: {single:.3f}s  {args.requests} concurrent: {batch:.3f}s  ratio: {ratio:.2f}")
+    if ratio > args.max_ratio:
+        print(f"FAIL: concurrent batch took {ratio:.2f}x a single call (limit {args.max_ratio}x)")
+        sys.exit(1)
+    print("OK: requests were served concurrently")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Prompt size over a long conversation: full history vs summarized sessions.
+
+One user sends --turns next-task messages in a row (follow-ups of varying
+length, with --tasks tasks each time) through TimelyAssistant against a
+local stub, with the conversation replayed from a ConversationManager:
+- naive: every earlier turn is sent again (no history cap, never summarized)
+- memory: session defaults (CONVERSATION_* settings), in-memory store
+- sqlite: the same, with the store in a SQLite file
+
+Each turn waits for a summary it started, so runs are repeatable. Reported
+at checkpoints: tokens of the next-task prompt actually sent, and what the
+session holds (turns and their tokens, summary tokens); then per mode the
+upstream calls, summary calls and time per turn. Session modes must keep
+every prompt within the fixed prompt plus CONVERSATION_HISTORY_TOKENS plus
+CONVERSATION_SUMMARY_MAX_TOKENS, and the script exits 1 otherwise.
+
+    python -m benchmarks.bench_conversations --turns 200 --tasks 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from .bench_load import TASKS
+from .stub_openai import StubServer
+
+FOLLOW_UPS = [
+    "No, something shorter",
+    "I only have 20 minutes before a call",
+    "That one is blocked until Sam replies, what else?",
+    "Ok done with that. Next?",
+    "I'm getting tired, give me something low energy",
+    "Actually I want to make progress on the proposal today, even if it's hard",
+    "Can you explain why that one first? I thought the deadline was Friday",
+    "Skip anything that needs my laptop, I'm on my phone",
+]
+
+NO_LIMIT = 10 ** 9
+
+
+def message(rng: random.Random, turn: int) -> str:
+    text = rng.choice(FOLLOW_UPS)
+    # Every few turns a long one, like a pasted note
+    if turn % 7 == 6:
+        text += " " + " ".join(rng.choice(FOLLOW_UPS) for _ in range(8))
+    return text
+
+
+async def run_mode(mode, registry, args, directory, checkpoints):
+    from backend.services.conversation_store import ConversationStore
+    from llm.agents.assistant import NEXT_TASK_SYSTEM_PROMPT
+    from llm.agents.conversations import ConversationManager
+    from llm.prompts.compiler import count_message_tokens, count_tokens
+
+    if mode == "naive":
+        manager = ConversationManager(
+            registry, ConversationStore(), history_tokens=NO_LIMIT, summarize_after_tokens=NO_LIMIT
+        )
+    else:
+        sqlite_path = os.path.join(directory, "sessions.db") if mode == "sqlite" else None
+        manager = ConversationManager(registry, ConversationStore(sqlite_path=sqlite_path))
+
+    assistant = registry.assistant
+    complete = assistant.router.complete
+    sent = []
+    calls = {"next_task": 0, "summary": 0}
+
+    async def recording(messages, max_tokens, temperature):
+        if messages[0]["content"] == NEXT_TASK_SYSTEM_PROMPT:
+            calls["next_task"] += 1
+            sent.append(count_message_tokens(messages))
+        else:
+            calls["summary"] += 1
+        return await complete(messages, max_tokens, temperature)
+
+    assistant.router.complete = recording
+    tasks = [{**task, "title": f"{task['title']} #{i}"} for i in range(args.tasks) for task in TASKS][:args.tasks]
+    rng = random.Random(args.seed)
+    rows = []
+    longest = 0
+    conversation = await manager.create("bench")
+    start = time.perf_counter()
+    try:
+        for turn in range(1, args.turns + 1):
+            conversation = await manager.store.get(conversation.id)
+            user_input = message(rng, turn)
+            longest = max(longest, count_tokens(user_input))
+            result = await assistant.what_should_i_do_next(
+                user_input=user_input, available_tasks=tasks, history=manager.history(conversation)
+            )
+            if result.get("fallback"):
+                raise SystemExit(f"{mode}: turn {turn} fell back to the local answer")
+            await manager.record(conversation.id, user_input, result["response"])
+            await asyncio.gather(*list(manager._folds.values()))
+            if turn in checkpoints:
+                stored = await manager.store.get(conversation.id)
+                rows.append((turn, sent[-1], len(stored.turns), stored.turn_tokens, stored.summary_tokens))
+        elapsed = time.perf_counter() - start
+    finally:
+        assistant.router.complete = complete
+        await manager.aclose()
+    return {"mode": mode, "rows": rows, "max_sent": max(sent), "first_sent": sent[0], "longest_message": longest,
+            "calls": calls, "ms_per_turn": elapsed / args.turns * 1000}
+
+
+async def run(args, directory):
+    from llm.agents.registry import AssistantRegistry
+
+    checkpoints = sorted({turn for turn in (1, 5, 10, 25, 50, 100, 200, 500, 1000) if turn <= args.turns} | {args.turns})
+    registry = AssistantRegistry()
+    registry.start()
+    try:
+        return [await run_mode(mode, registry, args, directory, checkpoints) for mode in ("naive", "memory", "sqlite")]
+    finally:
+        await registry.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=20, help="tasks sent with every message")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with StubServer() as stub, tempfile.TemporaryDirectory(prefix="timely-conversations-") as directory:
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-stub",
+            "OPENAI_BASE_URL": stub.base_url,
+            "LLM_PROVIDERS": "openai",
+            "LOG_LEVEL": "ERROR",
+        })
+        from backend.core.config import settings
+        settings.reload()
+        logging.disable(logging.WARNING)
+        results = asyncio.run(run(args, directory))
+
+    print(f"{args.turns} turns, {args.tasks} tasks per message, history cap {settings.conversation_history_tokens}, "
+          f"summarize after {settings.conversation_summarize_after_tokens}, keep {settings.conversation_keep_recent_tokens}, "
+          f"summary cap {settings.conversation_summary_max_tokens} tokens")
+    print(f"{'mode':<7} {'turn':>5} {'prompt tokens':>14} {'stored turns':>13} {'turn tokens':>12} {'summary tokens':>15}")
+    for result in results:
+        for turn, sent, turns, turn_tokens, summary_tokens in result["rows"]:
+            print(f"{result['mode']:<7} {turn:>5} {sent:>14} {turns:>13} {turn_tokens:>12} {summary_tokens:>15}")
+    print(f"\n{'mode':<7} {'max prompt':>11} {'next-task calls':>16} {'summary calls':>14} {'ms/turn':>8}")
+    for result in results:
+        print(f"{result['mode']:<7} {result['max_sent']:>11} {result['calls']['next_task']:>16} "
+              f"{result['calls']['summary']:>14} {result['ms_per_turn']:>8.2f}")
+
+    # The first turn has no history; later ones add it, and may have a longer message
+    failed = False
+    for result in results[1:]:
+        bound = (result["first_sent"] + result["longest_message"]
+                 + settings.conversation_history_tokens + settings.conversation_summary_max_tokens)
+        ok = result["max_sent"] <= bound
+        failed |= not ok
+        print(f"{result['mode']}: largest prompt {result['max_sent']} tokens, bound {bound}: {'ok' if ok else 'EXCEEDED'}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Concurrent task-store reads/writes: default SQLite setup vs the tuned async engine.
+
+Each worker loops over the operations the API performs: mostly loading a
+user's open tasks (the TaskSnapshotCache build a chat request runs when the
+user has no snapshot yet) with some bulk task writes mixed in. "default" is a
+plain aiosqlite engine (rollback journal, full fsync, a new connection per
+checkout); "tuned" is backend.core.database.make_async_engine (pooled, WAL,
+synchronous=NORMAL, mmap).
+
+    python -m benchmarks.bench_database --workers 16 --ops 200 --write-ratio 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.core.database import make_async_engine
+from backend.models.user import Base
+from backend.services.task_snapshots import TaskSnapshotCache
+from backend.services.task_store import bulk_upsert
+
+USERS = 50
+TASKS_PER_SNAPSHOT = 50
+
+
+async def seed(session_factory, tasks_per_user):
+    async with session_factory() as db:
+        for user_id in range(USERS):
+            await bulk_upsert(db, user_id, [
+                {"title": f"Task {i}", "priority": random.choice(["low", "medium", "high"]), "estimated_duration": 30}
+                for i in range(tasks_per_user)
+            ])
+
+
+async def worker(session_factory, snapshots, ops, write_ratio, rng, latencies):
+    for _ in range(ops):
+        user_id = rng.randrange(USERS)
+        start = time.perf_counter()
+        async with session_factory() as db:
+            if rng.random() < write_ratio:
+                created, _, _ = await bulk_upsert(db, user_id, [{"title": "New task", "estimated_duration": 15}])
+                await snapshots.apply(user_id, created, db)
+            else:
+                # Every read builds the snapshot from the database, as on a cache miss
+                await snapshots._load(db, user_id, 0)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(name, engine, args):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    await seed(session_factory, args.tasks_per_user)
+
+    # No users kept, so reads are never served from memory
+    snapshots = TaskSnapshotCache(max_users=0, max_tasks=TASKS_PER_SNAPSHOT)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(session_factory, snapshots, args.ops, args.write_ratio, random.Random(index), latencies)
+        for index in range(args.workers)
+    ))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:>8} {len(latencies) / elapsed:>10.0f} {p50:>8.2f} {p99:>8.2f}")
+    return len(latencies) / elapsed
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as directory:
+        default_url = "sqlite:///" + os.path.join(directory, "default.db")
+        tuned_url = "sqlite:///" + os.path.join(directory, "tuned.db")
+        print(f"{args.workers} workers x {args.ops} ops, {args.write_ratio:.0%} writes")
+        print(f"{'engine':>8} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        baseline = await run("default", create_async_engine(default_url.replace("sqlite", "sqlite+aiosqlite", 1)), args)
+        tuned = await run("tuned", make_async_engine(tuned_url), args)
+        print(f"throughput x{tuned / baseline:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--tasks-per-user", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Load test for the /api/v1/chat/* endpoints.
+
+Starts the OpenAI stub and the app under uvicorn, each in its own process.
+It then drives every scenario at each --concurrency level, using that many
+closed-loop clients, and writes a JSON report covering:
+- throughput
+- latency percentiles
+- time to first token for the streaming endpoints
+- fallback and error counts
+- upstream (stub) calls
+
+Pass --base-url to load an already running server instead; point that
+server's OPENAI_BASE_URL at a stub first.
+
+--baseline compares the run with an earlier report. The script exits 1 when
+a scenario's throughput drops, or its p95 latency grows, by more than
+--tolerance at the same concurrency.
+
+Rate limits, budgets and the consolidation job are lifted for the spawned
+app. LLM_MAX_RETRIES and other settings are inherited from the environment.
+
+    python -m benchmarks.bench_load --concurrency 1 8 32 --requests 200 --output load.json
+    python -m benchmarks.bench_load --latency 0.2 --jitter 0.1 --error-rate 0.05 --baseline load.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from .stub_openai import free_port
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TASKS = [
+    {"title": "Write project proposal", "priority": "high", "estimated_duration": 60, "energy_required": "high"},
+    {"title": "Review emails", "priority": "medium", "estimated_duration": 15, "energy_required": "low"},
+    {"title": "Prepare sprint demo", "priority": "high", "estimated_duration": 45, "due_date": "2030-01-01"},
+    {"title": "Update documentation", "priority": "low", "estimated_duration": 30},
+]
+
+# Settings for the spawned app: no limits in the way of the load
+APP_ENV = {
+    "OPENAI_API_KEY": "sk-stub",
+    "LLM_PROVIDERS": "openai",
+    "RATE_LIMIT_USER_RPM": "100000000",
+    "RATE_LIMIT_GLOBAL_RPM": "100000000",
+    "USER_DAILY_TOKEN_BUDGET": "100000000000",
+    "BATCH_REQUESTS_PER_MINUTE": "100000000",
+    "BATCH_TOKENS_PER_MINUTE": "100000000000",
+    "MEMORY_CONSOLIDATION_INTERVAL_SECONDS": "0",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def chat_payload(message: str, bypass_cache: bool) -> Dict[str, Any]:
+    return {
+        "message": message,
+        "energy_level": "medium",
+        "personality_mode": "coach",
+        "tasks": TASKS,
+        "bypass_cache": bypass_cache,
+    }
+
+
+class Scenario:
+    """One endpoint: how to build its request and how to read its response"""
+
+    def __init__(self, name: str, path: str, kind: str, build: Callable[[int, argparse.Namespace], Dict[str, Any]]):
+        self.name = name
+        self.path = path
+        self.kind = kind  # "json", "sse" or "batch"
+        self.build = build
+
+
+# Distinct messages per request, so identical-prompt coalescing does not hide the load
+SCENARIOS = [
+    Scenario("next-task", "/api/v1/chat/next-task", "json",
+             lambda i, args: chat_payload(f"What should I do next? (#{i})", not args.cache)),
+    Scenario("plan-day", "/api/v1/chat/plan-day", "json",
+             lambda i, args: chat_payload(f"Plan my day (#{i})", not args.cache)),
+    Scenario("morning-checkin", "/api/v1/chat/morning-checkin", "json",
+             lambda i, args: chat_payload(f"Good morning (#{i})", not args.cache)),
+    Scenario("next-task-stream", "/api/v1/chat/next-task/stream", "sse",
+             lambda i, args: chat_payload(f"What should I do next? (#{i})", not args.cache)),
+    Scenario("plan-day-stream", "/api/v1/chat/plan-day/stream", "sse",
+             lambda i, args: chat_payload(f"Plan my day (#{i})", not args.cache)),
+    Scenario("plan-day-batch", "/api/v1/chat/plan-day/batch", "batch",
+             lambda i, args: {"items": [
+                 chat_payload(f"Plan my day (#{i}.{item})", not args.cache) for item in range(args.batch_items)
+             ]}),
+]
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": round(at(0.50), 2),
+        "p90": round(at(0.90), 2),
+        "p95": round(at(0.95), 2),
+        "p99": round(at(0.99), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """One request: {"outcome": ok | fallback | error, "latency_ms", "ttfb_ms"}"""
+    start = time.perf_counter()
+    ttfb = None
+    outcome = "error"
+    try:
+        if scenario.kind == "sse":
+            async with client.stream("POST", scenario.path, json=payload) as response:
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                        if ttfb is None and event == "token":
+                            ttfb = (time.perf_counter() - start) * 1000
+                    elif line.startswith("data: ") and event == "done":
+                        done = json.loads(line[len("data: "):])
+                        outcome = "error" if done.get("error") else "fallback" if done.get("fallback") else "ok"
+                if response.status_code != 200:
+                    outcome = "error"
+        else:
+            response = await client.post(scenario.path, json=payload)
+            if response.status_code == 200:
+                body = response.json()
+                if scenario.kind == "batch":
+                    results = body["results"]
+                    if body["failed"]:
+                        outcome = "error"
+                    elif any(item["result"].get("fallback") for item in results):
+                        outcome = "fallback"
+                    else:
+                        outcome = "ok"
+                else:
+                    outcome = "fallback" if body.get("fallback") else "ok"
+    except httpx.HTTPError:
+        outcome = "error"
+    return {"outcome": outcome, "latency_ms": (time.perf_counter() - start) * 1000, "ttfb_ms": ttfb}
+
+
+async def upstream_calls(stub_url: Optional[str]) -> Optional[Dict[str, int]]:
+    if stub_url is None:
+        return None
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{stub_url}/stats")).json()
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    args: argparse.Namespace,
+    stub_url: Optional[str]
+) -> Dict[str, Any]:
+    counter = itertools.count()
+
+    # Warm up connections and lazy app state; not recorded
+    await asyncio.gather(*(send(client, scenario, scenario.build(-1 - i, args)) for i in range(concurrency)))
+
+    total = max(args.requests, concurrency)
+    samples: List[Dict[str, Any]] = []
+
+    async def worker():
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            samples.append(await send(client, scenario, scenario.build(index, args)))
+
+    before = await upstream_calls(stub_url)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    after = await upstream_calls(stub_url)
+
+    outcomes = {name: sum(1 for sample in samples if sample["outcome"] == name) for name in ("ok", "fallback", "error")}
+    result = {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        **outcomes,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(samples) / duration, 2),
+        "latency_ms": percentiles([sample["latency_ms"] for sample in samples]),
+    }
+    if scenario.kind == "sse":
+        result["ttfb_ms"] = percentiles([sample["ttfb_ms"] for sample in samples if sample["ttfb_ms"] is not None])
+    if scenario.kind == "batch":
+        result["items_per_s"] = round(len(samples) * args.batch_items / duration, 2)
+    if before is not None:
+        result["upstream_calls"] = after["requests"] - before["requests"]
+        result["upstream_errors"] = after["errors"] - before["errors"]
+    return result
+
+
+async def run(args: argparse.Namespace, base_url: str, stub_url: Optional[str]) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for scenario in SCENARIOS:
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            for concurrency in args.concurrency:
+                result = await run_level(client, scenario, concurrency, args, stub_url)
+                results.append(result)
+                print_row(result)
+    return results
+
+
+def print_row(result: Dict[str, Any]):
+    latency = result["latency_ms"] or {}
+    ttfb = (result.get("ttfb_ms") or {}).get("p50")
+    print(
+        f"{result['scenario']:<18} {result['concurrency']:>5} {result['throughput_rps']:>9.1f} "
+        f"{latency.get('p50', 0):>9.1f} {latency.get('p95', 0):>9.1f} {latency.get('p99', 0):>9.1f} "
+        f"{'-' if ttfb is None else f'{ttfb:.1f}':>9} {result['fallback']:>8} {result['error']:>6}"
+    )
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions against a previous report, as readable lines"""
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        label = f"{row['scenario']} @ {row['concurrency']}"
+        if row["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {old['throughput_rps']} -> {row['throughput_rps']} req/s")
+        old_p95 = (old["latency_ms"] or {}).get("p95")
+        new_p95 = (row["latency_ms"] or {}).get("p95")
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{label}: p95 latency {old_p95} -> {new_p95} ms")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_ready(url: str, process: subprocess.Popen, log_path: Path, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s; see {log_path}")
+
+
+def spawn(command: List[str], env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    with open(log_path, "w") as log:
+        return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and concurrency level")
+    parser.add_argument("--scenarios", nargs="+", choices=[scenario.name for scenario in SCENARIOS])
+    parser.add_argument("--batch-items", type=int, default=10)
+    parser.add_argument("--cache", action="store_true", help="let the response cache answer repeated requests")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--base-url", help="load this running server instead of spawning one")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random stub latency, 0..jitter seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub calls that fail")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="stub delay between streamed words")
+    parser.add_argument("--output", default="load_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    processes = []
+    stub_config = None
+    workdir = tempfile.TemporaryDirectory(prefix="timely-load-")
+    try:
+        if args.base_url:
+            base_url, stub_url = args.base_url.rstrip("/"), None
+        else:
+            stub_port, app_port = free_port(), free_port()
+            stub_url = f"http://127.0.0.1:{stub_port}"
+            base_url = f"http://127.0.0.1:{app_port}"
+            stub_config = {
+                "latency": args.latency, "jitter": args.jitter,
+                "error_rate": args.error_rate, "token_delay": args.token_delay,
+            }
+            stub_log = Path(workdir.name) / "stub.log"
+            processes.append(spawn([
+                sys.executable, "-m", "benchmarks.stub_openai", "--port", str(stub_port),
+                "--latency", str(args.latency), "--jitter", str(args.jitter),
+                "--error-rate", str(args.error_rate), "--token-delay", str(args.token_delay),
+            ], dict(os.environ), stub_log))
+            wait_ready(f"{stub_url}/stats", processes[-1], stub_log)
+
+            app_log = Path(workdir.name) / "app.log"
+            env = {
+                **os.environ,
+                **APP_ENV,
+                "OPENAI_BASE_URL": f"{stub_url}/v1",
+                "DATABASE_URL": f"sqlite:///{Path(workdir.name) / 'load.db'}",
+            }
+            processes.append(spawn([
+                sys.executable, "-m", "uvicorn", "backend.main:app",
+                "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning",
+            ], env, app_log))
+            wait_ready(f"{base_url}/health", processes[-1], app_log)
+
+        print(f"{'scenario':<18} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'ttfb p50':>9} {'fallback':>8} {'errors':>6}")
+        results = asyncio.run(run(args, base_url, stub_url))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        workdir.cleanup()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "base_url": args.base_url,
+            "stub": stub_config,
+            "requests_per_level": args.requests,
+            "batch_items": args.batch_items,
+            "cache": args.cache,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"report written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        shared = {(row["scenario"], row["concurrency"]) for row in baseline["results"]} & {
+            (row["scenario"], row["concurrency"]) for row in results
+        }
+        if not shared:
+            print(f"FAIL: no scenario/concurrency in common with {args.baseline}")
+            sys.exit(1)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"FAIL: {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"OK: no regression beyond {args.tolerance:.0%} in {len(shared)} rows shared with {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Throughput of request handling under the old print() logging vs the
+structured logger.
+
+Each simulated request does what the chat path logs on an LLM success: the
+old code printed three lines (attempt, success, token count) synchronously
+to stdout; the new code makes one log_sampled() call whose record, when
+kept, is formatted and written on the listener thread. --error-rate makes
+that share of requests fail and log a traceback (print + print_exc before,
+logger.exception now). Output goes to a line-buffered temporary file, which
+matches stdout in the container (PYTHONUNBUFFERED=1: one write per line)
+without the terminal dominating the numbers. --sink-latency-us adds a delay
+to every write, like a log pipe under backpressure: print() stalls the
+request for it, the queue only stalls the listener thread.
+
+    python -m benchmarks.bench_logging --requests 50000 --sample-rate 0.1
+"""
+import argparse
+import contextlib
+import sys
+import tempfile
+import time
+import traceback
+
+from backend.core import log
+from backend.core.config import settings
+from backend.core.log import configure_logging, get_logger, log_sampled, request_id_var, shutdown_logging
+
+logger = get_logger("bench.logging")
+
+
+class SlowStream:
+    """Text stream whose writes take at least latency seconds"""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def fail():
+    raise RuntimeError("upstream timed out")
+
+
+def legacy_request(i: int, failed: bool):
+    if failed:
+        try:
+            fail()
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+            print(f"Error type: {type(e)}")
+            traceback.print_exc(file=sys.stdout)
+        return
+    print("Attempting OpenAI API call with model: gpt-3.5-turbo")
+    print(f"OpenAI API call successful, tokens used: {120 + i % 50}, coalesced=False")
+
+
+def structured_request(i: int, failed: bool):
+    token = request_id_var.set(f"bench-{i}")
+    try:
+        if failed:
+            try:
+                fail()
+            except Exception:
+                logger.exception("OpenAI API error, using fallback", extra={"call": "next_task"})
+            return
+        log_sampled(logger, "LLM call succeeded", call="next_task", model="gpt-3.5-turbo",
+                    tokens=120 + i % 50, coalesced=False)
+    finally:
+        request_id_var.reset(token)
+
+
+def run(handler, requests: int, error_every: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        handler(i, error_every > 0 and i % error_every == 0)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--sample-rate", type=float, default=settings.log_sample_rate)
+    parser.add_argument("--error-rate", type=float, default=0.01, help="share of requests that log a traceback")
+    parser.add_argument("--sink-latency-us", type=float, default=0.0, help="extra time per write to the log sink")
+    args = parser.parse_args()
+    error_every = round(1 / args.error_rate) if args.error_rate > 0 else 0
+    settings.log_sample_rate = args.sample_rate
+
+    with tempfile.TemporaryFile("w", buffering=1) as file:
+        out = SlowStream(file, args.sink_latency_us / 1e6)
+        with contextlib.redirect_stdout(out):
+            legacy = run(legacy_request, args.requests, error_every)
+
+        configure_logging(stream=out)
+        structured = run(structured_request, args.requests, error_every)
+        drain_start = time.perf_counter()
+        dropped = log.stats()["dropped"]
+        shutdown_logging()
+        drain = time.perf_counter() - drain_start
+
+    print(f"{args.requests} requests, sample rate {args.sample_rate}, error rate {args.error_rate}, "
+          f"sink latency {args.sink_latency_us} us")
+    print(f"{'logging':<24} {'req/s':>12} {'us/req':>10}")
+    for name, seconds in (("print (legacy)", legacy), ("structured + queue", structured)):
+        print(f"{name:<24} {args.requests / seconds:>12.0f} {seconds / args.requests * 1e6:>10.2f}")
+    print(f"speedup on the request path: {legacy / structured:.1f}x")
+    print(f"listener drain after the run: {drain * 1000:.0f} ms, records dropped: {dropped}")
+
+
+if __name__ == "__main__":
+    main()
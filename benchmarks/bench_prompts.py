@@ -0,0 +1,117 @@
+"""
+Next-task prompt build time and token budgeting.
+
+Compares the compiled builder with the original per-call f-string version
+(personality dicts and emoji maps rebuilt on every call), then checks that
+compiled prompts stay within the token budget and that tasks are dropped
+from the low-ranked end first.
+
+    python -m benchmarks.bench_prompts --sizes 8 100 1000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from backend.services.ranker import rank_tasks
+from llm.prompts.compiler import build_next_task_prompt, count_tokens, format_task_line, token_counter
+from .bench_ranker import make_tasks
+
+CONTEXT_WINDOW = 4096
+MAX_TOKENS = 400
+
+
+def legacy_prompt(user_input, tasks, energy_level, personality_mode, current_time):
+    """The pre-compiler prompt: dicts per call, fixed cutoff of 8 tasks"""
+    personalities = {
+        "coach": "Be encouraging and supportive, like a professional productivity coach",
+        "friend": "Be casual and friendly, like a helpful friend",
+        "strict": "Be direct and focused, like an efficient executive assistant",
+        "zen": "Be calm and mindful, like a mindfulness teacher"
+    }
+    style = personalities.get(personality_mode, personalities["coach"])
+    formatted = []
+    for i, task in enumerate(tasks[:8], 1):
+        priority_emoji = {"low": "🔵", "medium": "🟡", "high": "🟠", "urgent": "🔴"}
+        emoji = priority_emoji.get(task.get('priority', 'medium'), '⚪')
+        formatted.append(f"{emoji} {task.get('title')} ({task.get('priority')} priority, ~{task.get('estimated_duration')}min)")
+    closers = {
+        "coach": "You've got this! 💪",
+        "friend": "Hope this helps! 😊",
+        "strict": "Execute immediately.",
+        "zen": "Focus on this moment. 🧘"
+    }
+    return f"""
+{style}.
+
+USER REQUEST: "{user_input}"
+
+CURRENT CONTEXT:
+- Time: {current_time.strftime('%A, %B %d at %I:%M %p')}
+- Energy Level: {energy_level}
+- Available Tasks: {len(tasks)}
+
+TASKS:
+{chr(10).join(formatted)}
+
+{closers.get(personality_mode, "Let's get started! ✨")}
+"""
+
+
+def compiled_prompt(tasks, cap=0):
+    return build_next_task_prompt(
+        "coach", "What should I do next?", tasks, "medium",
+        datetime.now().strftime('%A, %B %d at %I:%M %p'), len(tasks),
+        context_window=CONTEXT_WINDOW, max_completion_tokens=MAX_TOKENS, task_token_cap=cap
+    )
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def check_budget(tasks):
+    """Token-count assertions; raises AssertionError on a violation"""
+    for cap in (0, 50, 200):
+        prompt = compiled_prompt(tasks, cap)
+        # Both the builder's own estimate and a count of the final text fit
+        assert prompt.tokens + MAX_TOKENS <= CONTEXT_WINDOW, (cap, prompt.tokens)
+        assert count_tokens(prompt.text) + MAX_TOKENS <= CONTEXT_WINDOW, (cap, count_tokens(prompt.text))
+        assert prompt.tasks_included + prompt.tasks_dropped == len(tasks)
+        # Kept tasks are exactly the best-ranked prefix
+        kept = [format_task_line(task, i) for i, task in enumerate(tasks[:prompt.tasks_included], 1)]
+        assert all(line in prompt.text for line in kept)
+        if prompt.tasks_dropped:
+            dropped = format_task_line(tasks[prompt.tasks_included], prompt.tasks_included + 1)
+            assert dropped not in prompt.text
+        if cap:
+            task_tokens = sum(count_tokens(line) + 1 for line in kept)
+            assert task_tokens <= cap, (cap, task_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"token counter: {token_counter()}")
+    print(f"{'tasks':>8} {'legacy us':>10} {'compiled us':>12} {'tokens':>7} {'included':>9} {'dropped':>8}")
+    now = datetime.now()
+    for size in args.sizes:
+        tasks = rank_tasks(make_tasks(size), "medium")
+        check_budget(tasks)
+        legacy = best_of(lambda: legacy_prompt("What should I do next?", tasks, "medium", "coach", now), args.repeat)
+        compiled = best_of(lambda: compiled_prompt(tasks), args.repeat)
+        prompt = compiled_prompt(tasks)
+        print(f"{size:>8} {legacy:>10.1f} {compiled:>12.1f} {prompt.tokens:>7} "
+              f"{prompt.tasks_included:>9} {prompt.tasks_dropped:>8}")
+    print("token budget checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Task ranker cost versus task count.
+
+Reports the one-off conversion to column arrays separately from the
+vectorized scoring + top-k selection that runs per request.
+
+    python -m benchmarks.bench_ranker --sizes 100 1000 10000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from backend.services.ranker import TaskArrays, rank_indices, score_arrays
+
+
+def make_tasks(count, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now()
+    return [
+        {
+            "title": f"Task {i}",
+            "priority": rng.choice(["low", "medium", "high", "urgent"]),
+            "estimated_duration": rng.choice([15, 30, 45, 60, 90, 120]),
+            "due_date": (now + timedelta(hours=rng.uniform(-12, 96))).isoformat() if rng.random() < 0.6 else None,
+            "energy_required": rng.choice(["low", "medium", "high"]),
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8} {'to arrays us':>14} {'score+top-k us':>16}")
+    for size in args.sizes:
+        tasks = make_tasks(size)
+        arrays = TaskArrays.from_tasks(tasks)
+        convert = best_of(lambda: TaskArrays.from_tasks(tasks), max(1, args.repeat // 10))
+        rank = best_of(
+            lambda: rank_indices(score_arrays(arrays, "medium", available_minutes=45)["total"], args.k),
+            args.repeat,
+        )
+        print(f"{size:>8} {convert:>14.1f} {rank:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Provider routing under a single-provider slowdown, against two local stubs.
+
+One stub plays OpenAI and one plays Anthropic. Both routing modes run the
+same three phases of next-task calls:
+- healthy: Anthropic is faster and cheaper
+- slow: Anthropic answers, but takes --slow seconds
+- errors: every Anthropic call fails
+
+"ordered" tries Anthropic first and fails over to OpenAI on errors.
+"adaptive" also moves traffic away from the slow provider. For each phase
+the script reports latency percentiles, fallbacks and the share of calls
+each provider served.
+
+Retries are off (LLM_MAX_RETRIES=0), so a failed call fails over at once.
+The breaker window and open time are scaled down to the length of a
+phase.
+
+    python -m benchmarks.bench_routing --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import time
+
+from .stub_openai import StubServer
+
+TASKS = [
+    {"title": "Review emails", "priority": "medium", "estimated_duration": 15},
+    {"title": "Write project proposal", "priority": "high", "estimated_duration": 60},
+]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_phase(assistant, requests, concurrency, offset):
+    latencies = []
+    fallbacks = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal fallbacks
+        for index in counter:
+            start = time.perf_counter()
+            result = await assistant.what_should_i_do_next(
+                user_input=f"What next? (#{offset + index})", available_tasks=TASKS
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            fallbacks += bool(result.get("fallback"))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, fallbacks
+
+
+async def run(mode, stubs, phases, args):
+    from backend.core.config import settings
+    from llm.agents.assistant import TimelyAssistant
+
+    os.environ["LLM_ROUTING"] = mode
+    settings.reload()
+    assistant = TimelyAssistant()
+    rows = []
+    try:
+        for number, (phase, config) in enumerate(phases):
+            for name, stub in stubs.items():
+                stub.app.state.latency = config[name].get("latency", 0.0)
+                stub.app.state.error_rate = config[name].get("error_rate", 0.0)
+            before = {name: stub.app.state.requests for name, stub in stubs.items()}
+            latencies, fallbacks = await run_phase(assistant, args.requests, args.concurrency, number * args.requests)
+            served = {name: stub.app.state.requests - before[name] for name, stub in stubs.items()}
+            rows.append((mode, phase, latencies, fallbacks, served))
+    finally:
+        await assistant.aclose()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="calls per phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fast", type=float, default=0.05, help="healthy Anthropic latency in seconds")
+    parser.add_argument("--openai", type=float, default=0.15, help="OpenAI latency in seconds")
+    parser.add_argument("--slow", type=float, default=1.0, help="degraded Anthropic latency in seconds")
+    args = parser.parse_args()
+
+    phases = [
+        ("healthy", {"openai": {"latency": args.openai}, "anthropic": {"latency": args.fast}}),
+        ("slow", {"openai": {"latency": args.openai}, "anthropic": {"latency": args.slow}}),
+        ("errors", {"openai": {"latency": args.openai}, "anthropic": {"latency": args.fast, "error_rate": 1.0}}),
+    ]
+
+    with StubServer(jitter=0.01) as openai_stub, StubServer(jitter=0.01) as anthropic_stub:
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-stub",
+            "OPENAI_BASE_URL": openai_stub.base_url,
+            "ANTHROPIC_API_KEY": "stub",
+            "ANTHROPIC_BASE_URL": anthropic_stub.root_url,
+            "LLM_PROVIDERS": "anthropic,openai",
+            "LLM_MAX_RETRIES": "0",
+            "LLM_BREAKER_WINDOW_SECONDS": "2",
+            "LLM_BREAKER_OPEN_SECONDS": "2",
+            "RANKER_MODE": "hybrid",
+            "LOG_LEVEL": "ERROR",
+        })
+        stubs = {"openai": openai_stub, "anthropic": anthropic_stub}
+        # Failover warnings would flood the output; logging is not configured here
+        logging.disable(logging.WARNING)
+        rows = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for mode in ("ordered", "adaptive"):
+                rows.extend(asyncio.run(run(mode, stubs, phases, args)))
+
+    print(f"{'routing':<9} {'phase':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fallback':>8} "
+          f"{'anthropic':>10} {'openai':>8}")
+    for mode, phase, latencies, fallbacks, served in rows:
+        total = sum(served.values()) or 1
+        print(f"{mode:<9} {phase:<8} {percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f} "
+              f"{percentile(latencies, 0.99):>8.1f} {fallbacks:>8} "
+              f"{served['anthropic'] / total:>10.0%} {served['openai'] / total:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
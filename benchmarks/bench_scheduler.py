@@ -0,0 +1,41 @@
+"""
+Local day scheduler time versus task count.
+
+    python -m benchmarks.bench_scheduler --sizes 10 50 100 250 500 1000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from backend.services.scheduler import plan_day
+from .bench_ranker import make_tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 250, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+
+    # Fixed morning start so every run schedules a full working day
+    now = datetime.now(ZoneInfo(args.timezone)).replace(hour=8, minute=0)
+
+    print(f"{'tasks':>8} {'median ms':>10} {'p95 ms':>8} {'scheduled':>10} {'unscheduled':>12}")
+    for size in args.sizes:
+        tasks = make_tasks(size)
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            schedule = plan_day(tasks, timezone=args.timezone, now=now)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        print(f"{size:>8} {statistics.median(samples):>10.2f} {p95:>8.2f} "
+              f"{len(schedule.tasks):>10} {len(schedule.unscheduled):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+CPU cost of encoding chat responses: FastAPI's response_model path vs json_response.
+
+Two payloads are built by the assistant's local fallback, so no model is
+called: a next-task answer and a day plan over --tasks tasks (with its
+schedule blocks in context_used).
+- encode: the response step alone, from the handler's result dict to body
+  bytes. legacy is ChatResponse(**result) returned through response_model
+  (validated again, jsonable_encoder, stdlib json); fast is the same model
+  encoded once by json_response
+- e2e: whole requests against an in-process app with one route per path,
+  driven through httpx's ASGI transport (no sockets), so routing and
+  request handling are included, and so is the client's own CPU, which
+  is the same for both paths
+- compress: body size and encode time for identity, gzip and brotli (when
+  installed) of the day plan
+
+CPU is process time per response in microseconds; "cores saved" is what the
+difference adds up to at --rps requests per second.
+
+    python -m benchmarks.bench_serialization --iterations 5000 --tasks 40 --rps 2000
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from .bench_load import TASKS
+
+E2E_ROUNDS = 3
+
+
+def cpu_us(fn: Callable[[], Any], iterations: int) -> float:
+    fn()
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+async def build_payloads(task_count: int) -> Dict[str, Dict[str, Any]]:
+    from llm.agents.assistant import TimelyAssistant
+
+    tasks = [{**task, "title": f"{task['title']} #{i}"} for i in range(task_count) for task in TASKS][:task_count]
+    assistant = TimelyAssistant()
+    try:
+        return {
+            "next-task": await assistant.what_should_i_do_next(
+                user_input="What next?", available_tasks=tasks, allow_llm=False
+            ),
+            "plan-day": await assistant.plan_my_day(
+                user_input="Plan my day", available_tasks=tasks, allow_llm=False
+            ),
+        }
+    finally:
+        await assistant.aclose()
+
+
+def make_request(accept_encoding: str = ""):
+    from starlette.requests import Request
+
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b""})
+
+
+def encode_step(payloads: Dict[str, Dict[str, Any]], iterations: int) -> List[tuple]:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from backend.api.chat import ChatResponse
+    from backend.api.responses import json_response
+
+    field = create_response_field(name="Response_chat", type_=ChatResponse)
+    request = make_request()
+    loop = asyncio.new_event_loop()
+    rows = []
+    for name, result in payloads.items():
+        def legacy():
+            content = loop.run_until_complete(serialize_response(
+                field=field, response_content=ChatResponse(**result), is_coroutine=True
+            ))
+            return JSONResponse(content).body
+
+        def fast():
+            return json_response(request, model=ChatResponse(**result)).body
+
+        # Same document either way, only the encoding work differs
+        assert json.loads(legacy()) == json.loads(fast()), name
+        rows.append((name, len(fast()), cpu_us(legacy, iterations), cpu_us(fast, iterations)))
+    loop.close()
+    return rows
+
+
+async def e2e_step(payloads: Dict[str, Dict[str, Any]], iterations: int) -> List[tuple]:
+    from fastapi import FastAPI, Request
+
+    from backend.api.chat import ChatResponse
+    from backend.api.responses import json_response
+
+    app = FastAPI()
+    for name, result in payloads.items():
+        async def legacy(result=result):
+            return ChatResponse(**result)
+
+        async def fast(request: Request, result=result):
+            return json_response(request, model=ChatResponse(**result))
+
+        app.add_api_route(f"/legacy/{name}", legacy, methods=["POST"], response_model=ChatResponse)
+        app.add_api_route(f"/fast/{name}", fast, methods=["POST"], response_model=ChatResponse)
+
+    rows = []
+    # identity: compression is measured on its own below
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", headers={"Accept-Encoding": "identity"}
+    ) as client:
+        async def timed(path):
+            await client.post(path)
+            start = time.process_time()
+            for _ in range(iterations):
+                response = await client.post(path)
+                response.raise_for_status()
+            return (time.process_time() - start) / iterations * 1e6
+
+        for name in payloads:
+            # Best of a few alternating rounds, as the client's own cost is in the same process
+            legacy, fast = [], []
+            for _ in range(E2E_ROUNDS):
+                legacy.append(await timed(f"/legacy/{name}"))
+                fast.append(await timed(f"/fast/{name}"))
+            rows.append((name, min(legacy), min(fast)))
+    return rows
+
+
+def compress_step(body: bytes, iterations: int) -> List[tuple]:
+    from backend.api import responses
+    from backend.core.config import settings
+
+    rows = [("identity", len(body), 0.0)]
+    level = settings.response_gzip_level
+    rows.append((f"gzip-{level}", len(gzip.compress(body, level, mtime=0)),
+                 cpu_us(lambda: gzip.compress(body, level, mtime=0), iterations)))
+    if responses.brotli is not None:
+        quality = settings.response_brotli_quality
+        rows.append((f"br-{quality}", len(responses.brotli.compress(body, quality=quality)),
+                     cpu_us(lambda: responses.brotli.compress(body, quality=quality), iterations)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--tasks", type=int, default=40, help="tasks in the day plan")
+    parser.add_argument("--rps", type=float, default=2000.0, help="request rate for the cores-saved column")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+    os.environ.update({"LLM_PROVIDERS": "openai", "LOG_LEVEL": "ERROR"})
+    from backend.api import responses
+    from backend.core.config import settings
+    settings.reload()
+
+    payloads = asyncio.run(build_payloads(args.tasks))
+    encoder = "orjson" if responses.orjson is not None else "json"
+    print(f"{args.iterations} iterations, {args.tasks} tasks, encoder {encoder}, "
+          f"brotli {'yes' if responses.brotli is not None else 'no'}")
+
+    def report(title, rows):
+        print(f"\n{title}")
+        print(f"{'payload':<10} {'legacy us':>10} {'fast us':>9} {'saved us':>9} {'speedup':>8} {'cores saved':>12}")
+        for name, legacy, fast in rows:
+            saved = legacy - fast
+            print(f"{name:<10} {legacy:>10.1f} {fast:>9.1f} {saved:>9.1f} {legacy / fast:>7.2f}x "
+                  f"{saved * args.rps / 1e6:>12.3f}")
+
+    encode = encode_step(payloads, args.iterations)
+    report("encode (result dict -> body bytes)", [(name, legacy, fast) for name, _, legacy, fast in encode])
+    report("e2e (in-process request)", asyncio.run(e2e_step(payloads, args.iterations // 5 or 1)))
+
+    body = dict((name, size) for name, size, _, _ in encode)
+    from backend.api.chat import ChatResponse
+    plan = ChatResponse(**payloads["plan-day"])
+    plan_body = plan.__pydantic_serializer__.to_json(plan)
+    print(f"\ncompress (plan-day, {body['plan-day']} bytes; next-task is {body['next-task']} bytes, "
+          f"below the {settings.response_compression_min_bytes}-byte threshold)")
+    print(f"{'encoding':<10} {'bytes':>8} {'ratio':>7} {'cpu us':>8}")
+    for name, size, cost in compress_step(plan_body, args.iterations):
+        print(f"{name:<10} {size:>8} {size / len(plan_body):>7.2f} {cost:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cold-start budget for the API process.
+
+Measures, each in fresh interpreters:
+- import: `import backend.main` (median of --runs), and which heavy
+  modules it pulled in; numpy, the LLM client, the tokenizer and the
+  memory stack must stay deferred until the startup warmup (see
+  backend.core.lazy)
+- live: from spawning uvicorn to the first 200 from /health/live, i.e.
+  until the port is bound and the lifespan startup has finished
+- ready: from spawning uvicorn to the first 200 from /health/ready, i.e.
+  until the warmup has loaded everything (MEMORY_WARMUP and the other
+  settings are inherited from the environment)
+
+The script exits 1 when a median exceeds its budget or a deferred module is
+imported eagerly, so it can gate changes that slow down startup.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --import-budget-ms 1200 --live-budget-ms 2500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from .bench_load import APP_ENV, ROOT, spawn
+from .stub_openai import free_port
+
+# Must not be imported by `import backend.main`
+DEFERRED_MODULES = ("numpy", "openai", "chromadb", "sentence_transformers", "torch", "tiktoken")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "eager": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import() -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, **APP_ENV}
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def wait_status(url: str, process: subprocess.Popen, log_path: Path, timeout: float) -> float:
+    """Poll url until it answers 200; returns the time.monotonic() of that answer"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited with {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} not 200 after {timeout}s; see {log_path}")
+
+
+def measure_server(workdir: Path, run: int, timeout: float) -> Dict[str, float]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log_path = workdir / f"app-{run}.log"
+    env = {
+        **os.environ,
+        **APP_ENV,
+        # Nothing is called upstream; keep the check-in prefill out of the measurement
+        "CHECKIN_POOL_PREFILL_INTERVAL_SECONDS": "0",
+        "DATABASE_URL": f"sqlite:///{workdir / f'startup-{run}.db'}",
+    }
+    start = time.monotonic()
+    process = spawn([
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ], env, log_path)
+    try:
+        live = wait_status(f"{base_url}/health/live", process, log_path, timeout)
+        ready = wait_status(f"{base_url}/health/ready", process, log_path, timeout)
+        warmup = httpx.get(f"{base_url}/health/ready", timeout=1).json()["warmup"]
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"live": (live - start) * 1000, "ready": (ready - start) * 1000, "warmup": warmup}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--live-budget-ms", type=float, default=3500.0)
+    parser.add_argument("--ready-budget-ms", type=float, default=15000.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for each probe")
+    args = parser.parse_args()
+
+    imports: List[Dict] = [measure_import() for _ in range(args.runs)]
+    with tempfile.TemporaryDirectory(prefix="timely-startup-") as workdir:
+        servers = [measure_server(Path(workdir), run, args.timeout) for run in range(args.runs)]
+
+    medians = {
+        "import": statistics.median(sample["ms"] for sample in imports),
+        "live": statistics.median(sample["live"] for sample in servers),
+        "ready": statistics.median(sample["ready"] for sample in servers),
+    }
+    budgets = {"import": args.import_budget_ms, "live": args.live_budget_ms, "ready": args.ready_budget_ms}
+    eager = sorted({module for sample in imports for module in sample["eager"]})
+
+    print(f"{args.runs} runs, python {sys.version.split()[0]}")
+    print(f"{'phase':<8} {'median ms':>10} {'min ms':>9} {'max ms':>9} {'budget ms':>10}")
+    samples = {
+        "import": [sample["ms"] for sample in imports],
+        "live": [sample["live"] for sample in servers],
+        "ready": [sample["ready"] for sample in servers],
+    }
+    for phase, values in samples.items():
+        print(f"{phase:<8} {medians[phase]:>10.0f} {min(values):>9.0f} {max(values):>9.0f} {budgets[phase]:>10.0f}")
+    steps = servers[-1]["warmup"]["steps"]
+    print("warmup steps (last run): " + ", ".join(
+        f"{name} {step['seconds'] * 1000:.0f} ms" + (" (failed, optional)" if "error" in step else "")
+        for name, step in steps.items()
+    ))
+    print(f"deferred modules imported eagerly: {', '.join(eager) or 'none'}")
+
+    failures = [
+        f"{phase}: median {medians[phase]:.0f} ms over the {budgets[phase]:.0f} ms budget"
+        for phase in medians if medians[phase] > budgets[phase]
+    ]
+    if eager:
+        failures.append(f"import backend.main loaded {', '.join(eager)}")
+    if failures:
+        print("STARTUP REGRESSION:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
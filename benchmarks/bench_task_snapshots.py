@@ -0,0 +1,178 @@
+"""
+Open-task loading for chat: a query per request vs per-user snapshots.
+
+Seeds a temporary SQLite database with --users users of --tasks open tasks
+each, then runs --ops operations against TaskSnapshotCache. Each operation
+picks a random user and is either a chat read (pending()) or, for
+--write-ratio of them, a task write through the same paths as the task API:
+create, reprioritize, complete or delete, then apply()/remove(). Modes:
+- query: TASK_SNAPSHOT_MAX_USERS=0, every read queries and converts rows
+- snapshot: reads are served from memory, writes update snapshots in place
+- shared: snapshot, plus the per-user version check in a SQLite file that
+  multi-worker deployments use
+
+Reported per mode: read latency, CPU per operation and, for the snapshot
+modes, hit ratio and memory. Every user's snapshot is then compared with a
+fresh query, and the script exits 1 on any difference.
+
+    python -m benchmarks.bench_task_snapshots --users 200 --tasks 100 --ops 5000 --write-ratio 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+
+async def seed(users, tasks_per_user, rng):
+    from backend.core.database import AsyncSessionLocal, init_db
+    from backend.services.task_store import bulk_upsert
+
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        for user_id in range(users):
+            await bulk_upsert(db, user_id, [random_task(rng, f"Task {i}") for i in range(tasks_per_user)])
+
+
+def random_task(rng, title):
+    due = None
+    if rng.random() < 0.6:
+        due = datetime(2030, 1, rng.randint(1, 28), rng.randint(8, 18))
+    return {
+        "title": title,
+        "priority": rng.choice(["low", "medium", "high", "urgent"]),
+        "estimated_duration": rng.choice([15, 30, 45, 60, 90]),
+        "due_date": due,
+        "energy_required": rng.choice(["low", "medium", "high"]),
+        "context_tags": rng.sample(["deep", "email", "calls", "admin", "home"], 2),
+        "is_completed": False,
+    }
+
+
+async def write(cache, user_id, rng):
+    from sqlalchemy import select
+
+    from backend.core.database import AsyncSessionLocal
+    from backend.models.user import Task
+    from backend.services.task_store import bulk_upsert, delete_task
+
+    async with AsyncSessionLocal() as db:
+        kind = rng.choice(["create", "reprioritize", "complete", "delete"])
+        if kind == "create":
+            created, _, _ = await bulk_upsert(db, user_id, [random_task(rng, "New task")])
+            await cache.apply(user_id, created, db)
+            return
+        ids = list(await db.scalars(
+            select(Task.id).where(Task.user_id == user_id, Task.is_completed == False)  # noqa: E712
+        ))
+        if not ids:
+            return
+        task_id = rng.choice(ids)
+        if kind == "delete":
+            await delete_task(db, user_id, task_id)
+            await cache.remove(user_id, [task_id])
+            return
+        change = {"priority": rng.choice(["low", "urgent"])} if kind == "reprioritize" else {"is_completed": True}
+        _, updated, _ = await bulk_upsert(db, user_id, [{"id": task_id, **change}])
+        await cache.apply(user_id, updated, db)
+
+
+async def run_mode(name, cache, args):
+    rng = random.Random(args.seed)
+    latencies = []
+    writes = 0
+    cpu_start = time.process_time()
+    for _ in range(args.ops):
+        user_id = rng.randrange(args.users)
+        if rng.random() < args.write_ratio:
+            await write(cache, user_id, rng)
+            writes += 1
+        else:
+            start = time.perf_counter()
+            await cache.pending(user_id)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    cpu_us = (time.process_time() - cpu_start) / args.ops * 1e6
+    latencies.sort()
+    return {
+        "name": name,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "cpu_us": cpu_us,
+        "writes": writes,
+        "stats": cache.stats(),
+    }
+
+
+async def check(cache, users, max_tasks):
+    """Users whose cached tasks differ from a fresh query"""
+    from backend.services.task_snapshots import TaskSnapshotCache
+
+    fresh = TaskSnapshotCache(max_users=0, max_tasks=max_tasks)
+    return [user_id for user_id in range(users) if await cache.pending(user_id) != await fresh.pending(user_id)]
+
+
+async def main_async(args, directory):
+    from backend.core.database import async_engine
+
+    try:
+        return await compare_modes(args, directory)
+    finally:
+        await async_engine.dispose()
+
+
+async def compare_modes(args, directory):
+    from backend.services.task_snapshots import TaskSnapshotCache
+
+    await seed(args.users, args.tasks, random.Random(args.seed))
+    modes = [
+        ("query", TaskSnapshotCache(max_users=0, max_tasks=args.max_tasks)),
+        ("snapshot", TaskSnapshotCache(max_users=args.users, max_tasks=args.max_tasks)),
+        ("shared", TaskSnapshotCache(
+            max_users=args.users, max_tasks=args.max_tasks, sqlite_path=os.path.join(directory, "shared.db")
+        )),
+    ]
+    results = []
+    mismatches = {}
+    for name, cache in modes:
+        results.append(await run_mode(name, cache, args))
+        mismatches[name] = await check(cache, args.users, args.max_tasks)
+    return results, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=100, help="open tasks per user at the start")
+    parser.add_argument("--max-tasks", type=int, default=200, help="tasks kept per snapshot (CHAT_TASK_LOAD_LIMIT)")
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="timely-snapshots-") as directory:
+        os.environ.update({
+            "DATABASE_URL": "sqlite:///" + os.path.join(directory, "tasks.db"),
+            "LOG_LEVEL": "ERROR",
+        })
+        results, mismatches = asyncio.run(main_async(args, directory))
+
+    print(f"{args.users} users x {args.tasks} tasks, {args.ops} ops, {args.write_ratio:.0%} writes, "
+          f"snapshots of at most {args.max_tasks} tasks")
+    print(f"{'mode':<9} {'read p50 us':>12} {'read p99 us':>12} {'cpu us/op':>10} {'hit ratio':>10} "
+          f"{'updates':>8} {'reloads':>8} {'MB':>7} {'B/task':>7}")
+    for result in results:
+        stats = result["stats"]
+        memory = stats["memory_bytes"]["total"] / 1e6
+        print(f"{result['name']:<9} {result['p50']:>12.0f} {result['p99']:>12.0f} {result['cpu_us']:>10.0f} "
+              f"{stats['hit_ratio']:>10.3f} {stats['updates']:>8} {stats['reloads']:>8} {memory:>7.2f} "
+              f"{stats['bytes_per_task'] or 0:>7.0f}")
+    for name, users in mismatches.items():
+        print(f"{name}: {len(users)} users differ from a fresh query" + (f" (e.g. {users[:5]})" if users else ""))
+    if any(mismatches.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
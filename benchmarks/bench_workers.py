@@ -0,0 +1,127 @@
+"""
+Throughput vs number of worker processes on one machine.
+
+Starts the OpenAI stub once. For each --workers count it then starts the app
+under gunicorn (backend.core.gunicorn_conf) with that many uvicorn workers
+and a fresh shared-state file, and drives one scenario with --concurrency
+closed-loop clients. It prints throughput, latency and the speedup over the
+first worker count.
+
+With --reload SECONDS, each server gets a SIGHUP (graceful restart of every
+worker) that many seconds into its run. In-flight requests finish. A few
+requests sent on idle keep-alive connections of a stopping worker may fail
+with a connection error; the server never read those, so clients can retry
+them.
+
+The stub, the app workers and this client share the machine's cores, so
+scaling flattens once they are busy; the CPU count is printed with the
+results. A stub latency of 0 makes the app's own CPU time the bottleneck.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --concurrency 64 --requests 2000
+    python -m benchmarks.bench_workers --workers 2 --latency 0.05 --reload 2
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from .bench_load import APP_ENV, SCENARIOS, run_level, spawn, wait_ready
+from .stub_openai import free_port
+
+
+async def measure(base_url, scenario, args, server=None):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        if server is None:
+            return await run_level(client, scenario, args.concurrency, args, None)
+
+        async def hup():
+            await asyncio.sleep(args.reload)
+            server.send_signal(signal.SIGHUP)
+
+        restart = asyncio.ensure_future(hup())
+        try:
+            return await run_level(client, scenario, args.concurrency, args, None)
+        finally:
+            restart.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--scenario", default="next-task", choices=[scenario.name for scenario in SCENARIOS])
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency in seconds")
+    parser.add_argument("--cache", action="store_true", help="let the response cache answer repeated requests")
+    parser.add_argument("--batch-items", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--reload", type=float, metavar="SECONDS",
+                        help="send SIGHUP to each server this far into the run")
+    args = parser.parse_args()
+    scenario = next(scenario for scenario in SCENARIOS if scenario.name == args.scenario)
+
+    workdir = tempfile.TemporaryDirectory(prefix="timely-workers-")
+    processes = []
+    rows = []
+    try:
+        stub_port = free_port()
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        stub_log = Path(workdir.name) / "stub.log"
+        processes.append(spawn([
+            sys.executable, "-m", "benchmarks.stub_openai", "--port", str(stub_port), "--latency", str(args.latency),
+        ], dict(os.environ), stub_log))
+        wait_ready(f"{stub_url}/stats", processes[-1], stub_log)
+
+        for workers in args.workers:
+            app_port = free_port()
+            run_dir = Path(workdir.name) / f"workers-{workers}"
+            run_dir.mkdir()
+            app_log = run_dir / "app.log"
+            env = {
+                **os.environ,
+                **APP_ENV,
+                "OPENAI_BASE_URL": f"{stub_url}/v1",
+                "DATABASE_URL": f"sqlite:///{run_dir / 'app.db'}",
+                "SHARED_STATE_PATH": str(run_dir / "shared_state.db"),
+                "HOST": "127.0.0.1",
+                "PORT": str(app_port),
+                "WEB_CONCURRENCY": str(workers),
+            }
+            server = spawn([
+                sys.executable, "-m", "gunicorn", "-c", "python:backend.core.gunicorn_conf", "backend.main:app",
+            ], env, app_log)
+            processes.append(server)
+            base_url = f"http://127.0.0.1:{app_port}"
+            wait_ready(f"{base_url}/health", server, app_log)
+            try:
+                result = asyncio.run(measure(base_url, scenario, args, server if args.reload is not None else None))
+            finally:
+                server.terminate()
+                server.wait(timeout=args.timeout)
+            rows.append((workers, result))
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+                process.wait(timeout=10)
+        workdir.cleanup()
+
+    restart = f", SIGHUP after {args.reload}s" if args.reload is not None else ""
+    print(f"{args.scenario}, {args.concurrency} clients, {args.requests} requests, "
+          f"stub latency {args.latency}s, {os.cpu_count()} CPU(s){restart}")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}")
+    baseline = rows[0][1]["throughput_rps"] if rows else 0
+    for workers, result in rows:
+        latency = result["latency_ms"]
+        print(f"{workers:>7} {result['throughput_rps']:>9.1f} {result['throughput_rps'] / baseline:>7.2f}x "
+              f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} {result['error']:>6}")
+
+
+if __name__ == "__main__":
+    main()
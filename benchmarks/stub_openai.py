@@ -0,0 +1,238 @@
+"""
+Local stand-in for the OpenAI chat completions and Anthropic Messages APIs.
+
+Serves POST /v1/chat/completions (OpenAI) and POST /v1/messages (Anthropic)
+with a canned reply after a configurable delay, streamed word by word when
+the request asks for stream=true, so benchmarks can exercise the real
+client stack without network access or token spend. Batched check-in
+greeting prompts get a JSON array of distinct greetings instead. Each call waits
+latency plus a uniform random 0..jitter seconds; error_rate of calls fail
+with a 500 in the API's error format (mid-stream for streaming calls,
+after the first chunk). GET /stats reports the calls served and failed.
+Point OPENAI_BASE_URL at <stub>/v1 and ANTHROPIC_BASE_URL at <stub>.
+
+    python -m benchmarks.stub_openai --port 8100 --latency 0.05 --jitter 0.05 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED_REPLY = (
+    "**Next Task:** Write project proposal\n"
+    "**Why Now:** High priority and your energy is good\n"
+    "**Duration:** 60 minutes"
+)
+
+# Batched greeting prompts (llm.agents.checkin_pool) ask for a JSON array of N strings
+ARRAY_REQUEST = re.compile(r"JSON array of (\d+) strings")
+
+
+ERROR_BODY = {"error": {"message": "Stub server error", "type": "server_error", "param": None, "code": None}}
+ANTHROPIC_ERROR_BODY = {"type": "error", "error": {"type": "api_error", "message": "Stub server error"}}
+
+
+def _reply(body: dict) -> str:
+    """CANNED_REPLY, or N distinct greetings when the last message asks for a JSON array of N strings"""
+    content = body["messages"][-1].get("content", "") if body.get("messages") else ""
+    match = ARRAY_REQUEST.search(content if isinstance(content, str) else "")
+    if not match:
+        return CANNED_REPLY
+    return json.dumps([f"Good morning! Greeting {uuid.uuid4().hex[:8]}. What will you focus on?"
+                       for _ in range(int(match.group(1)))])
+
+
+def _stream_chunks(model: str, token_delay: float, fail: bool = False):
+    """OpenAI-style SSE: one chunk per word, then [DONE]; an error event after the first chunk when fail"""
+    async def events():
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for index, word in enumerate(CANNED_REPLY.split(" ")):
+            if fail and index == 1:
+                yield f"data: {json.dumps(ERROR_BODY)}\n\n"
+                return
+            if token_delay:
+                await asyncio.sleep(token_delay)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if index == 0 else f" {word}"},
+                    "finish_reason": None
+                }]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _anthropic_events(model: str, token_delay: float, fail: bool = False):
+    """Messages API SSE: message_start, one content_block_delta per word, message_stop"""
+    def event(kind, data):
+        return f"event: {kind}\ndata: {json.dumps({'type': kind, **data})}\n\n"
+
+    async def events():
+        yield event("message_start", {"message": {
+            "id": f"msg_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant", "model": model,
+            "content": [], "usage": {"input_tokens": 120, "output_tokens": 1}
+        }})
+        yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        for index, word in enumerate(CANNED_REPLY.split(" ")):
+            if fail and index == 1:
+                yield event("error", {"error": ANTHROPIC_ERROR_BODY["error"]})
+                return
+            if token_delay:
+                await asyncio.sleep(token_delay)
+            yield event("content_block_delta", {
+                "index": 0, "delta": {"type": "text_delta", "text": word if index == 0 else f" {word}"}
+            })
+        yield event("content_block_stop", {"index": 0})
+        yield event("message_delta", {"delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 30}})
+        yield event("message_stop", {})
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def create_app(
+    latency: float = 0.0,
+    token_delay: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = None
+) -> FastAPI:
+    app = FastAPI()
+    app.state.latency = latency
+    app.state.token_delay = token_delay
+    app.state.jitter = jitter
+    app.state.error_rate = error_rate
+    app.state.requests = 0
+    app.state.errors = 0
+    rng = random.Random(seed)
+
+    async def delay_and_decide() -> bool:
+        """Wait the configured latency; True when this call should fail"""
+        app.state.requests += 1
+        delay = app.state.latency + (rng.uniform(0, app.state.jitter) if app.state.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        fail = rng.random() < app.state.error_rate
+        if fail:
+            app.state.errors += 1
+        return fail
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        fail = await delay_and_decide()
+        if body.get("stream"):
+            return _stream_chunks(body.get("model", "gpt-3.5-turbo"), app.state.token_delay, fail)
+        if fail:
+            return JSONResponse(ERROR_BODY, status_code=500)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": _reply(body)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150}
+        }
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        fail = await delay_and_decide()
+        model = body.get("model", "claude-3-haiku-20240307")
+        if body.get("stream"):
+            return _anthropic_events(model, app.state.token_delay, fail)
+        if fail:
+            return JSONResponse(ANTHROPIC_ERROR_BODY, status_code=500)
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": _reply(body)}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": 120, "output_tokens": 30}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "errors": app.state.errors}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """Run the stub in a background thread; use as a context manager"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        port: int = None,
+        token_delay: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = None
+    ):
+        self.port = port or free_port()
+        self.app = create_app(latency, token_delay, jitter, error_rate, seed)
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host="127.0.0.1", port=self.port, log_level="warning"
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        """OPENAI_BASE_URL for this stub"""
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def root_url(self) -> str:
+        """ANTHROPIC_BASE_URL for this stub"""
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, 0..jitter seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls that fail with a 500")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency, args.token_delay, args.jitter, args.error_rate, args.seed),
+        host="127.0.0.1", port=args.port, log_level="warning"
+    )
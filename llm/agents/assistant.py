@@ -1,67 +1,138 @@
-from openai import OpenAI
-from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timezone
 from backend.core.config import settings
+from backend.core.log import get_logger, log_sampled
+from backend.core.metrics import LLM_CALL_SPAN, PROMPT_BUILD_SPAN
+from backend.services.ranker import explain_choice, rank_tasks
+from backend.services.scheduler import DaySchedule, plan_day, resolve_timezone
+from llm.prompts.compiler import (
+    PERSONALITY_STYLES, build_next_task_prompt, count_message_tokens, format_memories, format_transcript, get_closer
+)
+from llm.providers.base import CHARS_PER_TOKEN, Completion
+from .breaker import CircuitOpenError
+from .router import ProviderRouter, build_router
+from .singleflight import SingleFlight
+
+NEXT_TASK_SYSTEM_PROMPT = "You are Timely, an AI productivity coach focused on helping users decide what to do next with minimal decision fatigue."
+DAY_PLAN_SYSTEM_PROMPT = "You are Timely, an AI productivity coach helping users plan their day effectively."
+
+NEXT_TASK_MAX_TOKENS = 400
+NEXT_TASK_SYSTEM_MESSAGES = [{"role": "system", "content": NEXT_TASK_SYSTEM_PROMPT}]
+
+# Output budget per greeting when several are generated in one call
+CHECKIN_GREETING_MAX_TOKENS = 80
+
+CONVERSATION_SUMMARY_SYSTEM_PROMPT = "You maintain a running summary of a conversation between a user and Timely, an AI productivity coach."
+
+logger = get_logger(__name__)
+
+
+def parse_greetings(content: str) -> List[str]:
+    """Greetings from a reply that should be a JSON array of strings; one per line otherwise"""
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`").split("\n", 1)[-1]
+    try:
+        items = json.loads(text)
+    except ValueError:
+        items = [line.strip().lstrip("-*•0123456789.) ").strip('"') for line in text.splitlines()]
+    if not isinstance(items, list):
+        return []
+    return [item.strip() for item in items if isinstance(item, str) and item.strip()]
+
 
 class TimelyAssistant:
     """Main AI assistant for Timely productivity coaching"""
     
-    def __init__(self):
-        # Initialize OpenAI client with error handling
-        try:
-            print(f"Initializing OpenAI client...")
-            print(f"API key from settings: {settings.openai_api_key[:10]}...{settings.openai_api_key[-4:] if settings.openai_api_key else 'None'}")
-            self.client = OpenAI(api_key=settings.openai_api_key)
-            self.model = "gpt-3.5-turbo"  # Use the more stable model
-            self.client_ready = bool(settings.openai_api_key)
-            print(f"OpenAI client initialized: API key configured={self.client_ready}")
-        except Exception as e:
-            print(f"Warning: OpenAI client initialization failed: {e}")
-            self.client_ready = False
-            self.client = None
+    def __init__(self, router: Optional[ProviderRouter] = None):
+        """
+        Use the shared router when one is given (see AssistantRegistry);
+        otherwise build a standalone one from settings (close it with aclose()).
+        """
+        # Routes each call to the best available provider, with failover and
+        # per-provider circuit breakers; no configured provider means fallback only
+        self.router = router or build_router()
+        self.client_ready = bool(self.router.routes)
+        logger.info("Assistant ready", extra={"providers": self.router.provider_names, "client_ready": self.client_ready})
+        
+        # Identical prompts in flight at the same time share one upstream call
+        self.inflight = SingleFlight()
+    
+    def llm_available(self, allow_llm: bool = True) -> bool:
+        """Whether to try the model at all (a provider configured, caller allowed, some circuit not open)"""
+        return self.client_ready and allow_llm and self.router.available()
+    
+    async def aclose(self):
+        await self.router.aclose()
         
     async def what_should_i_do_next(
         self, 
         user_input: str = "What should I do next?",
         available_tasks: List[Dict] = None,
         energy_level: str = "medium",
-        personality_mode: str = "coach"
+        personality_mode: str = "coach",
+        available_minutes: Optional[int] = None,
+        allow_llm: bool = True,
+        memories: Optional[List[str]] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        user_timezone: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Core functionality: Suggest the next task based on context
+        Core functionality: Suggest the next task based on context.
+        With allow_llm=False (e.g. the caller is over a rate limit) the local fallback answers.
+        `memories` are recalled facts about the user to include in the prompt;
+        `history` is the conversation so far (see llm.agents.conversations),
+        sent between the system prompt and this request. Times, and due dates
+        without an offset, are in user_timezone (default UTC).
         """
+        current_time = datetime.now(resolve_timezone(user_timezone))
+        
+        # Answer from the local ranker when configured to (no model call)
+        if settings.ranker_mode == "local" and available_tasks:
+            return self._get_local_suggestion(available_tasks, energy_level, personality_mode, available_minutes, current_time)
         
         # If OpenAI isn't available, use intelligent fallback
-        if not self.client_ready:
-            print("OpenAI client not ready, using fallback")
-            return self._get_smart_fallback(user_input, available_tasks, energy_level, personality_mode)
+        if not self.llm_available(allow_llm):
+            if not self.client_ready:
+                log_sampled(logger, "No LLM provider configured, using fallback")
+            return self._get_smart_fallback(user_input, available_tasks, energy_level, personality_mode, available_minutes, current_time)
         
         try:
-            current_time = datetime.now()
-            
             # Build the prompt
-            prompt = self._build_next_task_prompt(
-                user_input, available_tasks, energy_level, personality_mode, current_time
-            )
+            with PROMPT_BUILD_SPAN.time():
+                prompt = self._build_next_task_prompt(
+                    user_input,
+                    self._tasks_for_prompt(available_tasks, energy_level, available_minutes, current_time),
+                    energy_level, personality_mode, current_time,
+                    tasks_count=len(available_tasks or []),
+                    memories=memories,
+                    history=history
+                )
             
-            print(f"Attempting OpenAI API call with model: {self.model}")
             # Call OpenAI using the modern client
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are Timely, an AI productivity coach focused on helping users decide what to do next with minimal decision fatigue."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=400,
-                temperature=0.7
+            with LLM_CALL_SPAN.time():
+                response, shared = await self._chat_completion(
+                    messages=[
+                        {"role": "system", "content": NEXT_TASK_SYSTEM_PROMPT},
+                        *(history or []),
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=NEXT_TASK_MAX_TOKENS,
+                    temperature=0.7
+                )
+            log_sampled(
+                logger, "LLM call succeeded",
+                call="next_task", provider=response.provider, model=response.model,
+                tokens=response.total_tokens, coalesced=shared
             )
-            print(f"OpenAI API call successful, tokens used: {response.usage.total_tokens}")
-            
-            assistant_response = response.choices[0].message.content
             
             return {
-                "response": assistant_response,
-                "tokens_used": response.usage.total_tokens,
+                "response": response.content,
+                "tokens_used": 0 if shared else response.total_tokens,
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "context_used": {
                     "energy_level": energy_level,
@@ -70,64 +141,78 @@ class TimelyAssistant:
                 }
             }
             
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            traceback.print_exc()
+        except CircuitOpenError:
+            return self._get_smart_fallback(user_input, available_tasks, energy_level, personality_mode, available_minutes, current_time)
+        except Exception:
+            logger.exception("OpenAI API error, using fallback", extra={"call": "next_task"})
             # Use intelligent fallback
-            return self._get_smart_fallback(user_input, available_tasks, energy_level, personality_mode)
+            return self._get_smart_fallback(user_input, available_tasks, energy_level, personality_mode, available_minutes, current_time)
     
     async def plan_my_day(
         self,
         user_input: str = "Plan my day",
         available_tasks: List[Dict] = None,
-        personality_mode: str = "coach"
+        personality_mode: str = "coach",
+        energy_level: str = "medium",
+        user_timezone: Optional[str] = None,
+        allow_llm: bool = True,
+        memories: Optional[List[str]] = None,
+        history: Optional[List[Dict[str, str]]] = None
     ) -> Dict[str, Any]:
         """
-        Generate a daily schedule based on tasks
+        Generate a daily schedule based on tasks.
+        
+        The schedule itself is computed locally (see backend.services.scheduler);
+        the model only narrates it. `history` as in what_should_i_do_next.
         """
         
-        if not self.client_ready:
-            return self._get_day_plan_fallback(available_tasks, personality_mode)
+        schedule = self._schedule(available_tasks, energy_level, user_timezone)
+        
+        if not self.llm_available(allow_llm):
+            return self._get_day_plan_fallback(available_tasks, personality_mode, schedule)
         
         try:
-            current_time = datetime.now()
+            current_time = datetime.now(resolve_timezone(user_timezone))
             
-            prompt = self._build_day_plan_prompt(user_input, available_tasks, current_time)
+            with PROMPT_BUILD_SPAN.time():
+                prompt = self._build_day_plan_prompt(user_input, schedule, current_time, memories)
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are Timely, an AI productivity coach helping users plan their day effectively."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=600,
-                temperature=0.6
-            )
-            
-            plan_response = response.choices[0].message.content
+            with LLM_CALL_SPAN.time():
+                response, shared = await self._chat_completion(
+                    messages=[
+                        {"role": "system", "content": DAY_PLAN_SYSTEM_PROMPT},
+                        *(history or []),
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=600,
+                    temperature=0.6
+                )
             
             return {
-                "response": plan_response,
-                "tokens_used": response.usage.total_tokens,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "response": response.content,
+                "tokens_used": 0 if shared else response.total_tokens,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "context_used": self._schedule_context(schedule, personality_mode, available_tasks)
             }
             
-        except Exception as e:
-            print(f"OpenAI API error in day planning: {e}")
-            return self._get_day_plan_fallback(available_tasks, personality_mode)
+        except CircuitOpenError:
+            return self._get_day_plan_fallback(available_tasks, personality_mode, schedule)
+        except Exception:
+            logger.exception("OpenAI API error, using fallback", extra={"call": "plan_day"})
+            return self._get_day_plan_fallback(available_tasks, personality_mode, schedule)
     
-    async def morning_checkin(self, energy_level: str = "medium") -> Dict[str, Any]:
+    async def morning_checkin(
+        self, energy_level: str = "medium", allow_llm: bool = True, user_timezone: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Friendly morning check-in
+        Friendly morning check-in (the prompt uses the user's local time)
         """
         
-        if not self.client_ready:
+        if not self.llm_available(allow_llm):
             return self._get_morning_fallback(energy_level)
         
         try:
-            current_time = datetime.now()
+            current_time = datetime.now(resolve_timezone(user_timezone))
             
             prompt = f"""
 Give a warm, energizing morning greeting for someone with {energy_level} energy level.
@@ -137,75 +222,339 @@ Be encouraging, ask what they'd like to focus on today, and keep it brief but in
 Match their energy level appropriately.
 """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.8
-            )
+            with LLM_CALL_SPAN.time():
+                response, shared = await self._chat_completion(
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=200,
+                    temperature=0.8
+                )
             
             return {
-                "response": response.choices[0].message.content,
-                "tokens_used": response.usage.total_tokens,
-                "timestamp": current_time.isoformat()
+                "response": response.content,
+                "tokens_used": 0 if shared else response.total_tokens,
+                "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
-        except Exception as e:
-            print(f"OpenAI API error in morning check-in: {e}")
+        except CircuitOpenError:
             return self._get_morning_fallback(energy_level)
-    
-    def _build_next_task_prompt(self, user_input, available_tasks, energy_level, personality_mode, current_time):
-        """Build prompt for next task suggestion"""
-        
-        personalities = {
-            "coach": "Be encouraging and supportive, like a professional productivity coach",
-            "friend": "Be casual and friendly, like a helpful friend", 
-            "strict": "Be direct and focused, like an efficient executive assistant",
-            "zen": "Be calm and mindful, like a mindfulness teacher"
-        }
-        
-        style = personalities.get(personality_mode, personalities["coach"])
-        task_context = self._format_tasks(available_tasks or [])
-        
-        return f"""
+        except Exception:
+            logger.exception("OpenAI API error, using fallback", extra={"call": "morning_checkin"})
+            return self._get_morning_fallback(energy_level)
+
+    async def generate_checkin_greetings(
+        self,
+        energy_level: str,
+        weekday: str,
+        time_of_day: str,
+        personality_mode: str = "coach",
+        count: int = 6
+    ) -> Tuple[List[str], int]:
+        """
+        Several distinct check-in greetings from one LLM call, for the
+        pre-generated response pool (see llm.agents.checkin_pool).
+
+        The greetings are reused across users and weeks, so they must not
+        mention a date or clock time. Returns (greetings, tokens_used); raises
+        like _chat_completion when no provider answers.
+        """
+        style = PERSONALITY_STYLES.get(personality_mode, PERSONALITY_STYLES["coach"])
+        prompt = f"""
+Write {count} different check-in greetings for someone with {energy_level} energy level.
+It's {weekday.capitalize()}, {'early morning' if time_of_day == 'early' else time_of_day}; fit the greeting to that time of day.
 {style}.
 
-USER REQUEST: "{user_input}"
+Each greeting: one to three sentences, encouraging, asking what they'd like to focus on.
+Match their energy level. Vary the openings and wording between greetings.
+Do not mention a date, a clock time or a name.
 
-CURRENT CONTEXT:
-- Time: {current_time.strftime('%A, %B %d at %I:%M %p')}
-- Energy Level: {energy_level}
-- Available Tasks: {len(available_tasks or [])}
+Answer with a JSON array of {count} strings and nothing else.
+"""
+        with LLM_CALL_SPAN.time():
+            response, shared = await self._chat_completion(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=CHECKIN_GREETING_MAX_TOKENS * count,
+                temperature=1.0
+            )
+        return parse_greetings(response.content)[:count], 0 if shared else response.total_tokens
 
-TASKS:
-{task_context}
+    async def summarize_conversation(
+        self,
+        summary: str,
+        turns: List[Tuple[str, str]],
+        max_tokens: int
+    ) -> Tuple[str, int]:
+        """
+        Fold (role, content) turns into a conversation's running summary, for
+        llm.agents.conversations. Returns (summary, tokens_used); raises like
+        _chat_completion when no provider answers.
+        """
+        prompt = f"""
+Update the running summary of this conversation with the new turns below.
 
-Suggest ONE specific task they should do next. Consider their energy level and time of day.
+CURRENT SUMMARY:
+{summary or "(none yet)"}
 
-FORMAT:
-**Next Task:** [Clear task name]
-**Why Now:** [Brief reasoning]
-**Duration:** [Estimated time]
+NEW TURNS:
+{format_transcript(turns)}
 
-{self._get_personality_closer(personality_mode)}
+Keep what later answers depend on: the user's goals, constraints and preferences (e.g. "prefers shorter tasks"),
+tasks suggested and whether they were accepted, done or rejected, and open questions. Drop greetings and filler.
+Write plain sentences in the third person, at most {max_tokens * 3 // 4} words, and answer with the summary only.
 """
+        with LLM_CALL_SPAN.time():
+            response, shared = await self._chat_completion(
+                messages=[
+                    {"role": "system", "content": CONVERSATION_SUMMARY_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.2
+            )
+        return response.content.strip(), 0 if shared else response.total_tokens
+
+    async def stream_what_should_i_do_next(
+        self,
+        user_input: str = "What should I do next?",
+        available_tasks: List[Dict] = None,
+        energy_level: str = "medium",
+        personality_mode: str = "coach",
+        available_minutes: Optional[int] = None,
+        allow_llm: bool = True,
+        memories: Optional[List[str]] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        user_timezone: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of what_should_i_do_next.
+        
+        Yields {"event": "token", "content": ...} as text arrives, then one
+        {"event": "done", ...} carrying the same fields as the non-streaming result.
+        """
+        context_used = {
+            "energy_level": energy_level,
+            "personality_mode": personality_mode,
+            "tasks_count": len(available_tasks or [])
+        }
+        
+        current_time = datetime.now(resolve_timezone(user_timezone))
+        
+        def messages():
+            prompt = self._build_next_task_prompt(
+                user_input,
+                self._tasks_for_prompt(available_tasks, energy_level, available_minutes, current_time),
+                energy_level, personality_mode, current_time,
+                tasks_count=len(available_tasks or []),
+                memories=memories,
+                history=history
+            )
+            return [
+                {"role": "system", "content": NEXT_TASK_SYSTEM_PROMPT},
+                *(history or []),
+                {"role": "user", "content": prompt}
+            ]
+        
+        fallback = lambda: self._get_smart_fallback(
+            user_input, available_tasks, energy_level, personality_mode, available_minutes, current_time
+        )
+        local = None
+        if settings.ranker_mode == "local" and available_tasks:
+            local = lambda: self._get_local_suggestion(
+                available_tasks, energy_level, personality_mode, available_minutes, current_time
+            )
+        elif not allow_llm:
+            local = fallback
+        
+        async for event in self._stream_response(
+            messages, NEXT_TASK_MAX_TOKENS, 0.7, context_used, fallback, local=local
+        ):
+            yield event
     
-    def _build_day_plan_prompt(self, user_input, available_tasks, current_time):
-        """Build prompt for day planning"""
+    async def stream_plan_my_day(
+        self,
+        user_input: str = "Plan my day",
+        available_tasks: List[Dict] = None,
+        personality_mode: str = "coach",
+        energy_level: str = "medium",
+        user_timezone: Optional[str] = None,
+        allow_llm: bool = True,
+        memories: Optional[List[str]] = None,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of plan_my_day (same event shape as stream_what_should_i_do_next)
+        """
+        schedule = self._schedule(available_tasks, energy_level, user_timezone)
         
-        task_list = self._format_tasks_for_planning(available_tasks or [])
+        def messages():
+            prompt = self._build_day_plan_prompt(
+                user_input, schedule, datetime.now(resolve_timezone(user_timezone)), memories
+            )
+            return [
+                {"role": "system", "content": DAY_PLAN_SYSTEM_PROMPT},
+                *(history or []),
+                {"role": "user", "content": prompt}
+            ]
+        
+        fallback = lambda: self._get_day_plan_fallback(available_tasks, personality_mode, schedule)
+        async for event in self._stream_response(
+            messages, 600, 0.6, self._schedule_context(schedule, personality_mode, available_tasks),
+            fallback, local=None if allow_llm else fallback
+        ):
+            yield event
+    
+    async def _stream_response(
+        self,
+        build_messages: Callable[[], List[Dict[str, str]]],
+        max_tokens: int,
+        temperature: float,
+        context_used: Optional[Dict[str, Any]],
+        fallback: Callable[[], Dict[str, Any]],
+        local: Optional[Callable[[], Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Shared streaming loop. Falls back (streamed word by word, so clients keep
+        one code path) when the client isn't ready, the circuit is open or the
+        call fails before the first token. A failure mid-stream ends with an
+        error on the done event. A `local` answer, when given, is streamed the
+        same way without calling the model. The router fails over between
+        providers before the first token; streams are not hedged.
+        """
+        start = time.perf_counter()
+        first_token_at = None
+        chunks = []
+        error = None
+        
+        if local is None and self.llm_available():
+            with PROMPT_BUILD_SPAN.time():
+                messages = build_messages()
+            stream = self.router.stream(messages, max_tokens, temperature)
+            try:
+                async for content in stream:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks.append(content)
+                    yield {"event": "token", "content": content}
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                logger.exception("LLM streaming error", extra={"call": "stream", "tokens_sent": len(chunks)})
+                error = str(e)
+            finally:
+                # Also on disconnect (GeneratorExit), so the upstream stream is released now
+                await stream.aclose()
+        
+        if not chunks:
+            result = (local or fallback)()
+            for index, word in enumerate(result["response"].split(" ")):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield {"event": "token", "content": word if index == 0 else f" {word}"}
+            result.setdefault("context_used", context_used)
+        else:
+            # The streaming API reports no usage; estimate from text length
+            prompt_chars = sum(len(message["content"]) for message in messages)
+            result = {
+                "response": "".join(chunks),
+                "tokens_used": prompt_chars // CHARS_PER_TOKEN + len(chunks),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "context_used": {**(context_used or {}), "tokens_estimated": True},
+                "fallback": False
+            }
+            if error:
+                result["error"] = error
+        
+        now = time.perf_counter()
+        yield {
+            "event": "done",
+            **result,
+            "timing": {
+                "ttfb_ms": round(((first_token_at or now) - start) * 1000, 2),
+                "total_ms": round((now - start) * 1000, 2)
+            }
+        }
+    
+    async def _chat_completion(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Tuple[Completion, bool]:
+        """
+        Single non-blocking path for every LLM call.
+        
+        Timeouts and retries come from the providers (LLM_TIMEOUT_SECONDS /
+        LLM_MAX_RETRIES); provider choice, failover, circuit breaking and
+        hedging from the router (CircuitOpenError when every circuit is open).
+        Cancellation, e.g. when the HTTP client disconnects, propagates as
+        CancelledError and is deliberately not turned into a fallback.
+        
+        Concurrent calls with the same fully built prompt are coalesced into one
+        upstream request. Returns (completion, shared); shared callers spent no tokens.
+        """
+        key = hashlib.sha256(json.dumps(
+            [messages, max_tokens, temperature], ensure_ascii=False
+        ).encode("utf-8")).hexdigest()
+        
+        def call():
+            return self.router.complete(messages, max_tokens, temperature)
+        
+        return await self.inflight.do(key, call)
+    
+    def _build_next_task_prompt(
+        self, user_input, available_tasks, energy_level, personality_mode, current_time, tasks_count=None, memories=None,
+        history=None
+    ):
+        """
+        Build prompt for next task suggestion (tasks best first; the tail is
+        dropped if over budget). Conversation history shares the context
+        window, so it leaves less room for tasks.
+        """
+        return build_next_task_prompt(
+            personality_mode,
+            user_input,
+            available_tasks or [],
+            energy_level,
+            current_time.strftime('%A, %B %d at %I:%M %p'),
+            len(available_tasks or []) if tasks_count is None else tasks_count,
+            context_window=settings.llm_context_window,
+            max_completion_tokens=NEXT_TASK_MAX_TOKENS,
+            reserved_tokens=count_message_tokens(NEXT_TASK_SYSTEM_MESSAGES + (history or [])),
+            task_token_cap=settings.prompt_task_token_budget,
+            memories=memories
+        ).text
+    
+    def _schedule(self, available_tasks, energy_level, user_timezone) -> DaySchedule:
+        """Local day schedule for the remaining working hours"""
+        return plan_day(
+            available_tasks or [],
+            timezone=user_timezone,
+            energy_level=energy_level,
+            day_start_hour=settings.schedule_day_start_hour,
+            day_end_hour=settings.schedule_day_end_hour
+        )
+    
+    def _schedule_context(self, schedule: DaySchedule, personality_mode, available_tasks) -> Dict[str, Any]:
+        return {
+            "personality_mode": personality_mode,
+            "tasks_count": len(available_tasks or []),
+            "schedule": schedule.to_dict()
+        }
+    
+    def _build_day_plan_prompt(self, user_input, schedule: DaySchedule, current_time, memories=None):
+        """Build prompt asking the model to narrate a precomputed schedule"""
+        
+        schedule_lines = "\n".join(schedule.to_lines()) if schedule.tasks else "No tasks to schedule."
+        unscheduled = ""
+        if schedule.unscheduled:
+            titles = [task.get('title', 'Untitled Task') for task in schedule.unscheduled[:5]]
+            more = len(schedule.unscheduled) - len(titles)
+            unscheduled = f"\nDOESN'T FIT TODAY: {', '.join(titles)}" + (f" (+{more} more)" if more else "") + "\n"
         
         return f"""
 Help plan the user's day. It's {current_time.strftime('%A, %B %d at %I:%M %p')}.
 
-AVAILABLE TASKS:
-{task_list}
-
-Create a realistic schedule with 4-6 time blocks, considering:
-- Current time and remaining day
-- Energy levels throughout the day  
-- Task complexity and duration
-- Natural breaks
+USER REQUEST: "{user_input}"
+{format_memories(memories)}
+This schedule was already computed from priorities, deadlines, durations and typical energy levels:
+{schedule_lines}
+{unscheduled}
+Present this plan. Keep every time block, task and duration exactly as given; do not add, drop or reorder tasks.
+If the schedule is empty, suggest a simple structure for the day instead.
 
 FORMAT:
 🗓️ **Your Day Plan:**
@@ -216,67 +565,44 @@ FORMAT:
 Ready to make this day productive! ✨
 """
     
-    def _format_tasks(self, tasks: List[Dict]) -> str:
-        """Format tasks for display"""
-        if not tasks:
-            return "No pending tasks available."
-        
-        formatted = []
-        for i, task in enumerate(tasks[:8], 1):
-            priority_emoji = {"low": "🔵", "medium": "🟡", "high": "🟠", "urgent": "🔴"}
-            emoji = priority_emoji.get(task.get('priority', 'medium'), '⚪')
-            
-            title = task.get('title', f'Task {i}')
-            priority = task.get('priority', 'medium')
-            duration = task.get('estimated_duration', 30)
-            
-            formatted.append(f"{emoji} {title} ({priority} priority, ~{duration}min)")
-        
-        return "\n".join(formatted)
-    
-    def _format_tasks_for_planning(self, tasks: List[Dict]) -> str:
-        """Format tasks for day planning"""
-        if not tasks:
-            return "No tasks to schedule."
-        
-        formatted = []
-        for task in tasks[:10]:
-            title = task.get('title', 'Untitled Task')
-            duration = task.get('estimated_duration', 30)
-            priority = task.get('priority', 'medium')
-            
-            formatted.append(f"• {title} (~{duration}min, {priority} priority)")
-        
-        return "\n".join(formatted)
-    
     def _get_personality_closer(self, personality_mode: str) -> str:
         """Get personality-appropriate closing"""
-        closers = {
-            "coach": "You've got this! 💪",
-            "friend": "Hope this helps! 😊",
-            "strict": "Execute immediately.",
-            "zen": "Focus on this moment. 🧘"
+        return get_closer(personality_mode)
+    
+    def _tasks_for_prompt(self, available_tasks, energy_level, available_minutes, now=None):
+        """Tasks to show the model: locally ranked top-k unless RANKER_MODE=llm (now: the user's current time)"""
+        if settings.ranker_mode == "llm" or not available_tasks:
+            return available_tasks or []
+        return rank_tasks(available_tasks, energy_level, available_minutes, k=settings.ranker_top_k or None, now=now)
+    
+    def _format_suggestion(self, task, energy_level, available_minutes, personality_mode, now=None):
+        """Next-task answer for the top locally ranked task"""
+        reason = explain_choice(task, energy_level, available_minutes, now)
+        return f"**Next Task:** {task['title']}\n**Why Now:** {reason}\n**Duration:** ~{task.get('estimated_duration') or 30} minutes\n\n{self._get_personality_closer(personality_mode)}"
+    
+    def _get_local_suggestion(self, available_tasks, energy_level, personality_mode, available_minutes=None, now=None):
+        """Answer from the local ranker (RANKER_MODE=local); no tokens spent"""
+        task = rank_tasks(available_tasks, energy_level, available_minutes, k=1, now=now)[0]
+        return {
+            "response": self._format_suggestion(task, energy_level, available_minutes, personality_mode, now),
+            "tokens_used": 0,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "context_used": {
+                "energy_level": energy_level,
+                "personality_mode": personality_mode,
+                "tasks_count": len(available_tasks),
+                "ranked_locally": True
+            }
         }
-        return closers.get(personality_mode, "Let's get started! ✨")
     
-    def _get_smart_fallback(self, user_input, available_tasks, energy_level, personality_mode):
+    def _get_smart_fallback(self, user_input, available_tasks, energy_level, personality_mode, available_minutes=None, now=None):
         """Intelligent fallback when API is unavailable"""
         
         if available_tasks:
-            # Find highest priority task
-            high_priority_tasks = [t for t in available_tasks if t.get('priority') in ['high', 'urgent']]
-            if high_priority_tasks:
-                task = high_priority_tasks[0]
-                return {
-                    "response": f"**Next Task:** {task['title']}\n**Why Now:** This is marked as {task['priority']} priority\n**Duration:** ~{task.get('estimated_duration', 30)} minutes\n\n{self._get_personality_closer(personality_mode)}",
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "fallback": True
-                }
-            
-            # Otherwise suggest first task
-            task = available_tasks[0]
+            # Best task by urgency, priority, energy match and fit
+            task = rank_tasks(available_tasks, energy_level, available_minutes, k=1, now=now)[0]
             return {
-                "response": f"**Next Task:** {task['title']}\n**Why Now:** Good starting point for your current energy level\n**Duration:** ~{task.get('estimated_duration', 30)} minutes\n\n{self._get_personality_closer(personality_mode)}",
+                "response": self._format_suggestion(task, energy_level, available_minutes, personality_mode, now),
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "fallback": True
             }
@@ -295,26 +621,20 @@ Ready to make this day productive! ✨
             "fallback": True
         }
     
-    def _get_day_plan_fallback(self, available_tasks, personality_mode):
-        """Fallback day plan"""
-        current_time = datetime.now()
+    def _get_day_plan_fallback(self, available_tasks, personality_mode, schedule: Optional[DaySchedule] = None):
+        """Fallback day plan: the local schedule without narration"""
         
         if available_tasks:
-            high_priority = [t for t in available_tasks if t.get('priority') in ['high', 'urgent']]
-            medium_priority = [t for t in available_tasks if t.get('priority') == 'medium']
-            
-            plan = "🗓️ **Your Day Plan:**\n"
+            schedule = schedule or self._schedule(available_tasks, "medium", None)
             
-            if high_priority:
-                plan += f"• Now → {high_priority[0]['title']} (High priority first)\n"
+            plan = "🗓️ **Your Day Plan:**\n" + "\n".join(schedule.to_lines()) + "\n"
             
-            if medium_priority:
-                plan += f"• Mid-morning → {medium_priority[0]['title']} (Good follow-up)\n"
+            if schedule.unscheduled:
+                titles = [task.get('title', 'Untitled Task') for task in schedule.unscheduled[:5]]
+                more = len(schedule.unscheduled) - len(titles)
+                plan += f"\n**Doesn't fit today:** {', '.join(titles)}" + (f" (+{more} more)" if more else "") + "\n"
             
-            plan += "• After lunch → Quick tasks and admin\n"
-            plan += "• Afternoon → Deep work or project time\n"
-            
-            plan += f"\n**Strategy:** Tackle high-priority items when your energy is fresh.\n{self._get_personality_closer(personality_mode)}"
+            plan += f"\n**Strategy:** Deadlines first, demanding work in your high-energy hours, lighter tasks in the afternoon dip.\n{self._get_personality_closer(personality_mode)}"
         else:
             plan = f"""🗓️ **Your Day Plan:**
 • Now → Set 3 main priorities for today
@@ -329,6 +649,7 @@ Ready to make this day productive! ✨
         return {
             "response": plan,
             "timestamp": datetime.now(timezone.utc).isoformat(),
+            "context_used": self._schedule_context(schedule, personality_mode, available_tasks) if schedule else None,
             "fallback": True
         }
     
@@ -344,6 +665,6 @@ Ready to make this day productive! ✨
         
         return {
             "response": greeting,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "fallback": True
         }
\ No newline at end of file
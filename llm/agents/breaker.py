@@ -0,0 +1,247 @@
+import sqlite3
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from backend.core import shared_state
+from backend.core.log import get_logger
+from backend.core.metrics import LLM_CIRCUIT_REJECTED, LLM_CIRCUIT_STATE
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for timely_llm_circuit_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream and sends traffic to the fallback instead.
+
+    Closed: calls go through, and their outcomes are kept for window_seconds.
+    A call that fails, or takes at least slow_call_seconds, counts as a
+    failure. Once the window holds min_calls calls and failure_ratio of them
+    failed, the circuit opens.
+
+    Open: allow() is False for open_seconds.
+
+    Half-open: half_open_probes probe calls are let through. If all the probes
+    succeed, the circuit closes. If any fails, the circuit opens again.
+
+    With `shared_path`, opening and closing are written to that SQLite file,
+    and at most every sync_seconds the breaker picks up the transitions of
+    other workers. One worker seeing the upstream fail opens the circuit for
+    all of them, and one successful probe closes it for all. The call window
+    stays per worker. If the file cannot be used, the breaker works alone.
+
+    Used from the event loop only, so it takes no locks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 60.0,
+        slow_call_seconds: float = 10.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        shared_path: Optional[str] = None,
+        sync_seconds: float = 1.0
+    ):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.shared_path = shared_path or None
+        self.sync_seconds = sync_seconds
+
+        self._state = CLOSED
+        self._calls: Deque[Tuple[float, bool]] = deque()  # (finished at, failed)
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._synced_at: Optional[float] = None
+        # Wall-clock time of the newest shared transition this breaker knows of
+        self._shared_changed_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._state_gauge = LLM_CIRCUIT_STATE.labels(name)
+        self._rejected_counter = LLM_CIRCUIT_REJECTED.labels(name)
+        self._state_gauge.set(STATE_VALUES[CLOSED])
+        if self.shared_path:
+            self._init_shared()
+
+    @property
+    def state(self) -> str:
+        if self.shared_path:
+            now = time.monotonic()
+            if self._synced_at is None or now - self._synced_at >= self.sync_seconds:
+                self._synced_at = now
+                self._sync()
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        return self._state
+
+    def rejecting(self) -> bool:
+        """True (and counted as a rejection) while open, so callers can skip building the request"""
+        if self.state != OPEN:
+            return False
+        self.rejected += 1
+        self._rejected_counter.inc()
+        return True
+
+    def allow(self) -> bool:
+        """Whether to make a call now; a True answer must be followed by record() or release()"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return True
+        self.rejected += 1
+        self._rejected_counter.inc()
+        return False
+
+    def record(self, ok: bool, seconds: float):
+        """Outcome of an allowed call"""
+        failed = not ok or seconds >= self.slow_call_seconds
+        now = time.monotonic()
+
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if failed:
+                self._open(now)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._close()
+            return
+        if self._state == OPEN:
+            # A call that started before the circuit opened
+            return
+
+        self._calls.append((now, failed))
+        self._failures += failed
+        self._expire(now)
+        if len(self._calls) >= self.min_calls and self._failures / len(self._calls) >= self.failure_ratio:
+            self._open(now)
+
+    def release(self):
+        """An allowed call ended without a verdict (cancelled)"""
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _expire(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            _, failed = self._calls.popleft()
+            self._failures -= failed
+
+    def _set_state(self, state: str):
+        self._state = state
+        self._state_gauge.set(STATE_VALUES[state])
+
+    def _open(self, now: float, shared: bool = True):
+        was = self._state
+        calls, failures = len(self._calls), self._failures
+        self._set_state(OPEN)
+        self._opened_at = now
+        self.opened += 1
+        self._calls.clear()
+        self._failures = 0
+        if not shared:
+            logger.warning("LLM circuit opened", extra={"upstream": self.name, "by_other_worker": True})
+            return
+        self._publish(OPEN)
+        if was == HALF_OPEN:
+            logger.warning("LLM circuit re-opened: probe failed", extra={"upstream": self.name})
+        else:
+            logger.warning(
+                "LLM circuit opened",
+                extra={"upstream": self.name, "window_calls": calls, "window_failures": failures}
+            )
+
+    def _close(self, shared: bool = True):
+        self._set_state(CLOSED)
+        self._opened_at = None
+        self._calls.clear()
+        self._failures = 0
+        if shared:
+            self._publish(CLOSED)
+            logger.info("LLM circuit closed", extra={"upstream": self.name})
+        else:
+            logger.info("LLM circuit closed", extra={"upstream": self.name, "by_other_worker": True})
+
+    # Shared state
+
+    def _init_shared(self):
+        try:
+            with shared_state.connect(self.shared_path) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS circuit_state ("
+                    "name TEXT PRIMARY KEY, state TEXT NOT NULL, changed_at REAL NOT NULL)"
+                )
+        except sqlite3.Error:
+            logger.exception("Circuit state store unavailable; breaker is per process", extra={"upstream": self.name})
+            self.shared_path = None
+
+    def _publish(self, state: str):
+        if not self.shared_path:
+            return
+        self._shared_changed_at = time.time()
+        try:
+            with shared_state.connect(self.shared_path) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO circuit_state (name, state, changed_at) VALUES (?, ?, ?)",
+                    (self.name, state, self._shared_changed_at)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Could not share circuit state", extra={"upstream": self.name, "error": str(e)})
+
+    def _sync(self):
+        """Adopt a transition another worker made since the last one seen here"""
+        try:
+            row = shared_state.connect(self.shared_path).execute(
+                "SELECT state, changed_at FROM circuit_state WHERE name = ?", (self.name,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Could not read shared circuit state", extra={"upstream": self.name, "error": str(e)})
+            return
+        if row is None or row[1] <= self._shared_changed_at:
+            return
+        state, changed_at = row
+        self._shared_changed_at = changed_at
+        age = time.time() - changed_at
+        if state == OPEN and self._state != OPEN and age < self.open_seconds:
+            self._open(time.monotonic() - age, shared=False)
+        elif state == CLOSED and self._state != CLOSED:
+            self._close(shared=False)
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        self._expire(time.monotonic())
+        calls = len(self._calls)
+        stats = {
+            "state": state,
+            "window_calls": calls,
+            "window_failure_ratio": round(self._failures / calls, 4) if calls else 0.0,
+            "times_opened": self.opened,
+            "rejected": self.rejected,
+            "shared": self.shared_path is not None,
+        }
+        if state == OPEN:
+            stats["retry_in_seconds"] = round(self.open_seconds - (time.monotonic() - self._opened_at), 1)
+        return stats
@@ -0,0 +1,186 @@
+"""
+Morning check-in greetings served from pre-generated pools.
+
+A check-in depends only on the energy level, the personality and when it
+is asked for, so greetings are generated ahead of demand per pool key
+(energy level, weekday, time-of-day bucket, personality; see
+backend.services.response_pool). A request takes the next greeting that
+user has not seen yet, with no LLM call on the request path and no herd of
+near-identical calls at 8am in every timezone.
+
+- serve(): draw from the key's pool; once it is below low water, refill it
+  to full size in the background. An empty pool starts that refill too, but
+  the request gets None at once (the caller answers live) rather than
+  waiting for the pool to fill.
+- prefill job: every interval, fill the pools whose time-of-day bucket is
+  current or starts within the lookahead somewhere (UTC-12 to UTC+14).
+
+At most refill_concurrency refills call the model at once. With
+SHARED_STATE_PATH every worker serves and refills the same pools.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+
+from backend.core.config import settings
+from backend.core.log import get_logger
+from backend.core.metrics import LLM_TOKENS
+from backend.services.response_pool import ResponsePool, parse_pool_key, pool_key
+from backend.services.scheduler import resolve_timezone
+from llm.prompts.compiler import PERSONALITY_STYLES
+from .breaker import CircuitOpenError
+
+ENERGY_LEVELS = ("low", "medium", "high")
+UTC_OFFSETS_HOURS = range(-12, 15)
+# Let the app finish starting before the first prefill
+PREFILL_START_DELAY_SECONDS = 5.0
+
+logger = get_logger(__name__)
+
+
+class CheckinPool:
+    def __init__(
+        self,
+        registry,
+        pool: ResponsePool,
+        variants_per_call: Optional[int] = None,
+        refill_concurrency: Optional[int] = None,
+        lookahead_minutes: Optional[float] = None
+    ):
+        """registry: the AssistantRegistry, so refills use the current assistant after a reload"""
+        self.registry = registry
+        self.pool = pool
+        self.variants_per_call = variants_per_call or settings.checkin_pool_variants_per_call
+        self.lookahead = timedelta(minutes=settings.checkin_pool_lookahead_minutes
+                                   if lookahead_minutes is None else lookahead_minutes)
+        self._semaphore = asyncio.Semaphore(refill_concurrency or settings.checkin_pool_refill_concurrency)
+        self._refills: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"refills": 0, "refill_failures": 0, "generated": 0, "tokens_used": 0, "prefill_runs": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool.size > 0
+
+    def start(self, interval_seconds: float):
+        """Prefill every interval_seconds in the background (0 or less: never)"""
+        if self.enabled and interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop(interval_seconds))
+
+    async def aclose(self):
+        tasks = [self._task] if self._task is not None else []
+        tasks.extend(self._refills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._refills.clear()
+
+    async def _loop(self, interval_seconds: float):
+        await asyncio.sleep(PREFILL_START_DELAY_SECONDS)
+        while True:
+            try:
+                result = await self.prefill()
+                if result["refilled"]:
+                    logger.info("Check-in pools prefilled", extra=result)
+            except Exception:
+                logger.exception("Check-in pool prefill failed")
+            await asyncio.sleep(interval_seconds)
+
+    async def serve(
+        self,
+        energy_level: Optional[str],
+        personality_mode: Optional[str],
+        user_timezone: Optional[str],
+        user: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        A pooled greeting for the user, or None when the request has no pool
+        (unknown energy level or personality) or its pool is still empty
+        """
+        if not self.enabled or energy_level not in ENERGY_LEVELS or personality_mode not in PERSONALITY_STYLES:
+            return None
+        local_now = datetime.now(resolve_timezone(user_timezone))
+        key = pool_key(energy_level, personality_mode, local_now)
+        draw = await self.pool.take(key, user)
+        if draw is None or self.pool.needs_refill(draw.remaining):
+            self.refill(key)
+        if draw is None:
+            return None
+        return {
+            "response": draw.text,
+            "tokens_used": 0,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "context_used": {"energy_level": energy_level, "personality_mode": personality_mode, "pool": key},
+            "pooled": True
+        }
+
+    def refill(self, key: str) -> asyncio.Task:
+        """Start refilling key's pool, or return the refill already running"""
+        task = self._refills.get(key)
+        if task is None:
+            task = self._refills[key] = asyncio.create_task(self._refill(key))
+            task.add_done_callback(lambda _: self._refills.pop(key, None))
+        return task
+
+    async def _refill(self, key: str) -> int:
+        """Generate greetings until key's pool is full again; returns how many were added"""
+        added = 0
+        async with self._semaphore:
+            assistant = self.registry.assistant
+            if not assistant.llm_available():
+                return 0
+            # Another worker may have filled it while this one waited
+            count = await self.pool.count(key)
+            if not self.pool.needs_refill(count):
+                return 0
+            while count < self.pool.size:
+                try:
+                    greetings, tokens_used = await assistant.generate_checkin_greetings(
+                        **parse_pool_key(key), count=self.variants_per_call
+                    )
+                except CircuitOpenError:
+                    self._stats["refill_failures"] += 1
+                    break
+                except Exception:
+                    self._stats["refill_failures"] += 1
+                    logger.exception("Check-in pool refill failed", extra={"pool": key})
+                    break
+                self._stats["tokens_used"] += tokens_used
+                LLM_TOKENS.labels("morning-checkin").inc(tokens_used)
+                new = await self.pool.add(key, greetings)
+                if not new:
+                    break
+                added += new
+                count += new
+        self._stats["refills"] += 1
+        self._stats["generated"] += added
+        return added
+
+    def upcoming_keys(self, now: Optional[datetime] = None) -> Set[str]:
+        """Pool keys whose time-of-day bucket is current or starts within the lookahead in some timezone"""
+        now = now or datetime.now(timezone.utc)
+        keys = set()
+        for offset in UTC_OFFSETS_HOURS:
+            for moment in (now, now + self.lookahead):
+                local = moment.astimezone(timezone(timedelta(hours=offset)))
+                for energy_level in ENERGY_LEVELS:
+                    for personality_mode in PERSONALITY_STYLES:
+                        keys.add(pool_key(energy_level, personality_mode, local))
+        return keys
+
+    async def prefill(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Refill every upcoming pool below low water; returns counters"""
+        keys = self.upcoming_keys(now)
+        low = [key for key in keys if self.pool.needs_refill(await self.pool.count(key))]
+        added = await asyncio.gather(*(self.refill(key) for key in low))
+        self._stats["prefill_runs"] += 1
+        return {"pools": len(keys), "refilled": len(low), "added": sum(added)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "refilling": len(self._refills),
+            "variants_per_call": self.variants_per_call,
+            "pool": self.pool.stats(),
+        }
@@ -0,0 +1,200 @@
+"""
+Multi-turn chat sessions with a rolling summary.
+
+A chat request that names a session_id is answered with the conversation
+so far in the prompt, so a follow-up like "no, something shorter" works
+without the client resending anything. The prompt stays bounded however
+long the session runs:
+- history(): the session's summary plus its most recent turns, up to
+  CONVERSATION_HISTORY_TOKENS (older unsummarized turns are left out)
+- record(): after each answer, store the user message and the reply (the
+  message only, not the prompt built around it). Once the unsummarized
+  turns pass CONVERSATION_SUMMARIZE_AFTER_TOKENS, fold the oldest of them
+  into the summary in the background, keeping the latest
+  CONVERSATION_KEEP_RECENT_TOKENS verbatim.
+
+Summaries are written by the model and capped at
+CONVERSATION_SUMMARY_MAX_TOKENS. When no provider is available the older
+turns are folded into a shortened transcript instead, so sessions stay
+bounded either way. Storage is backend.services.conversation_store
+(memory, or SQLite shared by the workers).
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.core.config import settings
+from backend.core.log import get_logger
+from backend.core.metrics import LLM_TOKENS
+from backend.services.conversation_store import Conversation, ConversationStore, Turn
+from llm.prompts.compiler import CHARS_PER_TOKEN, count_tokens, fill_history, format_transcript
+from .breaker import CircuitOpenError
+
+# Characters kept of each turn in the fallback summary
+FALLBACK_TURN_CHARS = 160
+
+logger = get_logger(__name__)
+
+
+def clip_summary(text: str, max_tokens: int) -> str:
+    """text within max_tokens, dropping its oldest lines first (then cutting the last one)"""
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    text = "\n".join(lines)
+    limit = max_tokens * CHARS_PER_TOKEN
+    while text and count_tokens(text) > max_tokens:
+        text = text[-limit:].lstrip()
+        limit = limit * 9 // 10
+    return text
+
+
+def fallback_summary(summary: str, turns: Sequence[Turn], max_tokens: int) -> str:
+    """Summary without a model call: the old one followed by the folded turns, shortened"""
+    shortened = []
+    for turn in turns:
+        # One line per turn, so clipping drops whole turns
+        content = " ".join(turn.content.split())
+        if len(content) > FALLBACK_TURN_CHARS:
+            content = content[:FALLBACK_TURN_CHARS].rstrip() + "…"
+        shortened.append((turn.role, content))
+    return clip_summary(f"{summary}\n{format_transcript(shortened)}", max_tokens)
+
+
+class ConversationManager:
+    def __init__(
+        self,
+        registry,
+        store: ConversationStore,
+        history_tokens: Optional[int] = None,
+        summarize_after_tokens: Optional[int] = None,
+        keep_recent_tokens: Optional[int] = None,
+        summary_max_tokens: Optional[int] = None
+    ):
+        """registry: the AssistantRegistry, so summaries use the current assistant after a reload"""
+        self.registry = registry
+        self.store = store
+        self.history_tokens = settings.conversation_history_tokens if history_tokens is None else history_tokens
+        self.summarize_after_tokens = (settings.conversation_summarize_after_tokens
+                                       if summarize_after_tokens is None else summarize_after_tokens)
+        self.keep_recent_tokens = settings.conversation_keep_recent_tokens if keep_recent_tokens is None else keep_recent_tokens
+        self.summary_max_tokens = settings.conversation_summary_max_tokens if summary_max_tokens is None else summary_max_tokens
+        self._folds: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "summaries": 0, "fallback_summaries": 0, "summary_failures": 0, "tokens_used": 0,
+            "turns_folded": 0, "histories": 0, "history_tokens_sent": 0, "max_history_tokens_sent": 0
+        }
+
+    async def create(self, owner: str) -> Conversation:
+        return await self.store.create(owner)
+
+    async def open(self, session_id: str, owner: str) -> Optional[Conversation]:
+        """The owner's session, or None when it does not exist, expired or belongs to someone else"""
+        conversation = await self.store.get(session_id)
+        if conversation is None or conversation.owner != owner:
+            return None
+        return conversation
+
+    async def delete(self, session_id: str) -> bool:
+        task = self._folds.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+        return await self.store.delete(session_id)
+
+    def history(self, conversation: Conversation) -> List[Dict[str, str]]:
+        """Messages replaying the conversation, at most summary cap + history_tokens long"""
+        messages, tokens = fill_history(
+            conversation.summary,
+            [(turn.role, turn.content, turn.tokens) for turn in conversation.turns],
+            self.history_tokens
+        )
+        self._stats["histories"] += 1
+        self._stats["history_tokens_sent"] += tokens
+        self._stats["max_history_tokens_sent"] = max(self._stats["max_history_tokens_sent"], tokens)
+        return messages
+
+    async def record(self, session_id: str, user_input: str, reply: str) -> bool:
+        """Store one exchange; returns False when the session is gone"""
+        pending = await self.store.append(session_id, [
+            ("user", user_input, count_tokens(user_input)),
+            ("assistant", reply, count_tokens(reply)),
+        ])
+        if pending is None:
+            return False
+        if pending > self.summarize_after_tokens:
+            self.summarize(session_id)
+        return True
+
+    def summarize(self, session_id: str) -> asyncio.Task:
+        """Start folding the session's older turns into its summary, or return the fold already running"""
+        task = self._folds.get(session_id)
+        if task is None:
+            task = self._folds[session_id] = asyncio.create_task(self._summarize(session_id))
+            task.add_done_callback(lambda _: self._folds.pop(session_id, None))
+        return task
+
+    def _turns_to_fold(self, turns: Sequence[Turn]) -> Sequence[Turn]:
+        """Oldest turns beyond the most recent keep_recent_tokens (the last exchange is always kept)"""
+        kept = 0
+        start = len(turns)
+        while start > 0 and (len(turns) - start < 2 or kept + turns[start - 1].tokens <= self.keep_recent_tokens):
+            start -= 1
+            kept += turns[start].tokens
+        # Whole exchanges only, so the kept turns still start with the user's message
+        while start > 0 and turns[start - 1].role != "assistant":
+            start -= 1
+        return turns[:start]
+
+    async def _summarize(self, session_id: str) -> bool:
+        """Fold older turns into the summary; returns whether the session changed"""
+        conversation = await self.store.get(session_id)
+        if conversation is None:
+            return False
+        fold = self._turns_to_fold(conversation.turns)
+        if not fold:
+            return False
+        summary = None
+        assistant = self.registry.assistant
+        if assistant.llm_available():
+            try:
+                summary, tokens_used = await assistant.summarize_conversation(
+                    conversation.summary, [(turn.role, turn.content) for turn in fold], self.summary_max_tokens
+                )
+                self._stats["tokens_used"] += tokens_used
+                LLM_TOKENS.labels("conversation-summary").inc(tokens_used)
+            except CircuitOpenError:
+                self._stats["summary_failures"] += 1
+            except Exception:
+                self._stats["summary_failures"] += 1
+                logger.exception("Conversation summary failed, folding without the model", extra={"turns": len(fold)})
+        if summary:
+            summary = clip_summary(summary, self.summary_max_tokens)
+            self._stats["summaries"] += 1
+        else:
+            summary = fallback_summary(conversation.summary, fold, self.summary_max_tokens)
+            self._stats["fallback_summaries"] += 1
+        folded = await self.store.fold(
+            session_id, summary, count_tokens(summary), fold[-1].seq, conversation.summarized_through
+        )
+        if folded:
+            self._stats["turns_folded"] += len(fold)
+        return folded
+
+    async def aclose(self):
+        tasks = list(self._folds.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._folds.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        histories = self._stats["histories"]
+        return {
+            **self._stats,
+            "avg_history_tokens_sent": round(self._stats["history_tokens_sent"] / histories, 1) if histories else 0.0,
+            "summarizing": len(self._folds),
+            "history_tokens": self.history_tokens,
+            "summarize_after_tokens": self.summarize_after_tokens,
+            "keep_recent_tokens": self.keep_recent_tokens,
+            "summary_max_tokens": self.summary_max_tokens,
+            "store": self.store.stats(),
+        }
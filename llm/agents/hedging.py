@@ -0,0 +1,90 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from backend.core.metrics import LLM_HEDGES
+
+
+class LatencyWindow:
+    """The last `size` successful call latencies, for percentile estimates"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Hedger:
+    """
+    Hedged requests: when attempt(0) has not answered within the delay,
+    attempt(1) starts (the router sends it to the next provider). Whichever
+    succeeds first wins and the other is cancelled.
+
+    The delay is the `percentile` latency of recent successful calls, but
+    never less than min_delay. Until min_samples latencies are known, calls
+    are not hedged. At the 95th percentile, about one call in twenty is
+    hedged. A hedged call can spend tokens twice.
+    """
+
+    def __init__(self, percentile: float = 0.95, min_delay: float = 0.25, min_samples: int = 20):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> Optional[float]:
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    async def run(self, attempt: Callable[[int], Awaitable[Any]], hedge: bool = True) -> Any:
+        """Run attempt(0), racing attempt(1) after delay() when hedge is set"""
+        self.calls += 1
+        delay = self.delay() if hedge else None
+        primary = asyncio.ensure_future(attempt(0))
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                LLM_HEDGES.labels("fired").inc()
+                tasks.add(asyncio.ensure_future(attempt(1)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                            LLM_HEDGES.labels("won").inc()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.delay()
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "delay_seconds": round(delay, 3) if delay is not None else None,
+        }
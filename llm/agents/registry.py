@@ -0,0 +1,90 @@
+import asyncio
+from typing import Optional
+
+import httpx
+
+from backend.core.config import settings
+from .assistant import TimelyAssistant
+from .router import build_router
+
+# How long a replaced client stays open so in-flight calls can finish
+RETIRED_CLIENT_GRACE_SECONDS = 60.0
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """HTTP client with the connection pool limits from settings, shared by all providers"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry,
+        )
+    )
+
+
+class AssistantRegistry:
+    """
+    Process-wide owner of the shared HTTP connection pool, provider router
+    and TimelyAssistant.
+
+    Created once in the app lifespan so every request reuses the same warm
+    connection pool. Configuration changes are picked up through reload(),
+    never by rebuilding per request.
+    """
+
+    def __init__(self):
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._assistant: Optional[TimelyAssistant] = None
+        self._retired = {}
+        self._lock = asyncio.Lock()
+        self.generation = 0
+
+    @property
+    def assistant(self) -> TimelyAssistant:
+        if self._assistant is None:
+            self.start()
+        return self._assistant
+
+    @property
+    def started(self) -> bool:
+        return self._assistant is not None
+
+    def start(self):
+        """Build the shared client, providers and assistant from current settings"""
+        http_client = build_http_client()
+        self._http_client = http_client
+        self._assistant = TimelyAssistant(router=build_router(http_client))
+        self.generation += 1
+
+    async def reload(self) -> int:
+        """Re-read settings and swap in a fresh client; returns the new generation"""
+        async with self._lock:
+            settings.reload()
+            old_http_client = self._http_client
+            self.start()
+            if old_http_client is not None:
+                self._retire(old_http_client)
+            return self.generation
+
+    def _retire(self, http_client: httpx.AsyncClient):
+        """Close a replaced client once requests still using it have had time to finish"""
+        async def close_later():
+            try:
+                await asyncio.sleep(RETIRED_CLIENT_GRACE_SECONDS)
+                await http_client.aclose()
+            finally:
+                self._retired.pop(task, None)
+
+        task = asyncio.create_task(close_later())
+        self._retired[task] = http_client
+
+    async def aclose(self):
+        """Close the shared client and any retired ones still pending"""
+        for task, http_client in list(self._retired.items()):
+            task.cancel()
+            await http_client.aclose()
+        self._retired.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._assistant = None
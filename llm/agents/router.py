@@ -0,0 +1,368 @@
+"""
+Picks the LLM provider for each call and fails over between providers.
+
+Every provider has its own circuit breaker and hedger, and rolling stats:
+- EWMA latency: time to the answer, or to the first token for streams
+- EWMA error rate
+- blended cost per 1,000 tokens
+
+With LLM_ROUTING=adaptive, providers are tried in order of
+
+    score = latency_s + LLM_ROUTER_ERROR_PENALTY_SECONDS * error_rate
+            + LLM_ROUTER_COST_WEIGHT * cost_per_1k_usd
+
+(lower is better). A provider with no calls yet counts as fast as the
+fastest one seen, so it gets tried. LLM_ROUTER_EXPLORE_RATE of calls go to
+another provider first, which keeps the stats of the others current.
+LLM_ROUTING=ordered keeps the LLM_PROVIDERS order and uses it only for
+failover.
+
+A failed call moves on to the next provider whose circuit admits it. A
+stream fails over only before its first token. When every circuit is open,
+calls raise NoProviderAvailable, a CircuitOpenError, and the assistant
+answers from its fallback.
+
+Per-attempt timeouts and retries alone let one degraded completion run for
+(retries + 1) x LLM_TIMEOUT_SECONDS per provider. complete() therefore
+runs under one LLM_DEADLINE_SECONDS deadline covering every retry, failover
+and hedge, and raises DeadlineExceeded (the assistant answers from its
+fallback) when it passes.
+"""
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import httpx
+
+from backend.core.config import settings
+from backend.core.lazy import lazy_import
+from backend.core.log import get_logger
+from backend.core.metrics import LLM_COST, LLM_FAILOVERS, LLM_REQUEST_DURATION, LLM_TIME_TO_FIRST_TOKEN
+from llm.providers.anthropic_provider import AnthropicProvider
+from llm.providers.base import CHARS_PER_TOKEN, Completion, LLMProvider
+from llm.providers.openai_provider import OpenAIProvider
+from .breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+from .hedging import Hedger
+
+openai = lazy_import("openai")
+
+ROUTING_MODES = ("adaptive", "ordered")
+
+# Weight of the newest observation in the latency / error rate averages
+EWMA_ALPHA = 0.2
+
+# Share of prompt tokens in a typical call, for the blended cost per token
+PROMPT_TOKEN_SHARE = 0.8
+
+logger = get_logger(__name__)
+
+
+class NoProviderAvailable(CircuitOpenError):
+    """Every provider's circuit is open"""
+
+
+class DeadlineExceeded(Exception):
+    """A completion did not finish within the router's deadline"""
+
+
+class _Route:
+    """A provider with its breaker, hedger and rolling stats"""
+
+    def __init__(self, provider: LLMProvider, breaker: CircuitBreaker, hedger: Hedger):
+        self.provider = provider
+        self.breaker = breaker
+        self.hedger = hedger
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.tokens = 0
+        self.cost_usd = 0.0
+        self._cost_counter = LLM_COST.labels(provider.name)
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+    @property
+    def cost_per_1k(self) -> float:
+        return (
+            PROMPT_TOKEN_SHARE * self.provider.input_cost_per_1k
+            + (1 - PROMPT_TOKEN_SHARE) * self.provider.output_cost_per_1k
+        )
+
+    def observe(self, ok: bool, seconds: float):
+        self.calls += 1
+        self.failures += not ok
+        self.latency = seconds if self.latency is None else self.latency + EWMA_ALPHA * (seconds - self.latency)
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def charge(self, prompt_tokens: int, completion_tokens: int):
+        cost = self.provider.cost(prompt_tokens, completion_tokens)
+        self.tokens += prompt_tokens + completion_tokens
+        self.cost_usd += cost
+        self._cost_counter.inc(cost)
+
+    def stats(self, score: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model": self.provider.model,
+            "score": round(score, 4),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "calls": self.calls,
+            "failures": self.failures,
+            "tokens": self.tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "circuit": self.breaker.stats(),
+            "hedging": self.hedger.stats(),
+        }
+
+
+class ProviderRouter:
+    def __init__(
+        self,
+        providers: Sequence[LLMProvider],
+        routing: str = "adaptive",
+        cost_weight: float = 100.0,
+        error_penalty_seconds: float = 5.0,
+        explore_rate: float = 0.02,
+        hedge_enabled: bool = False,
+        deadline_seconds: float = 0.0,
+        breaker_options: Optional[Dict[str, Any]] = None,
+        hedge_options: Optional[Dict[str, Any]] = None,
+        owned_http_client: Optional[httpx.AsyncClient] = None
+    ):
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"LLM routing must be one of {ROUTING_MODES}, got {routing!r}")
+        self.routes = [
+            _Route(provider, CircuitBreaker(provider.name, **(breaker_options or {})), Hedger(**(hedge_options or {})))
+            for provider in providers
+        ]
+        self.routing = routing
+        self.cost_weight = cost_weight
+        self.error_penalty_seconds = error_penalty_seconds
+        self.explore_rate = explore_rate
+        self.hedge_enabled = hedge_enabled
+        self.deadline_seconds = deadline_seconds
+        self.deadlines_exceeded = 0
+        self._owned_http_client = owned_http_client
+        self._random = random.Random()
+
+    @property
+    def provider_names(self) -> List[str]:
+        return [route.name for route in self.routes]
+
+    def available(self) -> bool:
+        """Whether any provider's circuit admits calls (when none does, the rejection is counted)"""
+        if any(route.breaker.state != OPEN for route in self.routes):
+            return True
+        for route in self.routes:
+            route.breaker.rejecting()
+        return False
+
+    def _score(self, route: _Route, fastest: float) -> float:
+        latency = route.latency if route.latency is not None else fastest
+        return latency + self.error_penalty_seconds * route.error_rate + self.cost_weight * route.cost_per_1k
+
+    def ranked(self) -> List[_Route]:
+        """Providers in the order to try them for the next call"""
+        if self.routing == "ordered" or len(self.routes) < 2:
+            return list(self.routes)
+        known = [route.latency for route in self.routes if route.latency is not None]
+        fastest = min(known) if known else 0.0
+        order = sorted(self.routes, key=lambda route: self._score(route, fastest))
+        if self._random.random() < self.explore_rate:
+            order.insert(0, order.pop(self._random.randrange(1, len(order))))
+        return order
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Completion:
+        """
+        One completion from the best available provider, failing over on
+        errors. With hedging on, a second attempt starts from the next
+        provider (or the same one, if it is the only one). Everything runs
+        under deadline_seconds; raises DeadlineExceeded once it has passed.
+        """
+        order = self.ranked()
+        primary = order[0]
+
+        def attempt(index: int):
+            shift = index % len(order)
+            return self._failover(order[shift:] + order[:shift], messages, max_tokens, temperature)
+
+        hedge = self.hedge_enabled and primary.breaker.state == CLOSED
+        try:
+            async with asyncio.timeout(self.deadline_seconds if self.deadline_seconds > 0 else None):
+                return await primary.hedger.run(attempt, hedge=hedge)
+        except TimeoutError:
+            self.deadlines_exceeded += 1
+            raise DeadlineExceeded(f"no completion within {self.deadline_seconds}s") from None
+
+    async def _failover(
+        self, order: List[_Route], messages: List[Dict[str, str]], max_tokens: int, temperature: float
+    ) -> Completion:
+        last_error = None
+        for route in order:
+            if not route.breaker.allow():
+                continue
+            try:
+                return await self._call(route, messages, max_tokens, temperature)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                LLM_FAILOVERS.labels(route.name).inc()
+                logger.warning("LLM provider failed", extra={"provider": route.name, "error": str(e)})
+        if last_error is not None:
+            raise last_error
+        raise NoProviderAvailable("every LLM provider circuit is open")
+
+    async def _call(self, route: _Route, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Completion:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            completion = await route.provider.complete(messages, max_tokens, temperature)
+            outcome = "ok"
+            route.charge(completion.prompt_tokens, completion.completion_tokens)
+            return completion
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            LLM_REQUEST_DURATION.labels(route.name, "complete", outcome).observe(elapsed)
+            # A call cut off by the deadline after slow_call_seconds still counts as slow
+            if outcome == "cancelled" and elapsed < route.breaker.slow_call_seconds:
+                route.breaker.release()
+            else:
+                route.breaker.record(outcome == "ok", elapsed)
+                route.observe(outcome == "ok", elapsed)
+                if outcome == "ok":
+                    route.hedger.latencies.observe(elapsed)
+
+    async def stream(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Text deltas from the best available provider; failover only before the first token"""
+        prompt_tokens = sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN
+        last_error = None
+        for route in self.ranked():
+            if not route.breaker.allow():
+                continue
+            start = time.perf_counter()
+            first_token_at = None
+            chars = 0
+            outcome = "error"
+            deltas = route.provider.stream(messages, max_tokens, temperature)
+            try:
+                async for text in deltas:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        LLM_TIME_TO_FIRST_TOKEN.observe(first_token_at - start)
+                    chars += len(text)
+                    yield text
+                outcome = "ok"
+                return
+            except (asyncio.CancelledError, GeneratorExit):
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                if first_token_at is not None:
+                    raise
+                last_error = e
+                LLM_FAILOVERS.labels(route.name).inc()
+                logger.warning("LLM provider stream failed", extra={"provider": route.name, "error": str(e)})
+            finally:
+                await deltas.aclose()
+                now = time.perf_counter()
+                LLM_REQUEST_DURATION.labels(route.name, "stream", outcome).observe(now - start)
+                if outcome == "cancelled":
+                    route.breaker.release()
+                else:
+                    ttfb = (first_token_at or now) - start
+                    route.breaker.record(outcome == "ok", ttfb)
+                    route.observe(outcome == "ok", ttfb)
+                if chars:
+                    route.charge(prompt_tokens, chars // CHARS_PER_TOKEN)
+        if last_error is not None:
+            raise last_error
+        raise NoProviderAvailable("every LLM provider circuit is open")
+
+    def stats(self) -> Dict[str, Any]:
+        known = [route.latency for route in self.routes if route.latency is not None]
+        fastest = min(known) if known else 0.0
+        return {
+            "routing": self.routing,
+            "hedging": self.hedge_enabled,
+            "deadline_seconds": self.deadline_seconds,
+            "deadlines_exceeded": self.deadlines_exceeded,
+            "providers": [route.stats(self._score(route, fastest)) for route in self.routes],
+        }
+
+    async def aclose(self):
+        if self._owned_http_client is not None:
+            await self._owned_http_client.aclose()
+            self._owned_http_client = None
+
+
+def build_router(http_client: Optional[httpx.AsyncClient] = None) -> ProviderRouter:
+    """
+    Router over the providers in LLM_PROVIDERS that have an API key. Without
+    an http_client, the router makes its own and closes it in aclose().
+    """
+    owned = None
+    if http_client is None:
+        http_client = owned = httpx.AsyncClient()
+
+    providers: List[LLMProvider] = []
+    for name in settings.llm_providers:
+        if name == "openai" and settings.openai_api_key:
+            providers.append(OpenAIProvider(
+                openai.AsyncOpenAI(
+                    api_key=settings.openai_api_key,
+                    base_url=settings.openai_base_url,
+                    timeout=settings.llm_timeout_seconds,
+                    max_retries=settings.llm_max_retries,
+                    http_client=http_client
+                ),
+                settings.openai_model,
+                settings.openai_input_cost_per_1k,
+                settings.openai_output_cost_per_1k
+            ))
+        elif name == "anthropic" and settings.anthropic_api_key:
+            providers.append(AnthropicProvider(
+                http_client,
+                settings.anthropic_api_key,
+                settings.anthropic_model,
+                base_url=settings.anthropic_base_url,
+                timeout=settings.llm_timeout_seconds,
+                max_retries=settings.llm_max_retries,
+                input_cost_per_1k=settings.anthropic_input_cost_per_1k,
+                output_cost_per_1k=settings.anthropic_output_cost_per_1k
+            ))
+        elif name not in ("openai", "anthropic"):
+            logger.warning("Unknown LLM provider in LLM_PROVIDERS", extra={"provider": name})
+
+    return ProviderRouter(
+        providers,
+        routing=settings.llm_routing,
+        cost_weight=settings.llm_router_cost_weight,
+        error_penalty_seconds=settings.llm_router_error_penalty_seconds,
+        explore_rate=settings.llm_router_explore_rate,
+        hedge_enabled=settings.llm_hedge_enabled,
+        deadline_seconds=settings.llm_deadline_seconds,
+        breaker_options={
+            "failure_ratio": settings.llm_breaker_failure_ratio,
+            "min_calls": settings.llm_breaker_min_calls,
+            "window_seconds": settings.llm_breaker_window_seconds,
+            "slow_call_seconds": settings.llm_breaker_slow_call_seconds,
+            "open_seconds": settings.llm_breaker_open_seconds,
+            "half_open_probes": settings.llm_breaker_half_open_probes,
+            "shared_path": settings.shared_state_path,
+            "sync_seconds": settings.shared_state_sync_seconds,
+        },
+        hedge_options={
+            "percentile": settings.llm_hedge_percentile,
+            "min_delay": settings.llm_hedge_min_delay_seconds,
+        },
+        owned_http_client=owned
+    )
@@ -0,0 +1,523 @@
+"""
+Background upkeep for user memories: relevance decay, near-duplicate
+merging, summaries of old memory clusters, and pruning.
+
+A memory's relevance_score is its relevance as of updated_at and halves
+every memory_decay_half_life_days from there, so time passing never
+requires rewriting rows. expires_at records when the decayed relevance
+falls below memory_prune_threshold, which makes pruning an index range
+scan.
+
+A run has three passes. Each one reads bounded chunks in keyset order and
+commits every chunk separately, so it runs alongside live traffic. The
+vectors of memories a chunk deletes are dropped from the index only once
+its transaction has committed:
+
+- refresh: only rows whose updated_at is past the previous run's watermark.
+  Near-duplicates (by embedding similarity) merge into the oldest copy,
+  which gets the higher relevance back. Every row gets its expires_at.
+- prune: delete memories whose expires_at has passed
+- summarize: only rows whose created_at crossed the summary age since the
+  previous run. Each is folded into the user's most similar summary, or
+  clustered with its neighbours into a new one.
+
+Watermarks and a lease are kept in job_state, so with several workers only
+one runs the job at a time and a new run resumes where the last stopped.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.lazy import lazy_import
+from backend.core.log import get_logger
+from backend.models.user import JobState, Memory
+from .service import MemoryService, MemoryUnavailable, embedding_id
+
+np = lazy_import("numpy")
+
+JOB_NAME = "memory_consolidation"
+SUMMARY_TYPE = "summary"
+
+logger = get_logger(__name__)
+
+# Rows updated this recently wait for the next run, so a transaction that
+# commits late cannot land behind the watermark
+WATERMARK_LAG = timedelta(seconds=60)
+LEASE_DURATION = timedelta(minutes=10)
+# Neighbours checked per memory when looking for near-duplicates
+MERGE_NEIGHBORS = 4
+# Pause between chunks so live requests get the database in between
+CHUNK_PAUSE_SECONDS = 0.05
+
+
+def decayed_relevance(score: float, since: datetime, now: datetime, half_life_days: float) -> float:
+    """score as of since, halved every half_life_days up to now"""
+    if half_life_days <= 0 or since is None:
+        return score
+    age_days = max((now - since).total_seconds(), 0.0) / 86400
+    return score * 0.5 ** (age_days / half_life_days)
+
+
+def expiry(score: float, since: datetime, half_life_days: float, threshold: float) -> Optional[datetime]:
+    """When score (as of since) decays below threshold; None if it never does"""
+    if half_life_days <= 0 or threshold <= 0:
+        return None
+    if score <= threshold:
+        return since
+    return since + timedelta(days=half_life_days * math.log2(score / threshold))
+
+
+def combine(texts: Sequence[str], max_chars: int) -> str:
+    """Extractive summary: the distinct texts in order, joined, up to max_chars"""
+    parts, seen, length = [], set(), 0
+    for text in texts:
+        key = " ".join(text.lower().split())
+        if not key or key in seen:
+            continue
+        added = len(text) + (2 if parts else 0)
+        if parts and length + added > max_chars:
+            break
+        seen.add(key)
+        parts.append(text)
+        length += added
+    return "; ".join(parts)[:max_chars]
+
+
+def cluster(vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """
+    Greedy single-pass clustering of normalized vectors: each joins the
+    cluster whose centroid it is most similar to, if at least threshold.
+    Returns row indexes per cluster, most central member first.
+    """
+    clusters: List[List[int]] = []
+    centroids: List[np.ndarray] = []
+    for index, vector in enumerate(vectors):
+        if centroids:
+            similarities = np.stack(centroids) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                clusters[best].append(index)
+                centroid = vectors[clusters[best]].mean(axis=0)
+                centroids[best] = centroid / (np.linalg.norm(centroid) or 1.0)
+                continue
+        clusters.append([index])
+        centroids.append(vector)
+    ordered = []
+    for members in clusters:
+        sub = vectors[members]
+        centrality = (sub @ sub.T).sum(axis=1)
+        ordered.append([members[i] for i in np.argsort(-centrality)])
+    return ordered
+
+
+class MemoryConsolidator:
+    def __init__(self, memory: MemoryService, chunk_size: Optional[int] = None):
+        self.memory = memory
+        self.chunk_size = chunk_size or settings.memory_consolidation_chunk_size
+        self.half_life_days = settings.memory_decay_half_life_days
+        self.prune_threshold = settings.memory_prune_threshold
+        self.merge_threshold = settings.memory_merge_threshold
+        self.summarize_after_days = settings.memory_summarize_after_days
+        self.cluster_threshold = settings.memory_cluster_threshold
+        self.cluster_min_size = settings.memory_cluster_min_size
+        self.summary_max_chars = settings.memory_summary_max_chars
+        self.owner = uuid.uuid4().hex
+        self.runs = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._cursor: Dict[str, Any] = {}
+        # Index ids of rows the current chunk deleted, dropped after it commits
+        self._index_deletes: List[str] = []
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, interval_seconds: float):
+        """Run every interval_seconds in the background (0 or less: never)"""
+        if interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop(interval_seconds))
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                result = await self.run()
+                logger.info("Memory consolidation run", extra=result)
+            except MemoryUnavailable:
+                # MemoryService already logged why; try again next interval
+                pass
+            except Exception:
+                logger.exception("Memory consolidation failed")
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        One consolidation run; returns its counters ("skipped" if another
+        worker holds the lease). Raises MemoryUnavailable while the memory
+        backend is off.
+        """
+        self.memory.check_backend("writes_skipped")
+        now = datetime.utcnow()
+        if not await self._acquire(now):
+            return {"skipped": True}
+        counts = {"pruned": 0, "refreshed": 0, "merged": 0, "summarized": 0, "summaries": 0, "chunks": 0}
+        start = time.perf_counter()
+        self._index_deletes = []
+        self._running = True
+        try:
+            await self._refresh(now, counts)
+            await self._prune(now, counts)
+            await self._summarize(now, counts)
+        finally:
+            self._running = False
+            await self._release()
+        counts["seconds"] = round(time.perf_counter() - start, 3)
+        self.runs += 1
+        self.last_run = {**counts, "finished_at": datetime.utcnow().isoformat()}
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {"runs": self.runs, "running": self._running, "last_run": self.last_run}
+
+    # Lease and watermarks
+
+    async def _acquire(self, now: datetime) -> bool:
+        async with AsyncSessionLocal() as db:
+            if await db.get(JobState, JOB_NAME) is None:
+                db.add(JobState(name=JOB_NAME, cursor={}))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    await db.rollback()
+            result = await db.execute(
+                update(JobState)
+                .where(
+                    JobState.name == JOB_NAME,
+                    or_(JobState.lease_until.is_(None), JobState.lease_until < now)
+                )
+                .values(lease_owner=self.owner, lease_until=now + LEASE_DURATION)
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                return False
+            state = await db.get(JobState, JOB_NAME, populate_existing=True)
+            self._cursor = dict(state.cursor or {})
+            return True
+
+    async def _checkpoint(self, db):
+        """Save the watermarks in db's transaction and extend the lease; fails if the lease was lost"""
+        result = await db.execute(
+            update(JobState)
+            .where(JobState.name == JOB_NAME, JobState.lease_owner == self.owner)
+            .values(cursor=dict(self._cursor), lease_until=datetime.utcnow() + LEASE_DURATION)
+        )
+        if result.rowcount != 1:
+            raise RuntimeError("Memory consolidation lease lost to another worker")
+
+    async def _commit(self, db):
+        """Commit the chunk, then drop the vectors of the memories it deleted"""
+        keys, self._index_deletes = self._index_deletes, []
+        await db.commit()
+        if keys:
+            await self.memory.run_backend(self.memory.index.delete, keys)
+
+    async def _release(self):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(JobState)
+                .where(JobState.name == JOB_NAME, JobState.lease_owner == self.owner)
+                .values(lease_owner=None, lease_until=None)
+            )
+            await db.commit()
+        self._cursor = {}
+
+    def _watermark(self, name: str) -> Tuple[Optional[datetime], int]:
+        at = self._cursor.get(f"{name}_at")
+        return (datetime.fromisoformat(at) if at else None), self._cursor.get(f"{name}_id", 0)
+
+    def _advance(self, name: str, at: datetime, id_: int):
+        self._cursor[f"{name}_at"] = at.isoformat()
+        self._cursor[f"{name}_id"] = id_
+
+    # Passes
+
+    async def _prune(self, now: datetime, counts: Dict[str, int]):
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(Memory.id, Memory.embedding_id)
+                    .where(Memory.expires_at <= now)
+                    .order_by(Memory.expires_at)
+                    .limit(self.chunk_size)
+                )).all()
+                if not rows:
+                    return
+                await self._delete(db, [row.id for row in rows], [row.embedding_id for row in rows])
+                await self._checkpoint(db)
+                await self._commit(db)
+            counts["pruned"] += len(rows)
+            counts["chunks"] += 1
+            await asyncio.sleep(CHUNK_PAUSE_SECONDS)
+
+    async def _refresh(self, now: datetime, counts: Dict[str, int]):
+        horizon = now - WATERMARK_LAG
+        while True:
+            after_at, after_id = self._watermark("updated")
+            query = select(Memory).where(Memory.updated_at <= horizon)
+            if after_at is not None:
+                query = query.where(or_(
+                    Memory.updated_at > after_at,
+                    and_(Memory.updated_at == after_at, Memory.id > after_id)
+                ))
+            async with AsyncSessionLocal() as db:
+                rows = list(await db.scalars(query.order_by(Memory.updated_at, Memory.id).limit(self.chunk_size)))
+                if not rows:
+                    return
+                last_at, last_id = rows[-1].updated_at, rows[-1].id
+                merged, rewritten = await self._merge_duplicates(db, rows, now)
+                expiries = [
+                    {"memory_id": row.id, "expires": expiry(
+                        row.relevance_score or 0.0, row.updated_at, self.half_life_days, self.prune_threshold
+                    )}
+                    for row in rows
+                    if row.id not in merged and row.id not in rewritten
+                ]
+                if expiries:
+                    # Core executemany: a row forgotten meanwhile is skipped, not a StaleDataError
+                    table = Memory.__table__
+                    await db.execute(
+                        update(table).where(table.c.id == bindparam("memory_id")).values(expires_at=bindparam("expires")),
+                        expiries
+                    )
+                self._advance("updated", last_at, last_id)
+                await self._checkpoint(db)
+                await self._commit(db)
+            counts["refreshed"] += len(rows)
+            counts["merged"] += len(merged)
+            counts["chunks"] += 1
+            await asyncio.sleep(CHUNK_PAUSE_SECONDS)
+
+    async def _summarize(self, now: datetime, counts: Dict[str, int]):
+        if self.summarize_after_days <= 0:
+            return
+        cutoff = now - timedelta(days=self.summarize_after_days)
+        while True:
+            after_at, after_id = self._watermark("created")
+            query = select(Memory).where(
+                Memory.created_at <= cutoff,
+                or_(Memory.memory_type.is_(None), Memory.memory_type != SUMMARY_TYPE)
+            )
+            if after_at is not None:
+                query = query.where(or_(
+                    Memory.created_at > after_at,
+                    and_(Memory.created_at == after_at, Memory.id > after_id)
+                ))
+            async with AsyncSessionLocal() as db:
+                rows = list(await db.scalars(query.order_by(Memory.created_at, Memory.id).limit(self.chunk_size)))
+                if not rows:
+                    return
+                last_at, last_id = rows[-1].created_at, rows[-1].id
+                summarized, summaries = await self._summarize_chunk(db, rows, now)
+                self._advance("created", last_at, last_id)
+                await self._checkpoint(db)
+                await self._commit(db)
+            counts["summarized"] += summarized
+            counts["summaries"] += summaries
+            counts["chunks"] += 1
+            await asyncio.sleep(CHUNK_PAUSE_SECONDS)
+
+    # Chunk work
+
+    async def _vectors(self, rows: Sequence[Memory]) -> Dict[str, np.ndarray]:
+        """Index vectors for rows; rows missing from the index are embedded and added again"""
+        vectors = await self.memory.run_backend(self.memory.index.get, [row.embedding_id for row in rows])
+        missing = [row for row in rows if row.embedding_id not in vectors]
+        if missing:
+            embedded = await self.memory.run_backend(self.memory.embedder.embed, [row.content for row in missing])
+            await self.memory.run_backend(
+                self.memory.index.upsert,
+                [row.embedding_id for row in missing],
+                embedded,
+                [row.content for row in missing],
+                [{"user_id": row.user_id, "memory_id": row.id, "memory_type": row.memory_type} for row in missing]
+            )
+            vectors.update({row.embedding_id: vector for row, vector in zip(missing, embedded)})
+        return vectors
+
+    async def _merge_duplicates(self, db, rows: Sequence[Memory], now: datetime) -> Tuple[set, set]:
+        """
+        Merge near-duplicates of rows into their oldest copy (which is given
+        the highest decayed relevance of the group and a new expiry).
+        Returns (ids deleted, ids of survivors rewritten).
+        """
+        vectors = await self._vectors(rows)
+        by_user: Dict[int, List[Memory]] = defaultdict(list)
+        for row in rows:
+            by_user[row.user_id].append(row)
+
+        gone_keys: set = set()
+        deleted_ids: set = set()
+        rewritten_ids: set = set()
+        for user_id, user_rows in by_user.items():
+            matrix = np.stack([vectors[row.embedding_id] for row in user_rows])
+            neighbor_lists = await self.memory.run_backend(
+                self.memory.index.neighbors, matrix, MERGE_NEIGHBORS + 1, user_id
+            )
+            candidates = {
+                match["id"]
+                for neighbors in neighbor_lists
+                for match in neighbors
+                if match["score"] >= self.merge_threshold
+            }
+            known = {
+                memory.embedding_id: memory
+                for memory in await db.scalars(
+                    select(Memory).where(Memory.user_id == user_id, Memory.embedding_id.in_(list(candidates)))
+                )
+            } if candidates else {}
+
+            for row, neighbors in zip(user_rows, neighbor_lists):
+                if row.embedding_id in gone_keys:
+                    continue
+                group = [row] + [
+                    known[match["id"]]
+                    for match in neighbors
+                    if match["score"] >= self.merge_threshold
+                    and match["id"] != row.embedding_id
+                    and match["id"] in known
+                    and match["id"] not in gone_keys
+                ]
+                if len(group) < 2:
+                    continue
+                # Summaries absorb notes; otherwise the oldest copy survives
+                survivor = min(group, key=lambda memory: (memory.memory_type != SUMMARY_TYPE, memory.id))
+                others = [memory for memory in group if memory is not survivor]
+                relevance = min(1.0, max(
+                    decayed_relevance(memory.relevance_score or 0.0, memory.updated_at, now, self.half_life_days)
+                    for memory in group
+                ))
+                await db.execute(
+                    update(Memory).where(Memory.id == survivor.id).values(
+                        relevance_score=relevance,
+                        updated_at=now,
+                        expires_at=expiry(relevance, now, self.half_life_days, self.prune_threshold)
+                    )
+                )
+                await self._delete(db, [memory.id for memory in others], [memory.embedding_id for memory in others])
+                gone_keys.update(memory.embedding_id for memory in others)
+                deleted_ids.update(memory.id for memory in others)
+                rewritten_ids.add(survivor.id)
+        return deleted_ids, rewritten_ids
+
+    async def _summarize_chunk(self, db, rows: Sequence[Memory], now: datetime) -> Tuple[int, int]:
+        """Fold aged rows into similar summaries or new cluster summaries; returns (rows summarized, summaries written)"""
+        vectors = await self._vectors(rows)
+        by_user: Dict[int, List[Memory]] = defaultdict(list)
+        for row in rows:
+            by_user[row.user_id].append(row)
+
+        summarized = summaries = 0
+        for user_id, user_rows in by_user.items():
+            matrix = np.stack([vectors[row.embedding_id] for row in user_rows])
+
+            # Join the closest existing summary when it is close enough
+            nearest = await self.memory.run_backend(self.memory.index.neighbors, matrix, 1, user_id, SUMMARY_TYPE)
+            folds: Dict[str, List[int]] = defaultdict(list)
+            rest: List[int] = []
+            for index, matches in enumerate(nearest):
+                if matches and matches[0]["score"] >= self.cluster_threshold:
+                    folds[matches[0]["id"]].append(index)
+                else:
+                    rest.append(index)
+            existing = {
+                memory.embedding_id: memory
+                for memory in await db.scalars(
+                    select(Memory).where(Memory.user_id == user_id, Memory.embedding_id.in_(list(folds)))
+                )
+            } if folds else {}
+            for key, indexes in folds.items():
+                if key not in existing:
+                    rest.extend(indexes)
+                    continue
+                await self._write_summary(db, user_id, [user_rows[i] for i in indexes], existing[key], now)
+                summarized += len(indexes)
+                summaries += 1
+
+            # Cluster the rest; clusters too small to summarize are left as they are
+            rest.sort()
+            if len(rest) >= self.cluster_min_size:
+                for members in cluster(matrix[rest], self.cluster_threshold):
+                    if len(members) >= self.cluster_min_size:
+                        await self._write_summary(db, user_id, [user_rows[rest[i]] for i in members], None, now)
+                        summarized += len(members)
+                        summaries += 1
+        return summarized, summaries
+
+    async def _write_summary(
+        self,
+        db,
+        user_id: int,
+        members: Sequence[Memory],
+        summary: Optional[Memory],
+        now: datetime
+    ):
+        """Replace members with one summary memory (summary, if given, is extended)"""
+        sources = ([summary] if summary is not None else []) + list(members)
+        content = combine([memory.content for memory in sources], self.summary_max_chars)
+        relevance = min(1.0, max(
+            decayed_relevance(memory.relevance_score or 0.0, memory.updated_at, now, self.half_life_days)
+            for memory in sources
+        ))
+        key = embedding_id(user_id, content)
+        values = {
+            "content": content,
+            "embedding_id": key,
+            "relevance_score": relevance,
+            "updated_at": now,
+            "expires_at": expiry(relevance, now, self.half_life_days, self.prune_threshold),
+        }
+        vector = await self.memory.run_backend(self.memory.embedder.embed, [content])
+
+        if summary is None:
+            row = Memory(user_id=user_id, memory_type=SUMMARY_TYPE, created_at=now, **values)
+            db.add(row)
+            await db.flush()
+            memory_id = row.id
+        else:
+            await db.execute(update(Memory).where(Memory.id == summary.id).values(**values))
+            memory_id = summary.id
+            if summary.embedding_id != key:
+                self._index_deletes.append(summary.embedding_id)
+
+        await self.memory.run_backend(
+            self.memory.index.upsert,
+            [key],
+            vector,
+            [content],
+            [{"user_id": user_id, "memory_id": memory_id, "memory_type": SUMMARY_TYPE}]
+        )
+        await self._delete(db, [memory.id for memory in members], [memory.embedding_id for memory in members])
+
+    async def _delete(self, db, ids: Sequence[int], keys: Sequence[str]):
+        """Remove memories from the database, and from the index once the caller commits (see _commit)"""
+        if not ids:
+            return
+        self._index_deletes.extend(keys)
+        await db.execute(delete(Memory).where(Memory.id.in_(list(ids))))
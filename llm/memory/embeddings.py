@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.core.config import settings
+from backend.core.lazy import lazy_import
+from backend.core.log import get_logger
+
+np = lazy_import("numpy")
+
+logger = get_logger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Key for a memory's text; whitespace and case differences hash the same"""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class Embedder:
+    """
+    Sentence-transformers encoder with a content-hash embedding cache.
+
+    The model is loaded on first use (not at import or app startup) and
+    shared by every caller. Texts are de-duplicated and looked up in an LRU
+    cache by content hash; only misses are encoded, in batches of
+    `batch_size`. Vectors are L2-normalized float32, so a dot product is the
+    cosine similarity. Encoding is CPU-bound: call from a worker thread.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        cache_max_entries: Optional[int] = None
+    ):
+        self.model_name = model_name or settings.embedding_model
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.cache_max_entries = settings.embedding_cache_max_entries if cache_max_entries is None else cache_max_entries
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stats = {"cache_hits": 0, "encoded": 0, "batches": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    logger.info(
+                        "Embedding model loaded",
+                        extra={"model": self.model_name, "seconds": round(time.perf_counter() - start, 2)}
+                    )
+        return self._model
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """One normalized vector per text (rows in input order)"""
+        keys = [content_hash(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        with self._cache_lock:
+            for key, text in zip(keys, texts):
+                if key in vectors or key in missing:
+                    continue
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = cached
+                    self._stats["cache_hits"] += 1
+                else:
+                    missing[key] = text
+
+        if missing:
+            model = self._get_model()
+            missing_keys = list(missing)
+            for start in range(0, len(missing_keys), self.batch_size):
+                batch = missing_keys[start:start + self.batch_size]
+                encoded = model.encode(
+                    [missing[key] for key in batch],
+                    batch_size=self.batch_size,
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                ).astype(np.float32)
+                self._stats["batches"] += 1
+                self._stats["encoded"] += len(batch)
+                for key, vector in zip(batch, encoded):
+                    vectors[key] = vector
+            self._remember(missing_keys, vectors)
+
+        return np.stack([vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def _remember(self, keys: List[str], vectors: Dict[str, np.ndarray]):
+        if self.cache_max_entries <= 0:
+            return
+        with self._cache_lock:
+            for key in keys:
+                self._cache[key] = vectors[key]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "model": self.model_name,
+            "model_loaded": self.loaded,
+            "cache_entries": len(self._cache),
+        }
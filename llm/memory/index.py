@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.core.config import settings
+from backend.core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# HNSW graph parameters: M links per node, ef at build and query time.
+# These keep top-k queries in the low milliseconds at hundreds of thousands of vectors.
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 128,
+    "hnsw:search_ef": 64,
+}
+
+
+class VectorIndex:
+    """
+    Persistent approximate-nearest-neighbor index over memory embeddings.
+
+    Backed by a Chroma collection (HNSW) under settings.chroma_db_path, opened
+    on first use. Vectors are supplied by the caller (see Embedder), so Chroma
+    never loads an embedding model of its own. Calls block: use a worker thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, collection_name: Optional[str] = None):
+        self.path = path or settings.chroma_db_path
+        self.collection_name = collection_name or settings.memory_collection
+        self._collection = None
+        self._lock = threading.Lock()
+
+    def _get_collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    import chromadb
+                    from chromadb.config import Settings as ChromaSettings
+                    client = chromadb.PersistentClient(
+                        path=self.path, settings=ChromaSettings(anonymized_telemetry=False)
+                    )
+                    self._collection = client.get_or_create_collection(
+                        self.collection_name, metadata=HNSW_SETTINGS, embedding_function=None
+                    )
+        return self._collection
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ):
+        if not ids:
+            return
+        self._get_collection().upsert(
+            ids=list(ids),
+            embeddings=vectors.tolist(),
+            documents=list(documents),
+            metadatas=list(metadatas)
+        )
+
+    def query(self, vector: np.ndarray, k: int, user_id: int) -> List[Dict[str, Any]]:
+        """Nearest k of the user's memories: [{"id", "document", "metadata", "score"}], best first"""
+        return self.neighbors(vector[np.newaxis, :], k, user_id)[0]
+
+    def neighbors(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        user_id: int,
+        memory_type: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """query() for each row of vectors in one call, optionally only memories of memory_type"""
+        where: Dict[str, Any] = {"user_id": user_id}
+        if memory_type is not None:
+            where = {"$and": [where, {"memory_type": memory_type}]}
+        result = self._get_collection().query(
+            query_embeddings=vectors.tolist(),
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                # Cosine distance -> similarity
+                {"id": id_, "document": document, "metadata": metadata, "score": 1.0 - distance}
+                for id_, document, metadata, distance in zip(ids, documents, metadatas, distances)
+            ]
+            for ids, documents, metadatas, distances in zip(
+                result["ids"], result["documents"], result["metadatas"], result["distances"]
+            )
+        ]
+
+    def get(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors by id (missing ids are left out)"""
+        if not ids:
+            return {}
+        result = self._get_collection().get(ids=list(ids), include=["embeddings"])
+        return {id_: np.asarray(vector, dtype=np.float32) for id_, vector in zip(result["ids"], result["embeddings"])}
+
+    def delete(self, ids: Sequence[str]):
+        if ids:
+            self._get_collection().delete(ids=list(ids))
+
+    def count(self) -> int:
+        return self._get_collection().count() if self._collection is not None else 0
@@ -0,0 +1,211 @@
+"""
+User memories: storage, embedding and recall for prompt context.
+
+A memory is a Memory row (the source of truth) plus a vector in the
+VectorIndex under embedding_id = "<user_id>:<content hash>", so storing the
+same text twice for a user is a no-op. Embedding and index work runs in
+worker threads, so the event loop never blocks on the model or the index,
+and neither is loaded until the first memory is stored or recalled.
+
+When the model or the index fails to load or to answer, recall is switched
+off and the failure logged once: for good when a package is not installed
+(ImportError), else until MEMORY_RETRY_SECONDS have passed. Meanwhile
+recall(), remember(), forget() and consolidation raise MemoryUnavailable at
+once instead of trying again.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.log import get_logger
+from backend.models.user import Memory
+from .embeddings import Embedder, content_hash
+from .index import VectorIndex
+
+logger = get_logger(__name__)
+
+
+class MemoryUnavailable(Exception):
+    """The memory backend is off because it failed (see MemoryService)"""
+
+
+def embedding_id(user_id: int, text: str) -> str:
+    return f"{user_id}:{content_hash(text)}"
+
+
+class MemoryService:
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        index: Optional[VectorIndex] = None,
+        retry_seconds: Optional[float] = None
+    ):
+        self.embedder = embedder or Embedder()
+        self.index = index or VectorIndex()
+        self.retry_seconds = settings.memory_retry_seconds if retry_seconds is None else retry_seconds
+        # Why recall is off, and when to try again (None: not until restart)
+        self._unavailable: Optional[str] = None
+        self._retry_at: Optional[float] = None
+        self._stats = {
+            "stored": 0, "duplicates": 0, "recalls": 0, "recall_ms_total": 0.0,
+            "backend_failures": 0, "recalls_skipped": 0, "writes_skipped": 0
+        }
+
+    def check_backend(self, skipped: str = "recalls_skipped"):
+        """Raise MemoryUnavailable while the backend is off, counting the call as `skipped`"""
+        if self._unavailable is None:
+            return
+        if self._retry_at is not None and time.monotonic() >= self._retry_at:
+            self._unavailable = None
+            return
+        self._stats[skipped] += 1
+        raise MemoryUnavailable(self._unavailable)
+
+    async def run_backend(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run an embedder or index call in a worker thread; a failure turns the backend off"""
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            raise self._backend_failed(e) from e
+
+    def _backend_failed(self, error: Exception) -> MemoryUnavailable:
+        self._unavailable = f"{type(error).__name__}: {error}"
+        self._stats["backend_failures"] += 1
+        if isinstance(error, ImportError):
+            self._retry_at = None
+            logger.warning("Memory backend not installed, recall disabled", extra={"error": self._unavailable})
+        else:
+            self._retry_at = time.monotonic() + self.retry_seconds
+            logger.warning("Memory backend failed, recall paused", extra={
+                "error": self._unavailable, "retry_seconds": self.retry_seconds
+            })
+        return MemoryUnavailable(self._unavailable)
+
+    async def remember(
+        self,
+        user_id: int,
+        contents: Sequence[str],
+        memory_type: str = "note"
+    ) -> List[int]:
+        """
+        Store memories for a user (one embedding batch for all of them).
+        Returns the Memory ids, existing ones for texts already stored.
+        Raises MemoryUnavailable while the backend is off.
+        """
+        unique: Dict[str, str] = {}
+        for text in contents:
+            text = text.strip()
+            if text:
+                unique.setdefault(embedding_id(user_id, text), text)
+        if not unique:
+            return []
+        self.check_backend("writes_skipped")
+
+        async with AsyncSessionLocal() as db:
+            existing = {
+                memory.embedding_id: memory.id
+                for memory in await db.scalars(
+                    select(Memory).where(Memory.user_id == user_id, Memory.embedding_id.in_(list(unique)))
+                )
+            }
+            new_ids = [key for key in unique if key not in existing]
+            self._stats["duplicates"] += len(existing)
+
+            if new_ids:
+                texts = [unique[key] for key in new_ids]
+                vectors = await self.run_backend(self.embedder.embed, texts)
+                now = datetime.utcnow()
+                rows = [
+                    Memory(
+                        user_id=user_id,
+                        content=text,
+                        memory_type=memory_type,
+                        embedding_id=key,
+                        relevance_score=1.0,
+                        created_at=now,
+                        updated_at=now
+                    )
+                    for key, text in zip(new_ids, texts)
+                ]
+                db.add_all(rows)
+                await db.flush()
+                await self.run_backend(
+                    self.index.upsert,
+                    new_ids,
+                    vectors,
+                    texts,
+                    [{"user_id": user_id, "memory_id": row.id, "memory_type": memory_type} for row in rows]
+                )
+                await db.commit()
+                existing.update({row.embedding_id: row.id for row in rows})
+                self._stats["stored"] += len(rows)
+
+        return [existing[key] for key in unique]
+
+    async def recall(self, user_id: int, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        The user's k memories most relevant to query: [{"id", "content",
+        "memory_type", "score"}]. Raises MemoryUnavailable while the backend
+        is off.
+        """
+        if not query.strip() or k <= 0:
+            return []
+        self.check_backend()
+        start = time.perf_counter()
+        try:
+            vector = (await asyncio.to_thread(self.embedder.embed, [query]))[0]
+            matches = await asyncio.to_thread(self.index.query, vector, k, user_id)
+        except Exception as e:
+            raise self._backend_failed(e) from e
+        self._stats["recalls"] += 1
+        self._stats["recall_ms_total"] += (time.perf_counter() - start) * 1000
+        return [
+            {
+                "id": match["metadata"].get("memory_id"),
+                "content": match["document"],
+                "memory_type": match["metadata"].get("memory_type"),
+                "score": round(match["score"], 4),
+            }
+            for match in matches
+        ]
+
+    async def forget(self, user_id: int, memory_ids: Sequence[int]) -> int:
+        """Delete memories (rows and vectors); returns how many were removed"""
+        self.check_backend("writes_skipped")
+        async with AsyncSessionLocal() as db:
+            rows = list(await db.scalars(
+                select(Memory).where(Memory.user_id == user_id, Memory.id.in_(list(memory_ids)))
+            ))
+            await self.run_backend(self.index.delete, [row.embedding_id for row in rows])
+            for row in rows:
+                await db.delete(row)
+            await db.commit()
+        return len(rows)
+
+    async def warmup(self):
+        """Load the embedding model and open the index ahead of the first request"""
+        try:
+            await asyncio.to_thread(self.embedder._get_model)
+            await asyncio.to_thread(self.index._get_collection)
+        except Exception as e:
+            raise self._backend_failed(e) from e
+
+    def stats(self) -> Dict[str, Any]:
+        recalls = self._stats["recalls"]
+        return {
+            "stored": self._stats["stored"],
+            "duplicates": self._stats["duplicates"],
+            "recalls": recalls,
+            "recall_ms_avg": round(self._stats["recall_ms_total"] / recalls, 2) if recalls else None,
+            "backend_failures": self._stats["backend_failures"],
+            "recalls_skipped": self._stats["recalls_skipped"],
+            "writes_skipped": self._stats["writes_skipped"],
+            "unavailable": self._unavailable,
+            "index_count": self.index.count(),
+            "embedder": self.embedder.stats(),
+        }
@@ -1,6 +1,32 @@
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
+from backend.core.config import settings
+from .compiler import (
+    DEFAULT_EMOJI, PRIORITY_EMOJI, count_tokens, fill_tasks, get_closer, task_token_budget
+)
+
+BASE_INSTRUCTIONS_TEMPLATE = """
+You are Timely, an AI productivity coach. Your role is to help users manage their time effectively and reduce decision fatigue.
+
+PERSONALITY: Act {tone} - {style}. Use {language} language.
+
+CORE PRINCIPLES:
+- Be decisive but not overwhelming
+- Consider the user's energy level: {{energy_level}}
+- Keep responses concise and actionable
+- Always suggest ONE clear next action
+- Time context: {{time}}
+
+RESPONSE FORMAT:
+- Lead with the most important point
+- Use clear, specific language
+- Include brief reasoning when helpful
+- End with a motivational touch (personality appropriate)
+"""
+
+# Completion tokens reserved when sizing the task list
+DEFAULT_COMPLETION_TOKENS = 400
 
 @dataclass
 class UserContext:
@@ -46,6 +72,12 @@ class BasePromptTemplate:
         }
     }
     
+    # Personality is fixed per mode, so its instructions are formatted once at import
+    BASE_INSTRUCTIONS = {
+        mode: BASE_INSTRUCTIONS_TEMPLATE.format(**personality)
+        for mode, personality in PERSONALITY_MODES.items()
+    }
+    
     def __init__(self, context: UserContext):
         self.context = context
         self.personality = self.PERSONALITY_MODES.get(
@@ -55,31 +87,28 @@ class BasePromptTemplate:
     
     def get_base_instructions(self) -> str:
         """Common instructions for all prompts"""
-        return f"""
-You are Timely, an AI productivity coach. Your role is to help users manage their time effectively and reduce decision fatigue.
-
-PERSONALITY: Act {self.personality['tone']} - {self.personality['style']}. Use {self.personality['language']} language.
-
-CORE PRINCIPLES:
-- Be decisive but not overwhelming
-- Consider the user's energy level: {self.context.energy_level}
-- Keep responses concise and actionable
-- Always suggest ONE clear next action
-- Time context: {self.context.current_time.strftime('%A, %B %d, %Y at %I:%M %p')}
-
-RESPONSE FORMAT:
-- Lead with the most important point
-- Use clear, specific language
-- Include brief reasoning when helpful
-- End with a motivational touch (personality appropriate)
-"""
+        template = self.BASE_INSTRUCTIONS.get(self.context.personality_mode, self.BASE_INSTRUCTIONS["coach"])
+        return template.format(
+            energy_level=self.context.energy_level,
+            time=self.context.current_time.strftime('%A, %B %d, %Y at %I:%M %p')
+        )
 
 class WhatToDoNextPrompt(BasePromptTemplate):
     """Prompt template for 'What should I do next?' queries"""
     
-    def build_prompt(self, user_input: str, available_tasks: list) -> str:
-        task_context = self._format_tasks(available_tasks)
-        
+    def build_prompt(self, user_input: str, available_tasks: list, token_budget: Optional[int] = None) -> str:
+        """
+        available_tasks should be best first: when they don't all fit in
+        token_budget (default: what the context window leaves) the tail is dropped.
+        """
+        if token_budget is None:
+            fixed = count_tokens(self._render(user_input, ""))
+            token_budget = task_token_budget(
+                settings.llm_context_window, fixed, DEFAULT_COMPLETION_TOKENS, settings.prompt_task_token_budget
+            )
+        return self._render(user_input, self._format_tasks(available_tasks, token_budget))
+    
+    def _render(self, user_input: str, task_context: str) -> str:
         return f"""
 {self.get_base_instructions()}
 
@@ -106,17 +135,12 @@ RESPONSE FORMAT:
 {self._get_personality_closer()}
 """
     
-    def _format_tasks(self, tasks: list) -> str:
-        if not tasks:
-            return "No pending tasks in the system."
-        
-        formatted = []
-        for task in tasks[:10]:  # Limit to prevent prompt overflow
-            priority_emoji = {"low": "🔵", "medium": "🟡", "high": "🟠", "urgent": "🔴"}
-            emoji = priority_emoji.get(task.get('priority', 'medium'), '⚪')
-            formatted.append(f"{emoji} {task['title']} (Priority: {task['priority']})")
-        
-        return "\n".join(formatted)
+    def _format_tasks(self, tasks: list, token_budget: int) -> str:
+        formatted = (
+            f"{PRIORITY_EMOJI.get(task.get('priority', 'medium'), DEFAULT_EMOJI)} {task['title']} (Priority: {task['priority']})"
+            for task in tasks or []
+        )
+        return fill_tasks(formatted, token_budget, empty="No pending tasks in the system.")[0]
     
     def _format_recent_activity(self) -> str:
         if not self.context.recent_tasks:
@@ -129,10 +153,4 @@ RESPONSE FORMAT:
         return f"Next: {self.context.calendar_events[0]['title']} at {self.context.calendar_events[0]['time']}"
     
     def _get_personality_closer(self) -> str:
-        closers = {
-            "coach": "You've got this! 💪",
-            "friend": "Hope this helps! 😊",
-            "strict": "Execute immediately.",
-            "zen": "Focus on this moment. 🧘"
-        }
-        return closers.get(self.context.personality_mode, "Let's get started! ✨")
\ No newline at end of file
+        return get_closer(self.context.personality_mode)
\ No newline at end of file
@@ -0,0 +1,300 @@
+"""
+Prompt compilation and token budgeting.
+
+Everything that depends only on the personality mode (style line, closer,
+instructions) is baked into one template per mode at import time; its token
+count is taken on first use. Building a prompt then only formats the per-request
+fields and fills the task list up to a measured token budget, dropping the
+lowest-value tasks (the end of the ranked list) first instead of cutting at
+a fixed count.
+
+Token counts use tiktoken when it is installed and its encoding loads, and
+fall back to a characters-per-token estimate otherwise. tiktoken fetches the
+encoding file on first use unless it is in TIKTOKEN_CACHE_DIR (the image
+pre-fetches it), so it is neither imported nor loaded at import time; the
+startup warmup calls load_encoding() once the port is bound.
+"""
+import importlib.util
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from backend.core.log import get_logger
+
+TIKTOKEN_ENCODING = "cl100k_base"
+
+CHARS_PER_TOKEN = 4
+
+# Chat format overhead per message (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+PERSONALITY_STYLES = {
+    "coach": "Be encouraging and supportive, like a professional productivity coach",
+    "friend": "Be casual and friendly, like a helpful friend",
+    "strict": "Be direct and focused, like an efficient executive assistant",
+    "zen": "Be calm and mindful, like a mindfulness teacher"
+}
+
+PERSONALITY_CLOSERS = {
+    "coach": "You've got this! 💪",
+    "friend": "Hope this helps! 😊",
+    "strict": "Execute immediately.",
+    "zen": "Focus on this moment. 🧘"
+}
+DEFAULT_CLOSER = "Let's get started! ✨"
+
+PRIORITY_EMOJI = {"low": "🔵", "medium": "🟡", "high": "🟠", "urgent": "🔴"}
+DEFAULT_EMOJI = "⚪"
+
+
+logger = get_logger(__name__)
+
+
+def tiktoken_installed() -> bool:
+    return importlib.util.find_spec("tiktoken") is not None
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """The tiktoken encoding, or None (estimate) when tiktoken is missing or the encoding fails to load"""
+    try:
+        import tiktoken
+    except ImportError:  # optional dependency
+        return None
+    try:
+        return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, estimating token counts", extra={
+            "encoding": TIKTOKEN_ENCODING, "error": f"{type(e).__name__}: {e}"
+        })
+        return None
+
+
+def load_encoding():
+    """
+    Load the tokenizer ahead of the first prompt (the startup warmup runs
+    this in a worker thread). Raises when tiktoken is installed but its
+    encoding did not load, so the warmup reports that token counts are
+    estimated; they fall back to the estimate either way.
+    """
+    if _encoding() is None and tiktoken_installed():
+        raise RuntimeError(f"tiktoken encoding {TIKTOKEN_ENCODING} unavailable, estimating token counts")
+
+
+def token_counter() -> str:
+    """What count_tokens uses, for reports"""
+    return f"tiktoken {TIKTOKEN_ENCODING}" if _encoding() is not None else f"chars/{CHARS_PER_TOKEN} estimate"
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Tokens in text for the chat models we use (cached; task lines repeat a lot)"""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: Sequence[Dict[str, str]]) -> int:
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class CompiledPrompt(NamedTuple):
+    template: str
+    # The template's static text, with every per-request field stripped
+    static_text: str
+
+    @property
+    def static_tokens(self) -> int:
+        # Counted on first use (count_tokens caches it), not at import
+        return count_tokens(self.static_text)
+
+    def render(self, **fields: Any) -> str:
+        return self.template.format(**fields)
+
+
+class RenderedPrompt(NamedTuple):
+    text: str
+    tokens: int
+    tasks_included: int
+    tasks_dropped: int
+
+
+NEXT_TASK_TEMPLATE = """
+{style}.
+
+USER REQUEST: "{{user_input}}"
+
+CURRENT CONTEXT:
+- Time: {{time}}
+- Energy Level: {{energy_level}}
+- Available Tasks: {{tasks_count}}
+{{memory_context}}
+TASKS:
+{{task_context}}
+
+Suggest ONE specific task they should do next. Consider their energy level and time of day.
+
+FORMAT:
+**Next Task:** [Clear task name]
+**Why Now:** [Brief reasoning]
+**Duration:** [Estimated time]
+
+{closer}
+"""
+
+
+def _compile(template: str, **static: str) -> CompiledPrompt:
+    compiled = template.format(**{name: _escape(value) for name, value in static.items()})
+    # Count the static text only: every remaining {field} is stripped
+    bare = compiled
+    for field in ("user_input", "time", "energy_level", "tasks_count", "memory_context", "task_context"):
+        bare = bare.replace("{" + field + "}", "")
+    return CompiledPrompt(compiled, bare.replace("{{", "{").replace("}}", "}"))
+
+
+NEXT_TASK_PROMPTS = {
+    mode: _compile(NEXT_TASK_TEMPLATE, style=style, closer=PERSONALITY_CLOSERS[mode])
+    for mode, style in PERSONALITY_STYLES.items()
+}
+# Unknown modes: coach style with the generic closer
+DEFAULT_NEXT_TASK_PROMPT = _compile(NEXT_TASK_TEMPLATE, style=PERSONALITY_STYLES["coach"], closer=DEFAULT_CLOSER)
+
+
+def get_closer(personality_mode: str) -> str:
+    return PERSONALITY_CLOSERS.get(personality_mode, DEFAULT_CLOSER)
+
+
+def format_task_line(task: Dict[str, Any], index: int) -> str:
+    priority = task.get("priority", "medium")
+    emoji = PRIORITY_EMOJI.get(priority, DEFAULT_EMOJI)
+    title = task.get("title", f"Task {index}")
+    duration = task.get("estimated_duration", 30)
+    return f"{emoji} {title} ({priority} priority, ~{duration}min)"
+
+
+def format_memories(memories: Optional[Sequence[str]]) -> str:
+    """Prompt section for recalled user memories ("" when there are none)"""
+    if not memories:
+        return ""
+    return "\nWHAT YOU KNOW ABOUT THEM:\n" + "\n".join(f"- {memory}" for memory in memories) + "\n"
+
+
+def fill_tasks(lines: Iterable[str], budget: int, empty: str = "No pending tasks available.") -> Tuple[str, int, int]:
+    """
+    Join as many lines (best first) as fit in `budget` tokens. Lines are
+    consumed lazily, so a generator stops being formatted once the budget is spent.
+    Returns (text, number of lines included, tokens used).
+    """
+    included: List[str] = []
+    used = 0
+    for line in lines:
+        # +1 for the newline joining lines
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        included.append(line)
+        used += cost
+    if not included:
+        return empty, 0, count_tokens(empty)
+    return "\n".join(included), len(included), used
+
+
+def format_summary(summary: str) -> str:
+    """System message content carrying a conversation's rolling summary"""
+    return f"Summary of the conversation so far:\n{summary}"
+
+
+def fill_history(
+    summary: str,
+    turns: Sequence[Tuple[str, str, int]],
+    budget: int
+) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Messages replaying a conversation: its summary (as a system message),
+    then the most recent (role, content, tokens) turns that fit in `budget`
+    tokens. The replay always starts on a user turn, so roles alternate.
+    Returns (messages, tokens).
+    """
+    start = len(turns)
+    used = 0
+    for role, content, tokens in reversed(turns):
+        cost = tokens + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget:
+            break
+        start -= 1
+        used += cost
+    while start < len(turns) and turns[start][0] != "user":
+        used -= turns[start][2] + MESSAGE_OVERHEAD_TOKENS
+        start += 1
+    messages = [{"role": role, "content": content} for role, content, _ in turns[start:]]
+    if summary:
+        messages.insert(0, {"role": "system", "content": format_summary(summary)})
+        used += count_tokens(messages[0]["content"]) + MESSAGE_OVERHEAD_TOKENS
+    return messages, used
+
+
+def format_transcript(turns: Iterable[Tuple[str, str]]) -> str:
+    """(role, content) turns as "User: ..." / "Assistant: ..." lines"""
+    return "\n".join(f"{'User' if role == 'user' else 'Assistant'}: {content}" for role, content in turns)
+
+
+def task_token_budget(
+    context_window: int,
+    fixed_tokens: int,
+    max_completion_tokens: int,
+    cap: int = 0
+) -> int:
+    """Tokens left for the task list once fixed text and the completion are reserved"""
+    remaining = context_window - fixed_tokens - max_completion_tokens
+    if cap > 0:
+        remaining = min(remaining, cap)
+    return max(0, remaining)
+
+
+def build_next_task_prompt(
+    personality_mode: str,
+    user_input: str,
+    tasks: Sequence[Dict[str, Any]],
+    energy_level: str,
+    time_text: str,
+    tasks_count: int,
+    context_window: int,
+    max_completion_tokens: int,
+    reserved_tokens: int = 0,
+    task_token_cap: int = 0,
+    memories: Optional[Sequence[str]] = None
+) -> RenderedPrompt:
+    """
+    Render the next-task prompt with as many tasks (in the given order) as the
+    context window allows. `reserved_tokens` covers other messages (e.g. the
+    system prompt) sent alongside this one.
+    """
+    compiled = NEXT_TASK_PROMPTS.get(personality_mode, DEFAULT_NEXT_TASK_PROMPT)
+    memory_context = format_memories(memories)
+    fixed = (
+        compiled.static_tokens
+        + count_tokens(user_input)
+        + count_tokens(time_text)
+        + count_tokens(str(energy_level))
+        + count_tokens(str(tasks_count))
+        + count_tokens(memory_context)
+        + reserved_tokens
+        + MESSAGE_OVERHEAD_TOKENS
+    )
+    budget = task_token_budget(context_window, fixed, max_completion_tokens, task_token_cap)
+    lines = (format_task_line(task, index) for index, task in enumerate(tasks, 1))
+    task_context, included, task_tokens = fill_tasks(lines, budget)
+
+    text = compiled.render(
+        user_input=user_input,
+        time=time_text,
+        energy_level=energy_level,
+        tasks_count=tasks_count,
+        memory_context=memory_context,
+        task_context=task_context
+    )
+    return RenderedPrompt(text, fixed - reserved_tokens + task_tokens, included, len(tasks) - included)
@@ -0,0 +1,148 @@
+"""
+Anthropic Messages API backend.
+
+Calls POST {base_url}/v1/messages directly on the shared httpx client. The
+pinned anthropic SDK predates the Messages API, and httpx gives this
+provider the same pooled connections as OpenAI. System messages move to
+the top-level "system" field. Rate-limit, overload and server errors, plus
+connection failures, are retried max_retries times with backoff, but only
+before any text has been returned.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from .base import Completion, LLMProvider, ProviderError
+
+ANTHROPIC_VERSION = "2023-06-01"
+DEFAULT_BASE_URL = "https://api.anthropic.com"
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+MAX_BACKOFF_SECONDS = 8.0
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        timeout: float = 20.0,
+        max_retries: int = 2,
+        input_cost_per_1k: float = 0.0,
+        output_cost_per_1k: float = 0.0
+    ):
+        super().__init__(model, input_cost_per_1k, output_cost_per_1k)
+        self.http_client = http_client
+        self.url = f"{(base_url or DEFAULT_BASE_URL).rstrip('/')}/v1/messages"
+        self.headers = {"x-api-key": api_key, "anthropic-version": ANTHROPIC_VERSION}
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _payload(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, stream: bool) -> Dict[str, Any]:
+        system, conversation = _split_system(messages)
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": min(temperature, 1.0),
+            "messages": conversation,
+        }
+        if system:
+            payload["system"] = system
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Completion:
+        payload = self._payload(messages, max_tokens, temperature, stream=False)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.http_client.post(self.url, json=payload, headers=self.headers, timeout=self.timeout)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise ProviderError(self.name, f"{type(e).__name__}: {e}") from e
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(_backoff(attempt, response))
+                continue
+            if response.status_code != 200:
+                raise _error(self.name, response)
+            body = response.json()
+            return Completion(
+                content="".join(block.get("text", "") for block in body.get("content", []) if block.get("type") == "text"),
+                prompt_tokens=body.get("usage", {}).get("input_tokens", 0),
+                completion_tokens=body.get("usage", {}).get("output_tokens", 0),
+                provider=self.name,
+                model=body.get("model", self.model)
+            )
+        raise ProviderError(self.name, "retries exhausted")
+
+    async def stream(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        payload = self._payload(messages, max_tokens, temperature, stream=True)
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self.http_client.stream(
+                    "POST", self.url, json=payload, headers=self.headers, timeout=self.timeout
+                ) as response:
+                    if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                        await response.aread()
+                        await asyncio.sleep(_backoff(attempt, response))
+                        continue
+                    if response.status_code != 200:
+                        await response.aread()
+                        raise _error(self.name, response)
+                    async for text in _text_deltas(self.name, response):
+                        started = True
+                        yield text
+                    return
+            except httpx.TransportError as e:
+                if started or attempt == self.max_retries:
+                    raise ProviderError(self.name, f"{type(e).__name__}: {e}") from e
+                await asyncio.sleep(_backoff(attempt))
+
+
+def _split_system(messages: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+    system = "\n\n".join(message["content"] for message in messages if message["role"] == "system")
+    conversation = [
+        {"role": message["role"], "content": message["content"]}
+        for message in messages if message["role"] != "system"
+    ]
+    return system, conversation
+
+
+async def _text_deltas(provider: str, response: httpx.Response) -> AsyncIterator[str]:
+    """Text from a Messages API event stream (content_block_delta events)"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        event = json.loads(line[len("data:"):].strip())
+        kind = event.get("type")
+        if kind == "content_block_delta" and event["delta"].get("type") == "text_delta":
+            yield event["delta"]["text"]
+        elif kind == "error":
+            raise ProviderError(provider, event.get("error", {}).get("message", "stream error"))
+        elif kind == "message_stop":
+            return
+
+
+def _backoff(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    if response is not None:
+        try:
+            return min(float(response.headers["retry-after"]), MAX_BACKOFF_SECONDS)
+        except (KeyError, ValueError):
+            pass
+    return min(0.5 * 2 ** attempt, MAX_BACKOFF_SECONDS)
+
+
+def _error(provider: str, response: httpx.Response) -> ProviderError:
+    try:
+        message = response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        message = response.text[:200] or response.reason_phrase
+    return ProviderError(provider, message, response.status_code)
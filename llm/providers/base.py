@@ -0,0 +1,55 @@
+"""
+What TimelyAssistant needs from an LLM backend: one chat completion, or a
+stream of text deltas, for OpenAI-style messages ([{"role", "content"}]).
+
+Providers only translate requests and responses. Routing, failover, circuit
+breaking and metrics live in llm.agents.router.
+"""
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+# Rough chars-per-token ratio for streamed calls, where the APIs report no usage
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class Completion:
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    provider: str
+    model: str
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class ProviderError(Exception):
+    """An upstream API answered with an error"""
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{provider}: {message}" + (f" (HTTP {status_code})" if status_code else ""))
+        self.provider = provider
+        self.status_code = status_code
+
+
+class LLMProvider:
+    """Base class for provider backends; costs are USD per 1,000 tokens"""
+
+    name = ""
+
+    def __init__(self, model: str, input_cost_per_1k: float = 0.0, output_cost_per_1k: float = 0.0):
+        self.model = model
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.input_cost_per_1k + completion_tokens * self.output_cost_per_1k) / 1000
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Text deltas as they arrive"""
+        raise NotImplementedError
@@ -0,0 +1,46 @@
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List
+
+from .base import Completion, LLMProvider
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+class OpenAIProvider(LLMProvider):
+    """Chat completions through the official client (its timeout and retries apply)"""
+
+    name = "openai"
+
+    def __init__(self, client: "AsyncOpenAI", model: str, input_cost_per_1k: float = 0.0, output_cost_per_1k: float = 0.0):
+        super().__init__(model, input_cost_per_1k, output_cost_per_1k)
+        self.client = client
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        return Completion(
+            content=response.choices[0].message.content,
+            prompt_tokens=response.usage.prompt_tokens,
+            completion_tokens=response.usage.completion_tokens,
+            provider=self.name,
+            model=response.model or self.model
+        )
+
+    async def stream(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.response.aclose()